@@ -0,0 +1,70 @@
+"""
+Per-request Cognito client overhead, before and after sharing one client.
+
+"before" repeats what every request used to do: build a new cognito-idp client
+(credential resolution, endpoint and service model loading, a fresh connection
+pool) and make the call on it. "after" makes the same call on the shared client
+from core.aws_cognito, which keeps its connections alive between requests.
+
+    python -m bench.cognito_client --requests 300
+
+Runs against moto's Cognito, so the numbers are client overhead plus a local round trip.
+"""
+import os
+import time
+import argparse
+import importlib
+from typing import Callable, Dict, List
+
+from bench.stubs import MotoStack, REGION
+
+
+EMAIL = "bench@example.com"
+
+
+def timed(fn: Callable[[], None], requests: int) -> Dict[str, float]:
+    timings: List[float] = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    moto = MotoStack().start()
+    moto.create_user(EMAIL)
+    os.environ.update(moto.environ())
+    os.environ.setdefault("COGNITO_QUOTA_SHARE", "1000")
+    aws_cognito = importlib.import_module("core.aws_cognito")
+    import boto3
+
+    def before():
+        client = boto3.client("cognito-idp", region_name=REGION, endpoint_url=moto.url)
+        client.admin_get_user(UserPoolId=moto.user_pool_id, Username=EMAIL)
+
+    def after():
+        aws_cognito.get_cognito_client().admin_get_user(UserPoolId=moto.user_pool_id, Username=EMAIL)
+
+    # Pay for the shared client's creation outside the timed loop, as a warm container would
+    after()
+    results = {"before (client per request)": timed(before, args.requests), "after (shared client)": timed(after, args.requests)}
+    moto.stop()
+
+    width = max(len(name) for name in results)
+    print(f"{'':<{width}}  {'mean ms':>8}  {'p50 ms':>8}  {'p99 ms':>8}")
+    for name, stats in results.items():
+        print(f"{name:<{width}}  {stats['mean_ms']:>8.2f}  {stats['p50_ms']:>8.2f}  {stats['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Import-time profile of the application entry point.
+
+Runs ``python -X importtime -c "import main"`` in a fresh interpreter, parses the
+report into a table of the slowest modules and checks the total against a budget.
+
+    python -m bench.importtime --budget-ms 250 --top 25
+
+The budget covers what main adds on top of the framework (FRAMEWORK, imported alone
+in another fresh interpreter), so it tracks this code rather than the FastAPI release
+or the machine. Each side is the fastest of --runs imports.
+
+Exits non-zero when the import of ``main`` exceeds the budget, so it can gate CI;
+tests/test_importtime.py runs the same check under pytest.
+"""
+import os
+import sys
+import argparse
+import subprocess
+from typing import List, NamedTuple
+
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 250  # main's import time beyond FRAMEWORK
+# Imported by any entry point; its cost is the floor, not ours
+FRAMEWORK = ("fastapi", "mangum")
+# Modules that must not be imported while loading main; they belong to first use
+DEFERRED_MODULES = ("boto3", "aioboto3", "bs4", "requests", "aiohttp", "jose", "jwt", "pyarrow", "uvicorn")
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(stderr: str) -> List[ImportTiming]:
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append(ImportTiming(name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def profile(entry_point: str = "main") -> List[ImportTiming]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry_point}"],
+        cwd=API_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {entry_point} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def cumulative_ms(timings: List[ImportTiming], modules) -> float:
+    return sum(t.cumulative_us for t in timings if t.module in modules) / 1000
+
+
+class ImportBudget(NamedTuple):
+    timings: List[ImportTiming]
+    total_ms: float
+    framework_ms: float
+    eager: List[str]
+
+    @property
+    def own_ms(self) -> float:
+        return self.total_ms - self.framework_ms
+
+
+def measure(entry_point: str = "main", runs: int = 3) -> ImportBudget:
+    """
+    Profile entry_point and the framework alone, keeping the fastest of `runs` each.
+    """
+    profiles = [profile(entry_point) for _ in range(runs)]
+    timings = min(profiles, key=lambda p: cumulative_ms(p, (entry_point,)))
+    framework_ms = min(cumulative_ms(profile(", ".join(FRAMEWORK)), FRAMEWORK) for _ in range(runs))
+    loaded = {t.module.split(".")[0] for t in timings}
+    eager = [module for module in DEFERRED_MODULES if module in loaded]
+    return ImportBudget(timings, cumulative_ms(timings, (entry_point,)), framework_ms, eager)
+
+
+def format_table(timings: List[ImportTiming], top: int) -> str:
+    rows = sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[:top]
+    width = max([len(t.module) for t in rows] + [len("module")])
+    lines = [f"{'module':<{width}}  {'self ms':>9}  {'cumulative ms':>13}"]
+    lines.append("-" * len(lines[0]))
+    for t in rows:
+        lines.append(f"{t.module:<{width}}  {t.self_us / 1000:>9.1f}  {t.cumulative_us / 1000:>13.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry-point", default="main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    result = measure(args.entry_point, args.runs)
+    print(format_table(result.timings, args.top))
+    print(f"\nimport {args.entry_point}: {result.total_ms:.1f} ms, "
+          f"{', '.join(FRAMEWORK)} alone: {result.framework_ms:.1f} ms")
+    print(f"{args.entry_point} on top of the framework: {result.own_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if result.eager:
+        print(f"Deferred modules imported eagerly: {', '.join(result.eager)}")
+        failed = True
+    if result.own_ms > args.budget_ms:
+        print("Import time budget exceeded")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
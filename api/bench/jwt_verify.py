@@ -0,0 +1,83 @@
+"""
+Token verification cost per JWT backend, for valid, expired and unknown-kid tokens,
+with the verified-token cache cold (cleared before every call) and warm.
+
+    python -m bench.jwt_verify --iterations 2000
+    python -m bench.jwt_verify --backends fast,pyjwt
+
+Tokens are signed with a local key whose JWKS is served over HTTP, so the key
+store goes through the same fetch and parse as it does against Cognito.
+"""
+import os
+import time
+import argparse
+import importlib
+from typing import Callable, Dict, List
+
+from bench.stubs import TokenIssuer
+
+
+def measure(fn: Callable[[], None], iterations: int, before: Callable[[], None] = None) -> Dict[str, float]:
+    timings: List[float] = []
+    for _ in range(iterations):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    total = sum(timings)
+    return {
+        "per_s": iterations / total if total else 0.0,
+        "p50_us": timings[len(timings) // 2] * 1e6,
+        "p99_us": timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--backends", type=lambda s: s.split(","), default=None, help="Defaults to every registered backend")
+    args = parser.parse_args()
+
+    issuer = TokenIssuer().start()
+    os.environ["COGNITO_JWKS_URL"] = issuer.url
+    dependencies = importlib.import_module("core.dependencies")
+    from fastapi import HTTPException
+
+    tokens = {
+        "valid": issuer.mint("bench"),
+        "expired": issuer.mint("bench", ttl=-60),
+        "wrong kid": issuer.mint("bench", kid="rotated-away"),
+    }
+
+    def verify(token: str):
+        def call():
+            try:
+                dependencies.verify_token(token)
+            except HTTPException:
+                pass
+        return call
+
+    rows = []
+    for name in args.backends or list(dependencies.JWT_BACKENDS):
+        dependencies.JWT_BACKEND = name
+        dependencies.current_jwt_backend.cache_clear()
+        # Re-parse the JWKS with this backend's key type
+        dependencies.jwks_store.refresh()
+        for case, token in tokens.items():
+            rows.append((name, case, "cold", measure(verify(token), args.iterations, before=dependencies._verified_tokens.clear)))
+            if case == "valid":
+                # Only successful verifications are cached
+                rows.append((name, case, "warm", measure(verify(token), args.iterations)))
+        dependencies._verified_tokens.clear()
+    issuer.stop()
+
+    print(f"{'backend':<8}  {'token':<10}  {'cache':<5}  {'verify/s':>10}  {'p50 us':>9}  {'p99 us':>9}")
+    print("-" * 60)
+    for name, case, cache, stats in rows:
+        print(f"{name:<8}  {case:<10}  {cache:<5}  {stats['per_s']:>10.0f}  {stats['p50_us']:>9.1f}  {stats['p99_us']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""
+Load test every router against local stand-ins of DynamoDB, Cognito and Letterboxd.
+
+    pip install -r bench/requirements.txt
+    python -m bench.load --concurrency 1,50,200 --requests 500
+    python -m bench.load --mode http --jwt-backend fast --routes meals,protected
+
+Starts moto (DynamoDB + Cognito), a JWKS endpoint for a local signing key and a
+Letterboxd stub, points the app at them through AWS_ENDPOINT_URL,
+COGNITO_JWKS_URL and LETTERBOXD_DOMAIN, seeds data, then runs each scenario at
+each concurrency level and reports throughput and p50 / p95 / p99 per route.
+
+--mode asgi (default) calls the app in-process through httpx's ASGI transport;
+--mode http serves it with uvicorn on a local port, as in the container image.
+
+--dynamodb threadpool runs the same DynamoDB calls through blocking boto3 in
+Starlette's threadpool, as before the data access layer went async. Compare it
+with the default at 200 concurrent clients in container mode:
+
+    python -m bench.load --mode http --routes meals,movies --concurrency 200 --dynamodb threadpool
+    python -m bench.load --mode http --routes meals,movies --concurrency 200 --dynamodb async
+
+To compare against an older revision, check it out and run the same command:
+the harness only relies on the routes and the environment variables above.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import importlib
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from bench.stubs import MotoStack, TokenIssuer, LetterboxdStub, BENCH_PASSWORD, free_port
+
+
+BENCH_USER = "bench"
+BENCH_EMAIL = "bench@example.com"
+SEED_MEALS = 200
+
+
+class Scenario(NamedTuple):
+    name: str
+    # Builds (method, url, httpx request kwargs) for the i-th request
+    build: Callable[[int], Tuple[str, str, Dict]]
+    ok: Tuple[int, ...] = (200,)
+
+
+class Result(NamedTuple):
+    name: str
+    concurrency: int
+    requests: int
+    seconds: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    errors: int
+    statuses: Dict[str, int]
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def run_scenario(client, scenario: Scenario, requests: int, concurrency: int) -> Result:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    # One iterator shared by every worker; next() never yields, so no index is handed out twice
+    indices = iter(range(requests))
+
+    async def worker():
+        for i in indices:
+            method, url, kwargs = scenario.build(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return Result(
+        name=scenario.name,
+        concurrency=concurrency,
+        requests=requests,
+        seconds=seconds,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p95_ms=percentile(latencies, 95) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+        errors=sum(count for status, count in statuses.items() if status not in scenario.ok),
+        statuses={str(status): count for status, count in statuses.items()},
+    )
+
+
+def format_results(results: List[Result]) -> str:
+    width = max([len(r.name) for r in results] + [len("route")])
+    header = f"{'route':<{width}}  {'conc':>5}  {'reqs':>6}  {'req/s':>9}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'errors':>6}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r.name:<{width}}  {r.concurrency:>5}  {r.requests:>6}  {r.rps:>9.1f}  "
+            f"{r.p50_ms:>8.2f}  {r.p95_ms:>8.2f}  {r.p99_ms:>8.2f}  {r.errors:>6}"
+        )
+    return "\n".join(lines)
+
+
+def meal(i: int, meal_id: Optional[str] = None) -> Dict:
+    return {
+        **({"mealID": meal_id} if meal_id else {}),
+        "mealName": f"Bench meal {i}",
+        "mealType": ("breakfast", "lunch", "dinner", "snack")[i % 4],
+        "eatingOut": i % 3 == 0,
+        "date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00",
+        "note": "load test",
+    }
+
+
+def build_scenarios(meal_ids: List[str], tokens: Dict[str, str], created: List[str], etags: Dict[str, str]) -> List[Scenario]:
+    user = {"Authorization": f"Bearer {tokens['user']}"}
+    admin = {"Authorization": f"Bearer {tokens['admin']}"}
+
+    def create(i):
+        meal_id = str(uuid.uuid4())
+        created.append(meal_id)
+        return "POST", "/meals/", {"json": meal(i, meal_id)}
+
+    def delete(i):
+        # Deletes the meals the POST scenario created; once they run out, a 404 is expected
+        return "DELETE", f"/meals/{created.pop() if created else 'missing'}", {}
+
+    return [
+        Scenario("GET /", lambda i: ("GET", "/", {})),
+        Scenario("GET /meals/", lambda i: ("GET", "/meals/", {})),
+        # Before the write scenarios below change the list and its ETag
+        Scenario("GET /meals/ (If-None-Match)", lambda i: ("GET", "/meals/", {"headers": {"If-None-Match": etags["meals"]}}), ok=(304,)),
+        Scenario("GET /meals/{mealID}", lambda i: ("GET", f"/meals/{meal_ids[i % len(meal_ids)]}", {})),
+        Scenario("POST /meals/", create),
+        Scenario("PUT /meals/{mealID}", lambda i: ("PUT", f"/meals/{meal_ids[i % len(meal_ids)]}", {"json": meal(i)})),
+        Scenario("DELETE /meals/{mealID}", delete, ok=(200, 404)),
+        Scenario("GET /meals/stats", lambda i: ("GET", "/meals/stats", {"params": {"granularity": ("day", "week", "month")[i % 3]}})),
+        Scenario("GET /meals/export", lambda i: ("GET", "/meals/export", {"params": {"format": "ndjson"}})),
+        Scenario("GET /movies/search", lambda i: ("GET", "/movies/search", {"params": {"username": BENCH_USER, "limit": 0}})),
+        Scenario("GET /movies/search?fast", lambda i: ("GET", "/movies/search", {"params": {"username": BENCH_USER, "limit": 0, "fast": True}})),
+        Scenario("GET /movies/search (If-None-Match)", lambda i: ("GET", "/movies/search", {"params": {"username": BENCH_USER, "limit": 0}, "headers": {"If-None-Match": etags["movies"]}}), ok=(304,)),
+        Scenario("GET /movies/traces", lambda i: ("GET", "/movies/traces", {"headers": admin})),
+        Scenario("POST /auth/signin", lambda i: ("POST", "/auth/signin", {"json": {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}})),
+        Scenario("GET /auth/user_details", lambda i: ("GET", "/auth/user_details", {"params": {"email": BENCH_EMAIL}})),
+        Scenario("GET /protected/protected/profile", lambda i: ("GET", "/protected/protected/profile", {"headers": user})),
+        Scenario("GET /protected/protected/admin", lambda i: ("GET", "/protected/protected/admin", {"headers": admin})),
+    ]
+
+
+class VerificationCounter:
+    """
+    Counts verify_token calls so the harness can check auth runs once per request.
+    """
+
+    def __init__(self, dependencies):
+        self.calls = 0
+        self._lock = threading.Lock()
+        verify_token = dependencies.verify_token
+
+        def counted(token):
+            with self._lock:
+                self.calls += 1
+            return verify_token(token)
+
+        dependencies.verify_token = counted
+
+    def reset(self) -> int:
+        with self._lock:
+            calls, self.calls = self.calls, 0
+        return calls
+
+
+class ThreadpoolTable:
+    """
+    A boto3 Table behind the async Table interface the services use: every call runs
+    the blocking boto3 method in Starlette's threadpool, as the sync routes did
+    before the data access layer went async. The --dynamodb threadpool baseline.
+    """
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getattr__(self, name):
+        from starlette.concurrency import run_in_threadpool
+        method = getattr(self._table, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(method, *args, **kwargs)
+
+        return call
+
+    def batch_writer(self, **kwargs):
+        return ThreadpoolBatchWriter(self._table.batch_writer(**kwargs))
+
+
+class ThreadpoolBatchWriter:
+    def __init__(self, writer):
+        self._writer = writer
+
+    async def __aenter__(self):
+        from starlette.concurrency import run_in_threadpool
+        await run_in_threadpool(self._writer.__enter__)
+        return ThreadpoolTable(self._writer)
+
+    async def __aexit__(self, *exc):
+        from starlette.concurrency import run_in_threadpool
+        return await run_in_threadpool(self._writer.__exit__, *exc)
+
+
+class ThreadpoolResource:
+    def __init__(self, resource):
+        self._resource = resource
+
+    async def Table(self, name):
+        return ThreadpoolTable(self._resource.Table(name))
+
+    def __getattr__(self, name):
+        return getattr(ThreadpoolTable(self._resource), name)
+
+
+def use_threadpool_dynamodb(service_modules):
+    """
+    Swap the services' aioboto3 resources for blocking boto3 ones run in the threadpool.
+    """
+    from core.aws import get_resource
+
+    async def get_async_resource(service: str, **config_overrides):
+        return ThreadpoolResource(get_resource(service, **config_overrides))
+
+    for module in service_modules:
+        module.get_async_resource = get_async_resource
+
+
+def start_uvicorn(app):
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def tune_scraper(movies, keep_delays: bool):
+    # The production pacing (3s between batches, 10s after a 429) is there to be
+    # polite to letterboxd.com; against the stub it only stretches the run out.
+    if keep_delays:
+        return
+    movies.SEARCHING_DELAY = 0
+    movies.RETRY_DELAY = 0.2
+    movies.MIN_DELAY = 0.01
+    movies.MAX_DELAY = 0.05
+
+
+async def seed(client) -> List[str]:
+    meal_ids = []
+    for i in range(SEED_MEALS):
+        response = await client.post("/meals/", json=meal(i))
+        response.raise_for_status()
+        meal_ids.append(response.json()["item"]["mealID"])
+    return meal_ids
+
+
+async def measure_scrape(client, letterboxd: LetterboxdStub) -> Dict:
+    """
+    One cold scrape through the API: every list, film and review page plus the cache write.
+    """
+    before = letterboxd.counters()
+    start = time.perf_counter()
+    response = await client.get("/movies/search", params={"username": BENCH_USER, "limit": 0}, timeout=None)
+    seconds = time.perf_counter() - start
+    after = letterboxd.counters()
+    return {
+        "status": response.status_code,
+        "movies": len(response.json()) if response.status_code == 200 else 0,
+        "seconds": round(seconds, 3),
+        "letterboxd_requests": after["requests"] - before["requests"],
+        "letterboxd_429s": after["throttled"] - before["throttled"],
+    }
+
+
+async def run(args, app, modules, letterboxd: LetterboxdStub, tokens: Dict[str, str]) -> Dict:
+    import httpx
+
+    server = None
+    max_concurrency = max(args.concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    if args.mode == "http":
+        server, base_url = start_uvicorn(app)
+        client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    verifications = VerificationCounter(modules["dependencies"])
+    report = {"mode": args.mode, "jwt_backend": modules["dependencies"].JWT_BACKEND, "dynamodb": args.dynamodb, "results": []}
+    try:
+        meal_ids = await seed(client)
+        report["scrape"] = await measure_scrape(client, letterboxd)
+        print(f"cold scrape: {report['scrape']}", file=sys.stderr)
+
+        # Validators for the conditional GET scenarios
+        etags = {
+            "meals": (await client.get("/meals/")).headers.get("etag", ""),
+            "movies": (await client.get("/movies/search", params={"username": BENCH_USER, "limit": 0})).headers.get("etag", ""),
+        }
+
+        created: List[str] = []
+        scenarios = build_scenarios(meal_ids, tokens, created, etags)
+        if args.routes:
+            scenarios = [s for s in scenarios if any(f in s.name for f in args.routes)]
+
+        results = []
+        for scenario in scenarios:
+            for concurrency in args.concurrency:
+                verifications.reset()
+                result = await run_scenario(client, scenario, args.requests, concurrency)
+                calls = verifications.reset()
+                results.append(result)
+                entry = {**result._asdict(), "rps": round(result.rps, 1)}
+                if "protected" in scenario.name or "traces" in scenario.name:
+                    entry["verifications_per_request"] = round(calls / result.requests, 3)
+                report["results"].append(entry)
+                print(f"{scenario.name} @ {concurrency}: {result.rps:.1f} req/s, p99 {result.p99_ms:.2f} ms", file=sys.stderr)
+        report["table"] = format_results(results)
+    finally:
+        await client.aclose()
+        if server is not None:
+            server.should_exit = True
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 50, 200])
+    parser.add_argument("--routes", type=lambda s: s.split(","), default=None, help="Only run scenarios whose name contains one of these")
+    parser.add_argument("--mode", choices=("asgi", "http"), default="asgi")
+    parser.add_argument("--jwt-backend", default=os.getenv("JWT_BACKEND", "jose"))
+    parser.add_argument("--films", type=int, default=120, help="Films in the stub user's diary")
+    parser.add_argument("--letterboxd-latency-ms", type=float, default=20)
+    parser.add_argument("--letterboxd-429-rate", type=float, default=0.02)
+    parser.add_argument("--letterboxd-fixtures", default=None, help="Directory of recorded pages to serve instead of generated ones")
+    parser.add_argument("--keep-scrape-delays", action="store_true", help="Keep the scraper's production batch and retry delays")
+    parser.add_argument("--keep-governor", action="store_true", help="Keep the default Cognito quota share instead of lifting it")
+    parser.add_argument("--dynamodb", choices=("async", "threadpool"), default="async",
+                        help="threadpool runs the same DynamoDB calls through blocking boto3 in the threadpool, the pre-aioboto3 baseline")
+    parser.add_argument("--json", default=None, help="Also write the full report to this file")
+    args = parser.parse_args()
+
+    moto = MotoStack().start()
+    moto.create_user(BENCH_EMAIL)
+    issuer = TokenIssuer().start()
+    letterboxd = LetterboxdStub(
+        films=args.films,
+        latency=args.letterboxd_latency_ms / 1000,
+        rate_429=args.letterboxd_429_rate,
+        fixtures_dir=args.letterboxd_fixtures,
+    ).start()
+
+    # The app reads its configuration at import time, so set it before importing main
+    os.environ.update(moto.environ())
+    os.environ.update({
+        "COGNITO_JWKS_URL": issuer.url,
+        "LETTERBOXD_DOMAIN": letterboxd.url,
+        "JWT_BACKEND": args.jwt_backend,
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    })
+    if not args.keep_governor:
+        # moto has no quotas; lift ours so signin scaling measures the app, not the shedder
+        os.environ.setdefault("COGNITO_QUOTA_SHARE", "1000")
+
+    app = importlib.import_module("main").app
+    modules = {
+        "dependencies": importlib.import_module("core.dependencies"),
+        "movies": importlib.import_module("services.movies"),
+    }
+    tune_scraper(modules["movies"], args.keep_scrape_delays)
+    if args.dynamodb == "threadpool":
+        use_threadpool_dynamodb([modules["movies"]] + [
+            importlib.import_module(name) for name in ("services.meals", "services.movie_access")
+        ])
+
+    tokens = {
+        "user": issuer.mint(BENCH_USER),
+        "admin": issuer.mint("bench-admin", groups=["admin"]),
+    }
+    try:
+        report = asyncio.run(run(args, app, modules, letterboxd, tokens))
+    finally:
+        letterboxd.stop()
+        issuer.stop()
+        moto.stop()
+
+    print(report["table"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({k: v for k, v in report.items() if k != "table"}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Per-film logging overhead of the scraper, before and after structured logging.
+
+"before" replays the three f-string INFO lines the scraper used to emit per film
+through a synchronous StreamHandler. "after" emits the same information with
+sample_event through the queue-backed JSON handler, at INFO (gated off) and at
+DEBUG (sampled).
+
+    python -m bench.log_overhead --films 20000
+"""
+import os
+import time
+import logging
+import argparse
+
+from core import log
+from core.log import sample_event
+
+
+FILM = {
+    "url": "https://letterboxd.com/film/the-conversation/",
+    "title": "The Conversation",
+    "release_year": "1974",
+    "director": ["Francis Ford Coppola"],
+    "review_date": "2024-03-02",
+    "review_text": "Paranoia as a slow, procedural unravelling. " * 4,
+}
+
+
+def before(logger: logging.Logger, films: int):
+    for _ in range(films):
+        film = FILM
+        logger.info(f"Processing movie: {film['url']}")
+        logger.info(f"Processed movie: {film['title']} ({film['release_year'] if film['release_year'] else 'Unknown Year'}) directed by {film['director']}")
+        logger.info(f"Found review from {film['review_date'] if film['review_date'] else 'unknown date'}: {film['review_text'][:50]}...")
+
+
+def after(logger: logging.Logger, films: int):
+    for _ in range(films):
+        film = FILM
+        sample_event(logger, logging.DEBUG, "film_fetch", url=film["url"])
+        sample_event(
+            logger, logging.DEBUG, "film_processed",
+            title=film["title"], release_year=film["release_year"], director=film["director"],
+            has_review=True, review_date=film["review_date"],
+        )
+
+
+def timed(fn, logger, films) -> float:
+    start = time.perf_counter()
+    fn(logger, films)
+    return (time.perf_counter() - start) / films * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--films", type=int, default=20000)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+
+    legacy = logging.getLogger("bench.legacy")
+    legacy.propagate = False
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    legacy.addHandler(handler)
+    legacy.setLevel(logging.INFO)
+    results = {"before (f-string INFO, sync handler)": timed(before, legacy, args.films)}
+
+    log.configure_logging("INFO")
+    # Send the listener's output to /dev/null so terminal speed doesn't skew the numbers
+    for listener_handler in log._listener.handlers:
+        listener_handler.setStream(devnull)
+    structured = logging.getLogger("bench.structured")
+    results["after (INFO, debug events gated off)"] = timed(after, structured, args.films)
+    structured.setLevel(logging.DEBUG)
+    results[f"after (DEBUG, sampled at {log.LOG_SAMPLE_RATE:g})"] = timed(after, structured, args.films)
+
+    width = max(len(name) for name in results)
+    for name, micros in results.items():
+        print(f"{name:<{width}}  {micros:8.2f} us/film")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Size and decode time of a cached movie library, native list vs the compact codec.
+
+For each library size, the cache item is built both ways and measured as DynamoDB
+sees it: item size (which drives RCU / WCU and the 400 KB item limit) and the time
+to turn the GetItem response body back into movie dicts, i.e. JSON parsing, boto3's
+TypeDeserializer and, for the codec, decompression and decoding.
+
+    python -m bench.movie_codec --sizes 100,1000,5000
+"""
+import json
+import time
+import base64
+import argparse
+from typing import Any, Callable, Dict
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from bench.serialization import movie
+from services import movie_codec
+
+
+def attribute_size(value: Dict[str, Any]) -> int:
+    """
+    Approximate DynamoDB size of one attribute value in wire format.
+    """
+    kind, inner = next(iter(value.items()))
+    if kind == "S":
+        return len(inner.encode("utf-8"))
+    if kind == "N":
+        return len(inner.lstrip("-").replace(".", "")) // 2 + 1
+    if kind == "B":
+        return len(base64.b64decode(inner))
+    if kind in ("BOOL", "NULL"):
+        return 1
+    if kind == "L":
+        return 3 + sum(attribute_size(v) + 1 for v in inner)
+    if kind == "M":
+        return 3 + sum(len(k.encode("utf-8")) + attribute_size(v) + 1 for k, v in inner.items())
+    raise ValueError(kind)
+
+
+def item_size(wire: Dict[str, Dict[str, Any]]) -> int:
+    return sum(len(name.encode("utf-8")) + attribute_size(value) for name, value in wire.items())
+
+
+def to_wire(item: Dict[str, Any]) -> Dict[str, Any]:
+    serializer = TypeSerializer()
+    wire = {}
+    for name, value in item.items():
+        encoded = serializer.serialize(value)
+        if "B" in encoded:
+            encoded = {"B": base64.b64encode(encoded["B"]).decode("ascii")}
+        wire[name] = encoded
+    return wire
+
+
+def decode_response(body: str) -> Any:
+    # What boto3 does with a GetItem response, followed by our decode
+    deserializer = TypeDeserializer()
+    wire = json.loads(body)["Item"]
+    item = {}
+    for name, value in wire.items():
+        if "B" in value:
+            value = {"B": base64.b64decode(value["B"])}
+        item[name] = deserializer.deserialize(value)
+    return movie_codec.decode_item(item)
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(",")], default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    compressions = ["zlib"] + (["zstd"] if movie_codec._load_zstd() else [])
+    print(f"{'movies':>6}  {'layout':<16}  {'item KB':>9}  {'fits 400KB':>10}  {'decode ms':>9}")
+    print("-" * 58)
+    for size in args.sizes:
+        movies = [movie(i) for i in range(size)]
+        variants = {"list": {"movies": movies}}
+        for compression in compressions:
+            variants[f"columnar+{compression}"] = {
+                "codec": f"columnar+{compression}",
+                "movies_blob": movie_codec.encode_columnar(movies, compression),
+                "movie_count": size,
+            }
+        for layout, attributes in variants.items():
+            item = {"username": "bench", **attributes, "last_updated": int(time.time()), "is_complete": True}
+            wire = to_wire(item)
+            body = json.dumps({"Item": wire})
+            assert decode_response(body) == movies
+            kb = item_size(wire) / 1024
+            ms = timed(lambda: decode_response(body), args.repeat)
+            print(f"{size:>6}  {layout:<16}  {kb:>9.1f}  {'yes' if kb <= 400 else 'no':>10}  {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
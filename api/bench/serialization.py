@@ -0,0 +1,121 @@
+"""
+Response serialization cost of the movies and meals lists, before and after the
+fast path, at 100, 1,000 and 5,000 items.
+
+"before" is the old read path: build models from the stored dicts, return them
+and let FastAPI validate and encode them again through response_model.
+"after" encodes the stored dicts with orjson into a JSONBytesResponse; for
+meals the encoded body is also cached, which "after, cached body" shows.
+
+    python -m bench.serialization --sizes 100,1000,5000 --requests 50
+
+Each variant is a route on a throwaway app called in-process, so the numbers
+include FastAPI's routing and response handling but no network or DynamoDB.
+"""
+import time
+import asyncio
+import argparse
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import httpx
+from fastapi import FastAPI
+
+from core.serialization import JSONBytesResponse, dumps
+from schemas.meals import MealInfo
+from schemas.movies import MovieResult
+
+
+def movie(i: int) -> Dict:
+    return {
+        "title": f"Bench Film {i}",
+        "letterboxd_url": f"https://letterboxd.com/film/bench-film-{i}/",
+        "poster_url": f"https://a.ltrbxd.com/resized/film-poster/{i}/bench-film-{i}-0-230-0-345-crop.jpg",
+        "rating": "★★★½",
+        "director": [f"Director {i % 40}"],
+        "review": "Measured, patient and better on a rewatch. " * 4 if i % 3 == 0 else None,
+        "release_year": str(1950 + i % 75),
+        "review_date": "2024-03-02" if i % 3 == 0 else None,
+        "review_url": f"https://letterboxd.com/bench/film/bench-film-{i}/",
+    }
+
+
+def meal(i: int) -> Dict:
+    return {
+        "mealID": f"meal-{i}",
+        "mealName": f"Bench meal {i}",
+        "mealType": ("breakfast", "lunch", "dinner", "snack")[i % 4],
+        "eatingOut": i % 3 == 0,
+        "date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00",
+        "note": "load test",
+    }
+
+
+def build_app(movies: List[Dict], meals: List[Dict]) -> FastAPI:
+    app = FastAPI()
+    meals_body = dumps(meals)
+
+    @app.get("/movies/before", response_model=List[MovieResult])
+    async def movies_before():
+        return [MovieResult(**m) for m in movies]
+
+    @app.get("/movies/after", response_model=List[MovieResult], response_class=JSONBytesResponse)
+    async def movies_after():
+        return JSONBytesResponse(dumps(movies))
+
+    @app.get("/meals/before", response_model=List[MealInfo])
+    async def meals_before():
+        return [MealInfo(**{**m, "date": datetime.fromisoformat(m["date"])}) for m in meals]
+
+    @app.get("/meals/after", response_model=List[MealInfo], response_class=JSONBytesResponse)
+    async def meals_after():
+        return JSONBytesResponse(dumps(meals))
+
+    @app.get("/meals/after-cached", response_model=List[MealInfo], response_class=JSONBytesResponse)
+    async def meals_after_cached():
+        return JSONBytesResponse(meals_body)
+
+    return app
+
+
+async def timed(client: httpx.AsyncClient, path: str, requests: int) -> float:
+    await client.get(path)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path)
+        response.raise_for_status()
+    return (time.perf_counter() - start) / requests * 1000
+
+
+async def run(sizes: List[int], requests: int) -> List[tuple]:
+    variants = [
+        ("movies", "before", "/movies/before"),
+        ("movies", "after", "/movies/after"),
+        ("meals", "before", "/meals/before"),
+        ("meals", "after", "/meals/after"),
+        ("meals", "after, cached body", "/meals/after-cached"),
+    ]
+    rows = []
+    for size in sizes:
+        app = build_app([movie(i) for i in range(size)], [meal(i) for i in range(size)])
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for resource, variant, path in variants:
+                rows.append((resource, size, variant, await timed(client, path, requests)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(",")], default=[100, 1000, 5000])
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args.sizes, args.requests))
+    print(f"{'list':<7}  {'items':>6}  {'variant':<18}  {'ms/request':>10}")
+    print("-" * 47)
+    for resource, size, variant, ms in rows:
+        print(f"{resource:<7}  {size:>6}  {variant:<18}  {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+Local stand-ins for everything the API talks to, shared by the benchmarks.
+
+- MotoStack: a moto server for DynamoDB and Cognito, reached through AWS_ENDPOINT_URL
+- TokenIssuer: a locally generated RSA key served as a JWKS, and a token minter for it
+- LetterboxdStub: Letterboxd list, film and review pages with configurable latency and 429s
+
+Requires the packages in bench/requirements.txt.
+"""
+import os
+import json
+import time
+import uuid
+import base64
+import random
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+REGION = "us-east-1"
+BENCH_PASSWORD = "Bench-passw0rd!"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(handler_cls) -> ThreadingHTTPServer:
+    """
+    Run an HTTP handler on a free local port in a daemon thread.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=handler_cls.__name__, daemon=True).start()
+    return server
+
+
+def server_url(server: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8", headers: Dict[str, str] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ---------------------------------------------------------------------------
+# DynamoDB + Cognito
+# ---------------------------------------------------------------------------
+
+class MotoStack:
+    """
+    moto in server mode, so both boto3 and aioboto3 clients reach it over HTTP.
+    """
+
+    def __init__(self, meals_table: str = "bench-meals", stats_table: str = "bench-meals-stats"):
+        self.meals_table = meals_table
+        self.stats_table = stats_table
+        self.url = None
+        self.user_pool_id = None
+        self.app_client_id = None
+        self._server = None
+
+    def start(self) -> "MotoStack":
+        from moto.server import ThreadedMotoServer
+
+        # botocore needs credentials even though moto ignores them
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+        port = free_port()
+        self._server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+        self._server.start()
+        self.url = f"http://127.0.0.1:{port}"
+        self._create_tables()
+        self._create_user_pool()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop()
+
+    def client(self, service: str):
+        import boto3
+        return boto3.client(service, region_name=REGION, endpoint_url=self.url)
+
+    def _create_tables(self):
+        dynamodb = self.client("dynamodb")
+        tables = {
+            self.meals_table: [("mealID", "HASH")],
+            self.stats_table: [("granularity", "HASH"), ("period", "RANGE")],
+            "movies": [("username", "HASH")],
+            "movies-access": [("username", "HASH")],
+        }
+        for name, keys in tables.items():
+            dynamodb.create_table(
+                TableName=name,
+                KeySchema=[{"AttributeName": attr, "KeyType": kind} for attr, kind in keys],
+                AttributeDefinitions=[{"AttributeName": attr, "AttributeType": "S"} for attr, _ in keys],
+                BillingMode="PAY_PER_REQUEST",
+            )
+
+    def _create_user_pool(self):
+        cognito = self.client("cognito-idp")
+        self.user_pool_id = cognito.create_user_pool(PoolName="bench")["UserPool"]["Id"]
+        self.app_client_id = cognito.create_user_pool_client(
+            UserPoolId=self.user_pool_id,
+            ClientName="bench",
+            ExplicitAuthFlows=["ALLOW_USER_PASSWORD_AUTH", "ALLOW_REFRESH_TOKEN_AUTH"],
+        )["UserPoolClient"]["ClientId"]
+
+    def create_user(self, email: str, password: str = BENCH_PASSWORD):
+        """
+        A confirmed user that can sign in with USER_PASSWORD_AUTH.
+        """
+        cognito = self.client("cognito-idp")
+        cognito.admin_create_user(
+            UserPoolId=self.user_pool_id,
+            Username=email,
+            UserAttributes=[
+                {"Name": "email", "Value": email},
+                {"Name": "name", "Value": "Bench User"},
+                {"Name": "phone_number", "Value": "+15555550100"},
+            ],
+            MessageAction="SUPPRESS",
+        )
+        cognito.admin_set_user_password(UserPoolId=self.user_pool_id, Username=email, Password=password, Permanent=True)
+
+    def environ(self) -> Dict[str, str]:
+        """
+        Environment the app reads at import time to use this stack.
+        """
+        return {
+            "AWS_ENDPOINT_URL": self.url,
+            "AWS_REGION_NAME": REGION,
+            "AWS_DEFAULT_REGION": REGION,
+            "TABLE_NAME": self.meals_table,
+            "STATS_TABLE_NAME": self.stats_table,
+            "AWS_COGNITO_USER_POOL_ID": self.user_pool_id,
+            "AWS_COGNITO_APP_CLIENT_ID": self.app_client_id,
+        }
+
+
+# ---------------------------------------------------------------------------
+# JWKS + tokens
+# ---------------------------------------------------------------------------
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _int_b64url(value: int) -> str:
+    return _b64url(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+class TokenIssuer:
+    """
+    Stands in for the user pool's signing key: serves its JWKS and mints RS256
+    access tokens shaped like Cognito's.
+    """
+
+    def __init__(self, kid: str = "bench-key"):
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        self.kid = kid
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self._server = None
+        self.url = None
+
+    def jwks(self) -> Dict[str, Any]:
+        numbers = self._key.public_key().public_numbers()
+        return {"keys": [{
+            "kid": self.kid, "kty": "RSA", "alg": "RS256", "use": "sig",
+            "n": _int_b64url(numbers.n), "e": _int_b64url(numbers.e),
+        }]}
+
+    def start(self) -> "TokenIssuer":
+        body = json.dumps(self.jwks()).encode("utf-8")
+
+        class JWKSHandler(_QuietHandler):
+            def do_GET(self):
+                self.reply(200, body, "application/json")
+
+        self._server = serve(JWKSHandler)
+        self.url = server_url(self._server) + "/.well-known/jwks.json"
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+    def mint(self, username: str = "bench", groups: List[str] = None, ttl: int = 3600, kid: Optional[str] = None, **claims) -> str:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        now = int(time.time())
+        payload = {
+            "sub": str(uuid.uuid5(uuid.NAMESPACE_DNS, username)),
+            "cognito:username": username,
+            "cognito:groups": groups or [],
+            "token_use": "access",
+            "iat": now,
+            "exp": now + ttl,
+            "jti": uuid.uuid4().hex,
+            **claims,
+        }
+        header = {"alg": "RS256", "typ": "JWT", "kid": kid or self.kid}
+        signing_input = f"{_b64url(json.dumps(header).encode())}.{_b64url(json.dumps(payload).encode())}"
+        signature = self._key.sign(signing_input.encode("ascii"), padding.PKCS1v15(), hashes.SHA256())
+        return f"{signing_input}.{_b64url(signature)}"
+
+
+# ---------------------------------------------------------------------------
+# Letterboxd
+# ---------------------------------------------------------------------------
+
+FILMS_PER_PAGE = 72  # Same page size as letterboxd.com list pages
+STARS = ["½", "★", "★½", "★★", "★★½", "★★★", "★★★½", "★★★★", "★★★★½", "★★★★★"]
+
+LIST_PAGE = """<!DOCTYPE html>
+<html lang="en"><head><title>{username}'s films</title></head>
+<body class="films-watched">
+<section class="section col-main">
+<ul class="poster-list -p70 -grid film-list clear">
+{items}
+</ul>
+<div class="pagination">{pagination}</div>
+</section>
+</body></html>
+"""
+
+LIST_ITEM = """<li class="poster-container">
+<div class="really-lazy-load poster film-poster film-poster-{id} linked-film-poster" data-film-id="{id}" data-film-slug="{slug}" data-target-link="/film/{slug}/"><img src="https://s.ltrbxd.com/static/img/empty-poster-70.png" class="image" width="70" height="105" alt="{title}"/></div>
+<p class="poster-viewingdata">{rating}</p>
+</li>"""
+
+FILM_PAGE = """<!DOCTYPE html>
+<html lang="en"><head>
+<meta property="og:title" content="{title} ({year})" />
+<meta property="og:type" content="video.movie" />
+<script type="application/ld+json">
+/* <![CDATA[ */
+{ld_json}
+/* ]]> */
+</script>
+</head>
+<body class="film backdropped">
+<section id="featured-film-header">
+<h1 class="headline-1 filmtitle"><span class="name">{title}</span></h1>
+<p class="credits"><span class="introduction">Directed by</span> <span class="directorlist"><a class="contributor" href="/director/{director_slug}/"><span class="prettify">{director}</span></a></span></p>
+</section>
+<div class="review body-text -prose -hero prettify"><p>{synopsis}</p></div>
+</body></html>
+"""
+
+REVIEW_PAGE = """<!DOCTYPE html>
+<html lang="en"><head>
+<meta property="og:title" content="A review of {title} ({year})" />
+<meta property="og:article:published_time" content="{date}T20:14:05Z" />
+</head>
+<body class="review">
+<div class="review body-text -prose -hero -loose">
+<div class="js-review-body"><p>{review}</p></div>
+</div>
+</body></html>
+"""
+
+
+class LetterboxdStub:
+    """
+    Serves a user's film list, film pages and review pages in Letterboxd's markup.
+
+    Pages are generated from the templates above, which keep the structure of
+    recorded letterboxd.com pages trimmed to the elements the scraper reads.
+    Pass fixtures_dir to serve real recordings instead: a request for
+    /film/parasite/ is answered with fixtures_dir/film/parasite/index.html when
+    that file exists.
+
+    latency adds a fixed delay (seconds) to every response and rate_429 is the
+    fraction of responses replaced with 429 Too Many Requests.
+    """
+
+    def __init__(self, films: int = 200, review_ratio: float = 0.3, latency: float = 0.0,
+                 rate_429: float = 0.0, fixtures_dir: Optional[str] = None, seed: int = 7):
+        self.films = films
+        self.review_ratio = review_ratio
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.fixtures_dir = fixtures_dir
+        self.requests = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self.url = None
+
+    def start(self) -> "LetterboxdStub":
+        stub = self
+
+        class LetterboxdHandler(_QuietHandler):
+            def do_GET(self):
+                stub._handle(self)
+
+        self._server = serve(LetterboxdHandler)
+        self.url = server_url(self._server) + "/"
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "throttled": self.throttled}
+
+    def _handle(self, handler: _QuietHandler):
+        with self._lock:
+            self.requests += 1
+            throttle = self._random.random() < self.rate_429
+            if throttle:
+                self.throttled += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttle:
+            handler.reply(429, b"Too Many Requests", "text/plain", {"Retry-After": "1"})
+            return
+
+        path = handler.path.split("?", 1)[0]
+        body = self._fixture(path) or self._render(path)
+        if body is None:
+            handler.reply(404, b"<html><body>Not found</body></html>")
+        else:
+            handler.reply(200, body)
+
+    def _fixture(self, path: str) -> Optional[bytes]:
+        if not self.fixtures_dir:
+            return None
+        candidate = os.path.join(self.fixtures_dir, path.strip("/"), "index.html")
+        if os.path.isfile(candidate):
+            with open(candidate, "rb") as f:
+                return f.read()
+        return None
+
+    def _render(self, path: str) -> Optional[bytes]:
+        parts = [part for part in path.split("/") if part]
+        if len(parts) >= 4 and parts[1:4] == ["films", "by", "date"]:
+            page = int(parts[5]) if len(parts) >= 6 and parts[4] == "page" else 1
+            return self._list_page(parts[0], page)
+        if len(parts) == 2 and parts[0] == "film":
+            return self._film_page(parts[1])
+        if len(parts) == 3 and parts[1] == "film":
+            return self._review_page(parts[2])
+        return None
+
+    # Everything about film i is derived from i, so pages agree with each other
+    @staticmethod
+    def _slug(i: int) -> str:
+        return f"bench-film-{i}"
+
+    @staticmethod
+    def _index(slug: str) -> Optional[int]:
+        try:
+            return int(slug.rsplit("-", 1)[-1])
+        except ValueError:
+            return None
+
+    def _list_page(self, username: str, page: int) -> bytes:
+        first = (page - 1) * FILMS_PER_PAGE
+        last = min(first + FILMS_PER_PAGE, self.films)
+        items = "\n".join(
+            LIST_ITEM.format(
+                id=i,
+                slug=self._slug(i),
+                title=f"Bench Film {i}",
+                rating=f'<span class="rating rated-{i % 10 + 1}">{STARS[i % 10]}</span>' if i % 7 else "",
+            )
+            for i in range(first, last)
+        )
+        pagination = ""
+        if last < self.films:
+            pagination = f'<a class="next" href="/{username}/films/by/date/page/{page + 1}/">Older</a>'
+        return LIST_PAGE.format(username=username, items=items, pagination=pagination).encode("utf-8")
+
+    def _film_page(self, slug: str) -> Optional[bytes]:
+        i = self._index(slug)
+        if i is None or i >= self.films:
+            return None
+        title = f"Bench Film {i}"
+        year = 1950 + i % 75
+        ld_json = json.dumps({
+            "@context": "http://schema.org",
+            "@type": "Movie",
+            "name": title,
+            "image": f"https://a.ltrbxd.com/resized/film-poster/{i}/{slug}-0-230-0-345-crop.jpg",
+            "datePublished": f"{year}-01-01",
+            "director": [{"@type": "Person", "name": f"Director {i % 40}"}],
+        })
+        return FILM_PAGE.format(
+            title=title,
+            year=year,
+            ld_json=ld_json,
+            director=f"Director {i % 40}",
+            director_slug=f"director-{i % 40}",
+            synopsis="A film generated for load testing. " * 8,
+        ).encode("utf-8")
+
+    def _review_page(self, slug: str) -> Optional[bytes]:
+        i = self._index(slug)
+        if i is None or i >= self.films or (i * 0.618) % 1 >= self.review_ratio:
+            return None
+        return REVIEW_PAGE.format(
+            title=f"Bench Film {i}",
+            year=1950 + i % 75,
+            date=f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            review=f"Review number {i}. " + "Measured, patient and better on a rewatch. " * 6,
+        ).encode("utf-8")
@@ -0,0 +1,145 @@
+import os
+import asyncio
+import logging
+import weakref
+import threading
+from contextlib import AsyncExitStack
+from functools import lru_cache
+
+from core.metrics import instrument_client
+
+
+logger = logging.getLogger(__name__)
+
+AWS_REGION_NAME = os.getenv("AWS_REGION_NAME")
+
+# Defaults applied to every client and resource; tuned for short Lambda requests
+AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "2"))
+AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "5"))
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "4"))
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+
+_lock = threading.Lock()
+
+
+def endpoint_url(service: str):
+    """
+    Endpoint override for local stand-ins (moto, DynamoDB Local, ...).
+    AWS_ENDPOINT_URL_<SERVICE> (e.g. AWS_ENDPOINT_URL_DYNAMODB) wins over AWS_ENDPOINT_URL.
+    """
+    return os.getenv(f"AWS_ENDPOINT_URL_{service.upper().replace('-', '_')}") or os.getenv("AWS_ENDPOINT_URL")
+
+
+def get_config(**overrides):
+    """
+    botocore Config with adaptive retries, connect / read timeouts, pool sizing and
+    TCP keep-alive. Keyword arguments override individual settings.
+    """
+    from botocore.config import Config
+
+    settings = {
+        "region_name": AWS_REGION_NAME,
+        "retries": {"mode": "adaptive", "max_attempts": AWS_MAX_ATTEMPTS},
+        "connect_timeout": AWS_CONNECT_TIMEOUT,
+        "read_timeout": AWS_READ_TIMEOUT,
+        "max_pool_connections": AWS_MAX_POOL_CONNECTIONS,
+        "tcp_keepalive": True,
+    }
+    settings.update(overrides)
+    return Config(**settings)
+
+
+@lru_cache
+def get_session():
+    import boto3
+    return boto3.session.Session(region_name=AWS_REGION_NAME)
+
+
+@lru_cache
+def get_client(service: str, **config_overrides):
+    """
+    Shared low-level client per service (and config override set) from the process session.
+    """
+    # Sessions are not thread-safe when creating clients
+    with _lock:
+        logger.info(f"Creating AWS {service} client")
+        client = get_session().client(
+            service,
+            config=get_config(**config_overrides),
+            endpoint_url=endpoint_url(service),
+        )
+        return instrument_client(client)
+
+
+@lru_cache
+def get_resource(service: str, **config_overrides):
+    """
+    Shared boto3 resource per service (and config override set) from the process session.
+    """
+    with _lock:
+        logger.info(f"Creating AWS {service} resource")
+        resource = get_session().resource(
+            service,
+            config=get_config(**config_overrides),
+            endpoint_url=endpoint_url(service),
+        )
+        instrument_client(resource.meta.client)
+        return resource
+
+
+@lru_cache
+def get_async_session():
+    import aioboto3
+    return aioboto3.Session(region_name=AWS_REGION_NAME)
+
+
+class _LoopResources:
+    """
+    The aioboto3 resources opened on one event loop, and the exit stack that closes them.
+    """
+
+    def __init__(self):
+        self.stack = AsyncExitStack()
+        self.resources = {}
+        self.lock = asyncio.Lock()
+
+
+# aioboto3 resources hold an aiohttp session bound to the event loop that opened it,
+# so they are kept per loop. Keyed weakly on the loop itself: a closed loop's entry
+# goes with it, and a new loop can never be handed a resource bound to an old one.
+_async_resources: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopResources]" = weakref.WeakKeyDictionary()
+
+
+async def get_async_resource(service: str, **config_overrides):
+    """
+    Shared aioboto3 resource per service (and config override set) for the running event loop.
+    Closed by close_async_resources, on app shutdown.
+    """
+    loop = asyncio.get_running_loop()
+    state = _async_resources.get(loop)
+    if state is None:
+        state = _async_resources.setdefault(loop, _LoopResources())
+    key = (service, tuple(sorted(config_overrides.items())))
+    resource = state.resources.get(key)
+    if resource is None:
+        async with state.lock:
+            resource = state.resources.get(key)
+            if resource is None:
+                logger.info(f"Creating async AWS {service} resource")
+                resource = await state.stack.enter_async_context(get_async_session().resource(
+                    service,
+                    config=get_config(**config_overrides),
+                    endpoint_url=endpoint_url(service),
+                ))
+                instrument_client(resource.meta.client)
+                state.resources[key] = resource
+    return resource
+
+
+async def close_async_resources():
+    """
+    Close the running loop's aioboto3 resources and their HTTP sessions.
+    """
+    state = _async_resources.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state.stack.aclose()
@@ -1,43 +1,264 @@
 import os
-import boto3
+import asyncio
+import contextvars
+import math
+import time
+import hashlib
 import logging
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
 from pydantic import EmailStr
 
 
+from core.aws import get_client
+from core.cache import TTLCache
 from schemas.auth import ChangePassword, ConfirmForgotPassword, UserSignin, UserSignup, UserVerify, PhoneVerify
 
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 AWS_REGION_NAME = os.getenv("AWS_REGION_NAME")
 AWS_COGNITO_APP_CLIENT_ID = os.getenv("AWS_COGNITO_APP_CLIENT_ID")
 AWS_COGNITO_USER_POOL_ID = os.getenv("AWS_COGNITO_USER_POOL_ID")
 
-missing_vars = []
-if not AWS_REGION_NAME: missing_vars.append("AWS_REGION_NAME")
-if not AWS_COGNITO_APP_CLIENT_ID: missing_vars.append("AWS_COGNITO_APP_CLIENT_ID")
-if not AWS_COGNITO_USER_POOL_ID: missing_vars.append("AWS_COGNITO_USER_POOL_ID")
 
-if missing_vars:
-    error_msg = f"AWS Cognito configuration missing: {', '.join(missing_vars)}. "
-    error_msg += "For local development, please provide these in your docker run command. "
-    error_msg += "For production, ensure they are set in the Lambda environment variables."
-    logger.error(error_msg)
-    raise ValueError(error_msg)
+def check_cognito_config():
+    """
+    Raise ValueError if the Cognito environment variables are missing.
+    Checked when the client is first created rather than at import, so routes
+    that never touch Cognito still work (and cold starts stay cheap).
+    """
+    missing_vars = []
+    if not AWS_REGION_NAME: missing_vars.append("AWS_REGION_NAME")
+    if not AWS_COGNITO_APP_CLIENT_ID: missing_vars.append("AWS_COGNITO_APP_CLIENT_ID")
+    if not AWS_COGNITO_USER_POOL_ID: missing_vars.append("AWS_COGNITO_USER_POOL_ID")
+
+    if missing_vars:
+        error_msg = f"AWS Cognito configuration missing: {', '.join(missing_vars)}. "
+        error_msg += "For local development, please provide these in your docker run command. "
+        error_msg += "For production, ensure they are set in the Lambda environment variables."
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+
+
+COGNITO_MAX_POOL_CONNECTIONS = int(os.getenv("COGNITO_MAX_POOL_CONNECTIONS", "20"))
+# Threads available to async routes for blocking Cognito calls; kept at or below the
+# connection pool size so every in-flight call gets its own pooled connection
+COGNITO_EXECUTOR_WORKERS = int(os.getenv("COGNITO_EXECUTOR_WORKERS", str(COGNITO_MAX_POOL_CONNECTIONS)))
+COGNITO_CALL_TIMEOUT = float(os.getenv("COGNITO_CALL_TIMEOUT", "10"))
+
+
+# admin_get_user / get_user responses, invalidated when our own routes change the user
+COGNITO_USER_CACHE_TTL = float(os.getenv("COGNITO_USER_CACHE_TTL", "60"))
+COGNITO_USER_CACHE_SIZE = int(os.getenv("COGNITO_USER_CACHE_SIZE", "1024"))
+user_cache = TTLCache(maxsize=COGNITO_USER_CACHE_SIZE, ttl=COGNITO_USER_CACHE_TTL)
+token_user_cache = TTLCache(maxsize=COGNITO_USER_CACHE_SIZE, ttl=COGNITO_USER_CACHE_TTL)
+
+
+def _user_key(email: str):
+    return ("user", email.lower())
+
+
+def _token_key(access_token: str):
+    return ("token", hashlib.sha256(access_token.encode("utf-8")).hexdigest())
+
+
+def invalidate_user(email: str):
+    """
+    Drop cached lookups for a user whose attributes or status just changed.
+    Token lookups can't be mapped back to an email, so they are all dropped.
+    """
+    user_cache.invalidate(_user_key(email))
+    token_user_cache.clear()
+
+
+def get_user_cache_stats():
+    return {
+        "admin_get_user": user_cache.stats(),
+        "get_user": token_user_cache.stats(),
+    }
+
+
+# Cognito's default per-account quotas (requests per second) by quota category.
+# Each container governs itself against COGNITO_QUOTA_SHARE of these.
+COGNITO_QUOTA_SHARE = float(os.getenv("COGNITO_QUOTA_SHARE", "0.5"))
+COGNITO_MAX_QUEUE_WAIT = float(os.getenv("COGNITO_MAX_QUEUE_WAIT", "1"))
+COGNITO_OPERATION_QUOTAS = {
+    # UserAuthentication
+    "InitiateAuth": 120,
+    "AdminInitiateAuth": 120,
+    # UserCreation
+    "SignUp": 50,
+    "ConfirmSignUp": 50,
+    "ResendConfirmationCode": 50,
+    # UserAccountRecovery
+    "ForgotPassword": 30,
+    "ConfirmForgotPassword": 30,
+    # UserRead
+    "AdminGetUser": 120,
+    "GetUser": 120,
+    # UserUpdate
+    "ChangePassword": 25,
+    "GetUserAttributeVerificationCode": 25,
+    "VerifyUserAttribute": 25,
+    # UserToken
+    "GlobalSignOut": 25,
+    # UserPoolResourceRead
+    "DescribeUserPool": 15,
+    "ListUserPools": 15,
+}
+COGNITO_DEFAULT_QUOTA = 25
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Callers either reserve a token (waiting up to
+    max_wait for it) or are told how long until one would be available.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: float = 0) -> float:
+        """
+        Return 0 once a token is taken, or the seconds until one frees up if that exceeds max_wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if wait > max_wait:
+                return wait
+            # Reserve the token now; queued callers push the balance negative
+            self._tokens -= 1
+        if wait:
+            time.sleep(wait)
+        return 0.0
+
+
+class CognitoGovernor:
+    """
+    Client-side quota governor with one token bucket per Cognito operation.
+    Short bursts are queued for up to max_wait; anything beyond that is shed
+    with a 429 and Retry-After before the request ever reaches Cognito.
+    """
+
+    def __init__(self, quotas, default_quota: float, share: float, max_wait: float):
+        self.quotas = quotas
+        self.default_quota = default_quota
+        self.share = share
+        self.max_wait = max_wait
+        self.shed = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, operation: str) -> TokenBucket:
+        bucket = self._buckets.get(operation)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(
+                    operation,
+                    TokenBucket(max(self.quotas.get(operation, self.default_quota) * self.share, 1))
+                )
+        return bucket
+
+    def before_call(self, model, **kwargs):
+        retry_after = self._bucket(model.name).acquire(self.max_wait)
+        if retry_after:
+            # before-call hooks run on the Cognito worker threads
+            with self._lock:
+                self.shed[model.name] = self.shed.get(model.name, 0) + 1
+            logger.warning(f"Shedding Cognito {model.name} call, quota exhausted for {retry_after:.2f}s")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+    def stats(self):
+        with self._lock:
+            return {
+                operation: {"rate": bucket.rate, "shed": self.shed.get(operation, 0)}
+                for operation, bucket in self._buckets.items()
+            }
+
+
+governor = CognitoGovernor(
+    COGNITO_OPERATION_QUOTAS,
+    default_quota=COGNITO_DEFAULT_QUOTA,
+    share=COGNITO_QUOTA_SHARE,
+    max_wait=COGNITO_MAX_QUEUE_WAIT,
+)
+
+
+_executor = ThreadPoolExecutor(max_workers=COGNITO_EXECUTOR_WORKERS, thread_name_prefix="cognito")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_cognito_client():
+    """
+    Process-wide Cognito client, created on first use and reused by every request
+    so warm containers keep their pooled, kept-alive connections.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                check_cognito_config()
+                logger.info(f"Initializing AWS Cognito client with region: {AWS_REGION_NAME}")
+                _client = get_client(
+                    "cognito-idp",
+                    max_pool_connections=COGNITO_MAX_POOL_CONNECTIONS,
+                    read_timeout=COGNITO_CALL_TIMEOUT,
+                )
+                _client.meta.events.register("before-call.cognito-identity-provider", governor.before_call)
+    return _client
 
 
 class AWS_Cognito:
     def __init__(self):
+        self.client = get_cognito_client()
+
+    async def run(self, fn, *args, timeout: float = COGNITO_CALL_TIMEOUT):
+        """
+        Run a blocking Cognito call (or a service method wrapping one) on the dedicated
+        Cognito thread pool so async routes never block the event loop.
+        Raises a 504 if the call does not finish within timeout seconds.
+        """
+        loop = asyncio.get_running_loop()
         try:
-            logger.info(f"Initializing AWS Cognito client with region: {AWS_REGION_NAME}")
-            self.client = boto3.client("cognito-idp", region_name=AWS_REGION_NAME)
-            # Test the client connection
-            self.client.list_user_pools(MaxResults=1)
-            logger.info("Successfully initialized AWS Cognito client")
-        except Exception as e:
-            logger.error(f"Failed to initialize AWS Cognito client: {str(e)}")
+            # Carry the request's context (metrics, auth) into the worker thread
+            call = partial(contextvars.copy_context().run, fn, *args)
+            return await asyncio.wait_for(loop.run_in_executor(_executor, call), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"AWS Cognito call {getattr(fn, '__name__', fn)} timed out after {timeout}s")
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="AWS Cognito request timed out"
+            )
+
+    def health_check(self):
+        """
+        Verify the client can reach the user pool. Kept off the request path.
+        """
+        try:
+            self.client.describe_user_pool(UserPoolId=AWS_COGNITO_USER_POOL_ID)
+            return True
+        except HTTPException:
+            # Shed by the governor (429): throttled locally, not unreachable
             raise
+        except Exception as e:
+            logger.error(f"AWS Cognito health check failed: {str(e)}")
+            return False
 
     def user_signup(self, user: UserSignup):
         try:
@@ -73,6 +294,7 @@ class AWS_Cognito:
             Username=data.email,
             ConfirmationCode=data.confirmation_code,
         )
+        invalidate_user(data.email)
 
         return response
 
@@ -85,10 +307,13 @@ class AWS_Cognito:
         return response
 
     def check_user_exists(self, email: EmailStr):
-        response = self.client.admin_get_user(
-            UserPoolId=AWS_COGNITO_USER_POOL_ID,
-            Username=email
-        )
+        response = user_cache.get(_user_key(email))
+        if response is None:
+            response = self.client.admin_get_user(
+                UserPoolId=AWS_COGNITO_USER_POOL_ID,
+                Username=email
+            )
+            user_cache.set(_user_key(email), response)
 
         return response
 
@@ -109,6 +334,8 @@ class AWS_Cognito:
             ClientId=AWS_COGNITO_APP_CLIENT_ID,
             Username=email
         )
+        # A reset can change the user's status (e.g. RESET_REQUIRED)
+        invalidate_user(email)
 
         return response
 
@@ -119,6 +346,7 @@ class AWS_Cognito:
             ConfirmationCode=data.confirmation_code,
             Password=data.new_password
         )
+        invalidate_user(data.email)
 
         return response
 
@@ -128,6 +356,7 @@ class AWS_Cognito:
             ProposedPassword=data.new_password,
             AccessToken=data.access_token,
         )
+        token_user_cache.invalidate(_token_key(data.access_token))
 
         return response
 
@@ -146,6 +375,8 @@ class AWS_Cognito:
         response = self.client.global_sign_out(
             AccessToken = access_token
         )
+        # Every token of the user is revoked, and the cache is keyed by token
+        token_user_cache.clear()
 
         return response
 
@@ -174,6 +405,7 @@ class AWS_Cognito:
                 AttributeName='phone_number',
                 Code=data.verification_code
             )
+            invalidate_user(data.email)
             logger.info(f"Phone number verified for user: {data.email}")
             return response
         except Exception as e:
@@ -208,9 +440,12 @@ class AWS_Cognito:
         Get user information from an access token
         """
         try:
-            response = self.client.get_user(
-                AccessToken=access_token
-            )
+            response = token_user_cache.get(_token_key(access_token))
+            if response is None:
+                response = self.client.get_user(
+                    AccessToken=access_token
+                )
+                token_user_cache.set(_token_key(access_token), response)
             return response
         except Exception as e:
             logger.error(f"Failed to get user info from token: {str(e)}")
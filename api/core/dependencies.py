@@ -1,76 +1,297 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import boto3
-import jose
-from jose import jwt
-from jose.utils import base64url_decode
+import os
 import json
 import time
+import base64
+import hashlib
 import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict
 
 from core.aws_cognito import AWS_Cognito, AWS_COGNITO_USER_POOL_ID, AWS_REGION_NAME
+from core.cache import TTLCache
+from core.jwks import JWKSKeyStore
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
 
+@lru_cache
 def get_aws_cognito():
     return AWS_Cognito()
 
 
-_jwks_cache = None
-_jwks_cache_timestamp = 0
-_JWKS_CACHE_TIMEOUT = 300 
+class TokenError(Exception):
+    pass
 
-def get_cognito_jwks():
-    global _jwks_cache, _jwks_cache_timestamp
-    current_time = time.time()
-    
-    if _jwks_cache is None or (current_time - _jwks_cache_timestamp) > _JWKS_CACHE_TIMEOUT:
-        logger.info("Refreshing Cognito JWKS cache")
-        keys_url = f'https://cognito-idp.{AWS_REGION_NAME}.amazonaws.com/{AWS_COGNITO_USER_POOL_ID}/.well-known/jwks.json'
-        
+class TokenHeaderError(TokenError):
+    pass
+
+class TokenExpiredError(TokenError):
+    pass
+
+class TokenClaimsError(TokenError):
+    pass
+
+
+class JWTBackend(ABC):
+    """
+    RS256 verification backend. parse_key turns one JWKS entry into whatever key
+    object decode expects; decode raises the TokenError subclasses above.
+
+    Backends only verify the RS256 signature; the claims are checked by check_claims,
+    so JWT_BACKEND never changes which tokens are accepted or how they are refused.
+    """
+    name = None
+
+    @abstractmethod
+    def parse_key(self, jwk: Dict[str, Any]) -> Any:
+        ...
+
+    @abstractmethod
+    def get_unverified_header(self, token: str) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def decode(self, token: str, key: Any) -> Dict[str, Any]:
+        ...
+
+
+def check_claims(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The claim checks every backend applies after the signature: exp, nbf, and that
+    exp / nbf / iat are numbers. aud is not checked (Cognito access tokens have none,
+    ID tokens do), and neither is iss, which the pool's key set already pins.
+    """
+    for claim in ('exp', 'nbf', 'iat'):
+        value = payload.get(claim)
+        if claim in payload and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise TokenClaimsError(f"The {claim} claim must be a number")
+
+    now = time.time()
+    if 'exp' in payload and now >= payload['exp']:
+        raise TokenExpiredError("Signature has expired")
+    if 'nbf' in payload and now < payload['nbf']:
+        raise TokenClaimsError("The token is not yet valid (nbf)")
+    return payload
+
+
+class JoseBackend(JWTBackend):
+    name = "jose"
+
+    def __init__(self):
+        from jose import jwk, jwt
+        self._jwk = jwk
+        self._jwt = jwt
+
+    def parse_key(self, jwk):
+        return self._jwk.construct(jwk, 'RS256')
+
+    def get_unverified_header(self, token):
+        try:
+            return self._jwt.get_unverified_header(token)
+        except self._jwt.JWTError as e:
+            raise TokenHeaderError(str(e))
+
+    def decode(self, token, key):
         try:
-            import urllib.request
-            with urllib.request.urlopen(keys_url) as f:
-                response = f.read().decode('utf-8')
-            _jwks_cache = json.loads(response)
-            _jwks_cache_timestamp = current_time
+            payload = self._jwt.decode(
+                token,
+                key,
+                algorithms=['RS256'],
+                options={
+                    'verify_exp': False,
+                    'verify_nbf': False,
+                    'verify_iat': False,
+                    'verify_aud': False,
+                    'verify_iss': False,
+                    'verify_sub': False,
+                    'verify_jti': False,
+                    'verify_at_hash': False,
+                }
+            )
         except Exception as e:
-            logger.error(f"Failed to fetch JWKS: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error fetching authentication information"
+            raise TokenError(str(e))
+        return check_claims(payload)
+
+
+class PyJWTBackend(JWTBackend):
+    name = "pyjwt"
+
+    def __init__(self):
+        import jwt
+        from jwt.algorithms import RSAAlgorithm
+        self._jwt = jwt
+        self._rsa = RSAAlgorithm
+
+    def parse_key(self, jwk):
+        return self._rsa.from_jwk(json.dumps(jwk))
+
+    def get_unverified_header(self, token):
+        try:
+            return self._jwt.get_unverified_header(token)
+        except self._jwt.PyJWTError as e:
+            raise TokenHeaderError(str(e))
+
+    def decode(self, token, key):
+        try:
+            payload = self._jwt.decode(
+                token,
+                key,
+                algorithms=['RS256'],
+                options={
+                    'verify_exp': False,
+                    'verify_nbf': False,
+                    'verify_iat': False,
+                    'verify_aud': False,
+                    'verify_iss': False,
+                    'verify_sub': False,
+                    'verify_jti': False,
+                }
             )
-    
-    return _jwks_cache
+        except Exception as e:
+            raise TokenError(str(e))
+        return check_claims(payload)
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+class FastRSABackend(JWTBackend):
+    """
+    Minimal RS256 path on top of cryptography: keys are pre-parsed RSA public keys,
+    and decoding is one signature check plus check_claims.
+    """
+    name = "fast"
+
+    def __init__(self):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding, rsa
+        self._hash = hashes.SHA256()
+        self._padding = padding.PKCS1v15()
+        self._rsa = rsa
+
+    def parse_key(self, jwk):
+        n = int.from_bytes(_b64url_decode(jwk['n']), 'big')
+        e = int.from_bytes(_b64url_decode(jwk['e']), 'big')
+        return self._rsa.RSAPublicNumbers(e, n).public_key()
+
+    def get_unverified_header(self, token):
+        try:
+            return json.loads(_b64url_decode(token.split('.', 1)[0]))
+        except Exception as e:
+            raise TokenHeaderError(str(e))
+
+    def decode(self, token, key):
+        try:
+            signing_input, signature = token.rsplit('.', 1)
+            header_segment, payload_segment = signing_input.split('.')
+            if json.loads(_b64url_decode(header_segment)).get('alg') != 'RS256':
+                raise TokenError("Unsupported algorithm")
+            key.verify(_b64url_decode(signature), signing_input.encode('ascii'), self._padding, self._hash)
+            payload = json.loads(_b64url_decode(payload_segment))
+            if not isinstance(payload, dict):
+                raise TokenError("The payload must be a JSON object")
+        except TokenError:
+            raise
+        except Exception as e:
+            raise TokenError(str(e))
+
+        return check_claims(payload)
+
+
+JWT_BACKENDS = {
+    backend.name: backend for backend in (JoseBackend, PyJWTBackend, FastRSABackend)
+}
+
+def get_jwt_backend(name: str) -> JWTBackend:
+    if name not in JWT_BACKENDS:
+        raise ValueError(f"Unknown JWT_BACKEND {name!r}, expected one of {', '.join(JWT_BACKENDS)}")
+    return JWT_BACKENDS[name]()
+
+
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
+
+@lru_cache
+def current_jwt_backend() -> JWTBackend:
+    # Backends import their JWT library on construction, so this defers it to first use
+    return get_jwt_backend(JWT_BACKEND)
+
+# COGNITO_JWKS_URL points verification at a local stand-in (see bench/)
+COGNITO_JWKS_URL = os.getenv(
+    "COGNITO_JWKS_URL",
+    f'https://cognito-idp.{AWS_REGION_NAME}.amazonaws.com/{AWS_COGNITO_USER_POOL_ID}/.well-known/jwks.json'
+)
+
+jwks_store = JWKSKeyStore(
+    COGNITO_JWKS_URL,
+    parse_key=lambda jwk: current_jwt_backend().parse_key(jwk)
+)
+
+# Claims of recently verified tokens, keyed by token hash and expiring at the token's exp
+VERIFIED_TOKEN_CACHE_SIZE = 1024
+_verified_tokens = TTLCache(maxsize=VERIFIED_TOKEN_CACHE_SIZE, ttl=3600)
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+# Users who logged out, with when. GlobalSignOut revokes all of a user's tokens, but
+# they still verify locally until they expire, so tokens of that user issued up to
+# then are refused here, cached or not. Kept per container, like _verified_tokens,
+# for Cognito's longest access token lifetime.
+REVOKED_USERS_CACHE_SIZE = 10000
+_revoked_users = TTLCache(maxsize=REVOKED_USERS_CACHE_SIZE, ttl=86400)
+
+def revoke_user_tokens(token: str):
+    """
+    Refuse every token of this token's user issued until now, e.g. after GlobalSignOut.
+    Only call it once Cognito has accepted the token: its claims are read unverified.
+    """
+    try:
+        sub = json.loads(_b64url_decode(token.split('.')[1])).get('sub')
+    except Exception:
+        return
+    if sub:
+        _revoked_users.set(sub, time.time())
+
+def _check_revoked(payload: Dict[str, Any]):
+    revoked_at = _revoked_users.get(payload.get('sub'))
+    if revoked_at is not None and payload.get('iat', 0) <= revoked_at:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
 
 def verify_token(token):
-    # Get the JWKS from AWS Cognito
-    jwks = get_cognito_jwks()
-    
+    # Skip signature verification for tokens we have already verified
+    cache_key = _token_key(token)
+    payload = _verified_tokens.get(cache_key)
+    if payload is not None:
+        _check_revoked(payload)
+        return payload
+
     # Get the header from the token
     try:
-        header = jwt.get_unverified_header(token)
-    except jose.exceptions.JWTError:
+        header = current_jwt_backend().get_unverified_header(token)
+    except TokenHeaderError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token header"
         )
     
-    rsa_key = {}
-    for key in jwks['keys']:
-        if key['kid'] == header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
-            break
+    # Look up the pre-parsed public key for this kid
+    try:
+        rsa_key = jwks_store.get_key(header.get('kid'))
+    except RuntimeError as e:
+        logger.error(f"Failed to fetch JWKS: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching authentication information"
+        )
     
     if not rsa_key:
         raise HTTPException(
@@ -79,24 +300,13 @@ def verify_token(token):
         )
     
     try:
-        payload = jwt.decode(
-            token,
-            rsa_key,
-            algorithms=['RS256'],
-            audience=None,
-            options={
-                'verify_exp': True,
-                'verify_iat': True,
-            }
-        )
-        
-        return payload
-    except jwt.ExpiredSignatureError:
+        payload = current_jwt_backend().decode(token, rsa_key)
+    except TokenExpiredError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has expired"
         )
-    except jwt.JWTClaimsError:
+    except TokenClaimsError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid claims"
@@ -108,15 +318,39 @@ def verify_token(token):
             detail="Invalid token"
         )
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    _check_revoked(payload)
+    ttl = payload.get('exp', 0) - time.time()
+    if ttl > 0:
+        _verified_tokens.set(cache_key, payload, ttl=ttl)
+    return payload
+
+def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Resolve the caller's auth context once per request.
+    The result is stored on request.state.auth, so router-level and endpoint-level
+    dependencies (or handlers reading request.state) share one verification.
+    """
+    current_user = getattr(request.state, "auth", None)
+    if current_user is not None:
+        return current_user
+
     token = credentials.credentials
     payload = verify_token(token)
     
-    
-    return {
+    current_user = {
         "sub": payload["sub"],
         "email": payload.get("email", ""),
         "username": payload.get("cognito:username", ""),
         "groups": payload.get("cognito:groups", []),
         # Add any other relevant user information from the token
-    }
\ No newline at end of file
+    }
+    request.state.auth = current_user
+    return current_user
+
+def require_admin(current_user: dict = Depends(get_current_user)):
+    if 'admin' not in current_user.get('groups', []):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have access to this resource"
+        )
+    return current_user
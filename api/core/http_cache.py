@@ -0,0 +1,124 @@
+import os
+import gzip
+import hashlib
+from typing import Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from core.cache import TTLCache
+from core.serialization import JSONBytesResponse
+
+
+# Bodies smaller than this are sent uncompressed; the saving isn't worth the CPU
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Close to gzip's speed at a noticeably better ratio
+
+# Compressed bodies keyed by (etag, encoding). ETags are strong and derived from
+# the content, so an entry can never be served for a different body.
+compressed_bodies = TTLCache(maxsize=int(os.getenv("COMPRESSED_BODY_CACHE_SIZE", "64")), ttl=3600)
+
+_brotli = None
+
+
+def _load_brotli():
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag from whatever identifies a representation (a version, a content hash...).
+    """
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode("utf-8"), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def content_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _variant_etag(etag: str, encoding: Optional[str]) -> str:
+    # A compressed body is a different representation, so it gets its own strong ETag
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, and any encoding variant of this body counts
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag or (candidate.startswith(etag[:-1] + "-") and candidate.endswith('"')):
+            return True
+    return False
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+    if "br" in accepted and _load_brotli():
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str, etag: str) -> bytes:
+    key = (etag, encoding)
+    compressed = compressed_bodies.get(key)
+    if compressed is None:
+        if encoding == "br":
+            compressed = _brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        compressed_bodies.set(key, compressed)
+    return compressed
+
+
+def conditional_json(
+    request: Request,
+    etag: str,
+    body: Callable[[], bytes],
+    cache_control: str,
+) -> Response:
+    """
+    Answer a GET for a JSON representation identified by etag.
+
+    If the client already holds it (If-None-Match), return 304 without calling body.
+    Otherwise encode it, compress it when the client accepts gzip / br and it is at
+    least COMPRESSION_MIN_BYTES, and send it with ETag and Cache-Control.
+    """
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+
+    content = body()
+    encoding = None
+    if len(content) >= COMPRESSION_MIN_BYTES:
+        encoding = _choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding:
+        content = _compress(content, encoding, etag)
+        headers["Content-Encoding"] = encoding
+    headers["ETag"] = _variant_etag(etag, encoding)
+    return JSONBytesResponse(content, headers=headers)
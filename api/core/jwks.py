@@ -0,0 +1,95 @@
+import json
+import time
+import logging
+import threading
+import urllib.request
+from typing import Any, Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+JWKS_FETCH_TIMEOUT = 3  # Seconds before giving up on the JWKS endpoint
+JWKS_REFRESH_INTERVAL = 3600  # Background refresh period; Cognito rotates keys rarely
+JWKS_RETRY_INTERVAL = 30  # Background retry period after a failed refresh
+JWKS_MIN_FORCED_REFRESH_INTERVAL = 60  # Unknown kids can force at most one fetch per minute
+JWKS_INITIAL_LOAD_WAIT = 5  # How long a request may wait for the cold start load
+
+
+class JWKSKeyStore:
+    """
+    Public keys from a JWKS endpoint, parsed once (by the active JWT backend) and indexed by kid.
+
+    Keys are loaded at cold start and refreshed by a background thread before
+    they go stale, so verification never waits on the network in steady state.
+    A token signed with an unknown kid forces a single, rate-limited refresh.
+    """
+
+    def __init__(self, url: str, parse_key: Callable[[Dict[str, Any]], Any]):
+        self.url = url
+        self.parse_key = parse_key
+        self._keys: Dict[str, Any] = {}
+        self._loaded = threading.Event()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._thread = None
+
+    def start(self):
+        """
+        Start the background loader. The first fetch happens immediately.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name="jwks-refresh", daemon=True)
+            self._thread.start()
+
+    def refresh(self) -> bool:
+        with urllib.request.urlopen(self.url, timeout=JWKS_FETCH_TIMEOUT) as f:
+            jwks = json.loads(f.read().decode("utf-8"))
+        keys = {key["kid"]: self.parse_key(key) for key in jwks["keys"]}
+        self._keys = keys
+        self._last_refresh = time.monotonic()
+        self._loaded.set()
+        logger.info(f"Loaded {len(keys)} JWKS keys")
+        return True
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                with self._refresh_lock:
+                    self.refresh()
+                delay = JWKS_REFRESH_INTERVAL
+            except Exception as e:
+                logger.error(f"Failed to fetch JWKS: {str(e)}")
+                delay = JWKS_RETRY_INTERVAL
+            time.sleep(delay)
+
+    def _force_refresh(self, kid: str):
+        with self._refresh_lock:
+            # Another request may have refreshed while we waited for the lock
+            if kid in self._keys:
+                return
+            if time.monotonic() - self._last_refresh < JWKS_MIN_FORCED_REFRESH_INTERVAL:
+                return
+            logger.info(f"Unknown JWKS kid {kid}, refreshing keys")
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to fetch JWKS: {str(e)}")
+                # Back off so a failing endpoint is not hit on every request
+                self._last_refresh = time.monotonic()
+
+    def get_key(self, kid: Optional[str]) -> Optional[Any]:
+        """
+        Return the parsed public key for kid, or None if the JWKS does not contain it.
+        Raises RuntimeError if no keys could be loaded at all.
+        """
+        if not self._loaded.is_set():
+            self.start()
+            if not self._loaded.wait(JWKS_INITIAL_LOAD_WAIT):
+                raise RuntimeError("JWKS keys are not available")
+        if kid is None:
+            return None
+        key = self._keys.get(kid)
+        if key is None:
+            self._force_refresh(kid)
+            key = self._keys.get(kid)
+        return key
@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+IN_LAMBDA = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+# Fraction of sampled per-item events (one per film, page, review...) that are kept
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+_configured = False
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line. Outside Lambda this runs on the listener thread, so
+    callers pay for neither the JSON encoding nor the I/O.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        document = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            document.update(fields)
+        if record.exc_info:
+            document["exc"] = self.formatException(record.exc_info)
+        return json.dumps(document, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler runs the whole formatter here, on the caller's thread.
+        # Only snapshot what could change before the listener gets to it: the
+        # message, whose args the caller may mutate, and the traceback.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """
+    Route all logging to a single JSON stdout handler: through a queue to a
+    background thread, or synchronously in Lambda. Safe to call more than once;
+    only the first call applies.
+    """
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JSONFormatter())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if IN_LAMBDA:
+        # Lambda freezes the environment as soon as the handler returns and may
+        # kill it without running atexit, so queued records would be written
+        # during a later invocation or lost, errors and job summaries included
+        root.addHandler(stream)
+    else:
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
+        root.addHandler(_QueueHandler(log_queue))
+
+    root.setLevel(level)
+    # botocore and urllib3 are chatty at DEBUG and not what we want to pay for
+    for noisy in ("botocore", "boto3", "urllib3", "aiobotocore"):
+        logging.getLogger(noisy).setLevel(max(logging.INFO, root.level))
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    """
+    Log a structured event. Gated on the level before anything is built, and the
+    fields are serialized by the formatter rather than interpolated into the message.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+def sample_event(logger: logging.Logger, level: int, event: str, rate: float = None, **fields):
+    """
+    Like log_event, for per-item events: only a `rate` fraction are emitted.
+    """
+    if logger.isEnabledFor(level) and random.random() < (LOG_SAMPLE_RATE if rate is None else rate):
+        logger.log(level, event, extra={"fields": {**fields, "sample_rate": LOG_SAMPLE_RATE if rate is None else rate}})
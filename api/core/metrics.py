@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+IN_LAMBDA = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "FastApiLambda")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for key, value in self._values.items():
+                yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._counts: Dict[Tuple, list] = {}
+        self._sums: Dict[Tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] += value
+
+    def snapshot(self) -> Dict[Tuple, Dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {"buckets": dict(zip(self.buckets + (float("inf"),), counts)), "count": sum(counts), "sum": self._sums[key]}
+                for key, counts in self._counts.items()
+            }
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            for key, counts in self._counts.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    yield f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (le,))} {cumulative}"
+                yield f"{self.name}_sum{_labels(self.labelnames, key)} {self._sums[key]}"
+                yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Registry:
+    """
+    Minimal in-process metrics registry rendered in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labelnames, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status"))
+dependency_latency = registry.histogram(
+    "dependency_call_duration_seconds", "Latency of calls to AWS and outbound dependencies", ("dependency", "operation"))
+dependency_calls = registry.counter(
+    "http_request_dependency_calls_total", "Dependency calls made while serving each route", ("route", "dependency"))
+consumed_capacity = registry.counter(
+    "dynamodb_consumed_capacity_units_total", "DynamoDB capacity units consumed by each route", ("route",))
+outbound_requests = registry.counter(
+    "outbound_requests_total", "Outbound HTTP requests by target", ("target", "status"))
+outbound_bytes = registry.counter(
+    "outbound_response_bytes_total", "Bytes received from outbound HTTP requests", ("target",))
+
+
+class RequestMetrics:
+    """
+    Per-request accumulator. One instance is shared (by reference) with worker
+    threads spawned for the request, so it is updated under a lock.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.latency: Dict[str, float] = defaultdict(float)
+        self.consumed_capacity = 0.0
+        self.outbound_requests = 0
+        self.outbound_bytes = 0
+        self._lock = threading.Lock()
+
+    def record_call(self, dependency: str, seconds: float, capacity: float = 0.0):
+        with self._lock:
+            self.calls[dependency] += 1
+            self.latency[dependency] += seconds
+            self.consumed_capacity += capacity
+
+    def record_outbound(self, size: int):
+        with self._lock:
+            self.outbound_requests += 1
+            self.outbound_bytes += size
+
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar("request_metrics", default=None)
+
+
+def current_request_metrics() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def request_metrics():
+    """
+    Accumulate dependency cost for work outside an HTTP request, e.g. a scheduled job.
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+# ---------------------------------------------------------------------------
+# botocore event hooks
+# ---------------------------------------------------------------------------
+
+# DynamoDB operations that accept ReturnConsumedCapacity
+_CAPACITY_OPERATIONS = {
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems",
+}
+
+
+def _request_consumed_capacity(params, model, **kwargs):
+    if model.name in _CAPACITY_OPERATIONS and "ReturnConsumedCapacity" not in params:
+        params["ReturnConsumedCapacity"] = "TOTAL"
+
+
+def _before_call(context, **kwargs):
+    context["metrics_start"] = time.perf_counter()
+
+
+def _after_call(model, parsed, context, **kwargs):
+    start = context.get("metrics_start")
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    dependency = model.service_model.endpoint_prefix
+    dependency_latency.observe(seconds, dependency=dependency, operation=model.name)
+
+    capacity = 0.0
+    consumed = parsed.get("ConsumedCapacity") if isinstance(parsed, dict) else None
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    for entry in consumed or []:
+        capacity += float(entry.get("CapacityUnits", 0))
+
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.record_call(dependency, seconds, capacity)
+
+
+def instrument_client(client):
+    """
+    Attach latency / consumed capacity hooks to a botocore (or aiobotocore) client.
+    """
+    events = client.meta.events
+    events.register("before-parameter-build.dynamodb", _request_consumed_capacity)
+    events.register("before-call", _before_call)
+    events.register("after-call", _after_call)
+    return client
+
+
+def record_outbound(target: str, status: Any, size: int, seconds: float):
+    """
+    Record one outbound (non-AWS) HTTP request, e.g. to Letterboxd.
+    """
+    outbound_requests.inc(target=target, status=status)
+    outbound_bytes.inc(size, target=target)
+    dependency_latency.observe(seconds, dependency=target, operation="GET")
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.record_outbound(size)
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+def _emf_line(method: str, route: str, status: int, seconds: float, metrics: RequestMetrics) -> str:
+    values = {
+        "Latency": (seconds * 1000, "Milliseconds"),
+        "DynamoDBCalls": (metrics.calls.get("dynamodb", 0), "Count"),
+        "DynamoDBLatency": (metrics.latency.get("dynamodb", 0.0) * 1000, "Milliseconds"),
+        "DynamoDBConsumedCapacity": (metrics.consumed_capacity, "Count"),
+        "CognitoCalls": (metrics.calls.get("cognito-idp", 0), "Count"),
+        "CognitoLatency": (metrics.latency.get("cognito-idp", 0.0) * 1000, "Milliseconds"),
+        "LetterboxdRequests": (metrics.outbound_requests, "Count"),
+        "LetterboxdBytes": (metrics.outbound_bytes, "Bytes"),
+    }
+    document = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Route"]],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in values.items()],
+            }],
+        },
+        "Route": f"{method} {route}",
+        "Status": status,
+    }
+    document.update({name: value for name, (value, _) in values.items()})
+    return json.dumps(document)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and per-dependency cost for every request.
+    Emits one CloudWatch Embedded Metric Format line per request in Lambda and
+    feeds the Prometheus registry (served at /metrics) in container mode.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def _route(self, scope) -> str:
+        """
+        The matched route's full path template, included routers' prefixes and all,
+        so routes declared with the same path in different routers stay apart.
+        """
+        route = scope.get("route")
+        template = getattr(route, "path", None)
+        if template is None:
+            return self._endpoint_routes(scope).get(scope.get("endpoint"), "unmatched")
+        # Newer FastAPI leaves route.path relative to its router: the prefix is the part
+        # of the request path in front of what the route's own pattern matches
+        path = scope.get("path", "")
+        regex = getattr(route, "path_regex", None)
+        if regex is not None and not regex.match(path):
+            for i in range(1, len(path)):
+                if path[i] == "/" and regex.match(path[i:]):
+                    return path[:i] + template
+        return template
+
+    def _endpoint_routes(self, scope) -> Dict[Any, str]:
+        # For frameworks that don't record the matched route in the scope
+        if self._routes is None:
+            self._routes = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint") and hasattr(route, "path")
+            }
+        return self._routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - start
+            _current.reset(token)
+            route = self._route(scope)
+            method = scope["method"]
+            request_latency.observe(seconds, method=method, route=route, status=status)
+            for dependency, count in metrics.calls.items():
+                dependency_calls.inc(count, route=route, dependency=dependency)
+            if metrics.outbound_requests:
+                dependency_calls.inc(metrics.outbound_requests, route=route, dependency="letterboxd")
+            if metrics.consumed_capacity:
+                consumed_capacity.inc(metrics.consumed_capacity, route=route)
+            if IN_LAMBDA:
+                sys.stdout.write(_emf_line(method, route, status, seconds, metrics) + "\n")
+                sys.stdout.flush()
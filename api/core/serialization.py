@@ -0,0 +1,32 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import Response
+
+
+def _default(value: Any):
+    # DynamoDB returns every number as a Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode plain (already validated) data straight to JSON bytes.
+    """
+    return orjson.dumps(content, default=_default)
+
+
+class JSONBytesResponse(Response):
+    """
+    JSON response for data that was validated when it was written. Returning it from a
+    route skips response_model validation and jsonable_encoder; bytes are sent as-is.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,122 @@
+import time
+import uuid
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from core.metrics import registry
+
+
+MAX_TRACES = 50  # Recent traces kept in memory for the admin endpoint
+
+span_duration = registry.histogram(
+    "trace_span_duration_seconds", "Duration of traced spans by name and kind", ("trace", "span", "kind"))
+
+
+class Span:
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            **({"attrs": self.attrs} if self.attrs else {}),
+            **({"children": [child.to_dict(origin) for child in self.children]} if self.children else {}),
+        }
+
+
+class Trace:
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = time.time()
+        self.root = Span(name, attrs)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "complete": self.root.end is not None,
+            **self.root.attrs,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.summary(), "root": self.root.to_dict(self.root.start)}
+
+
+_traces: "OrderedDict[str, Trace]" = OrderedDict()
+_traces_lock = threading.Lock()
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    """
+    Start a trace; spans opened inside it (in this context) become its span tree.
+    """
+    current = Trace(name, attrs)
+    with _traces_lock:
+        _traces[current.id] = current
+        while len(_traces) > MAX_TRACES:
+            _traces.popitem(last=False)
+    trace_token = _current_trace.set(current)
+    span_token = _current_span.set(current.root)
+    try:
+        yield current
+    finally:
+        current.root.end = time.perf_counter()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        span_duration.observe(current.root.duration, trace=name, span=name, kind="")
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a unit of work. Attributes can be added to the yielded span before it closes.
+    Outside a trace the span is still timed into the histogram but not kept.
+    """
+    current = Span(name, attrs)
+    parent = _current_span.get()
+    if parent is not None:
+        parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        active = _current_trace.get()
+        span_duration.observe(
+            current.duration,
+            trace=active.name if active else "",
+            span=name,
+            kind=current.attrs.get("kind", ""),
+        )
+
+
+def recent_traces() -> List[Dict[str, Any]]:
+    with _traces_lock:
+        traces = list(_traces.values())
+    return [t.summary() for t in reversed(traces)]
+
+
+def get_trace(trace_id: str) -> Optional[Dict[str, Any]]:
+    with _traces_lock:
+        current = _traces.get(trace_id)
+    return current.to_dict() if current else None
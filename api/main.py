@@ -1,15 +1,16 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from mangum import Mangum
 from fastapi.middleware.cors import CORSMiddleware
+from core.log import configure_logging
 from routes import meals, movies, base, auth, protected
-import uvicorn
+from core.aws import close_async_resources
+from core.dependencies import jwks_store
+from core.metrics import IN_LAMBDA, MetricsMiddleware, registry
 import logging
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Test log to verify logging is working
@@ -46,8 +47,14 @@ app.add_middleware(
     allow_origins=origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the validator, the /movies/search page cursor and
+    # the users /movies/batch didn't refresh
+    expose_headers=["ETag", "X-Next-Cursor", "X-Deferred-Users"],
 )
 
+# Per-route latency and dependency cost; EMF lines in Lambda, /metrics in containers
+app.add_middleware(MetricsMiddleware)
+
 # Another test log
 logger.info("Configuring routers")
 
@@ -57,9 +64,47 @@ app.include_router(meals.router, prefix="/meals", tags=["Meals"])
 app.include_router(movies.router, prefix="/movies", tags=["Movies"])
 app.include_router(base.router, tags=["Base"])
 
+if not IN_LAMBDA:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.on_event("startup")
+def warm_jwks():
+    # Load Cognito signing keys in the background so the first authenticated request doesn't fetch them
+    jwks_store.start()
+
+
+@app.on_event("shutdown")
+async def close_aws_resources():
+    # Mangum runs startup / shutdown around every invocation, while its event loop
+    # (and so the DynamoDB connections) lives as long as the Lambda environment:
+    # closing them there would reconnect on every request
+    if not IN_LAMBDA:
+        await close_async_resources()
+
+
 logger.info("Application setup complete")
 
-handler = Mangum(app)
+http_handler = Mangum(app)
+
+
+def refresh_handler(event, context):
+    """
+    Scheduled entry point: refresh the stale movie libraries that fit this invocation.
+    """
+    from services.movie_refresh import refresh_stale_movies
+    return refresh_stale_movies(context.get_remaining_time_in_millis)
+
+
+def handler(event, context):
+    # The refresh schedule (an EventBridge rule) invokes the same function as API Gateway
+    if event.get("source") == "aws.events":
+        return refresh_handler(event, context)
+    return http_handler(event, context)
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, debug=True)
@@ -1,40 +1,87 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from schemas.meals import MealInfo
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from schemas.meals import MealInfo, MealStats
+from core.dependencies import require_admin
+from core.http_cache import conditional_json
+from core.serialization import JSONBytesResponse
 from services.meals import (
     get_meal,
     create_meal,
     update_meal,
     delete_meal,
-    get_meals,
-    delete_all_meals
+    get_meals_json,
+    delete_all_meals,
+    get_meal_stats,
+    rebuild_meal_stats,
+    get_cache_stats,
+    export_meals
 )
 
 router = APIRouter()
 
-@router.get("/", response_model=List[MealInfo])
-def get_all_items():
-    return get_meals()
+# Browsers revalidate every time (cheap with the ETag); shared caches such as
+# API Gateway or a CDN may serve the list for as long as the in-process cache would
+MEALS_CACHE_CONTROL = os.getenv("MEALS_CACHE_CONTROL", "public, max-age=0, s-maxage=30, stale-while-revalidate=30")
+
+@router.get("/", response_model=List[MealInfo], response_class=JSONBytesResponse)
+async def get_all_items(request: Request):
+    # Pre-encoded from meals validated at write time; skips response_model serialization
+    body, etag = await get_meals_json()
+    return conditional_json(request, etag, lambda: body, MEALS_CACHE_CONTROL)
+
+@router.get("/stats", response_model=MealStats)
+async def get_stats(
+    granularity: str = Query("day", description="Rollup granularity: day, week or month"),
+    start: Optional[str] = Query(None, description="First period to include, e.g. 2024-01-01, 2024-W01 or 2024-01"),
+    end: Optional[str] = Query(None, description="Last period to include, in the same format as start")
+):
+    """
+    Meal counts, eating-out ratio and per mealType totals from pre-aggregated rollups.
+    Streaks are included for the day granularity.
+    """
+    return await get_meal_stats(granularity, start, end)
+
+@router.post("/stats/rebuild")
+async def rebuild_stats(current_user: dict = Depends(require_admin)):
+    return await rebuild_meal_stats()
+
+@router.get("/export")
+def export_items(format: str = Query("csv", description="Export format: csv, ndjson or parquet")):
+    """
+    Stream every meal out of the table page by page.
+    """
+    media_type, chunks = export_meals(format)
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="meals.{format}"'}
+    )
+
+@router.get("/cache/stats")
+def cache_stats():
+    return get_cache_stats()
 
 @router.get("/{mealID}")
-def get_item(mealID: str):
-    item = get_meal(mealID)
+async def get_item(mealID: str):
+    item = await get_meal(mealID)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     return item
 
 @router.post("/")
-def create_item(item: MealInfo):
-    return create_meal(item)
+async def create_item(item: MealInfo):
+    return await create_meal(item)
 
 @router.put("/{mealID}")
-def update_item(mealID: str, item: MealInfo):
-    return update_meal(mealID, item)
+async def update_item(mealID: str, item: MealInfo):
+    return await update_meal(mealID, item)
 
 @router.delete("/{mealID}")
-def delete_item(mealID: str):
-    return delete_meal(mealID)
+async def delete_item(mealID: str):
+    return await delete_meal(mealID)
 
 @router.delete("/")
-def delete_all_items():
-    return delete_all_meals()
+async def delete_all_items():
+    return await delete_all_meals()
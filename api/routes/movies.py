@@ -1,23 +1,50 @@
-from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+import os
+from fastapi import APIRouter, HTTPException, Query, BackgroundTasks, Depends, Request
 from typing import List, Optional, Dict, Any
 from schemas.movies import (
+    MoviesBatchRequest,
+    MoviesQuery,
     MoviesSearch, 
-    MovieResult
+    MovieResult,
+    MovieStats
 )
 
 from services.movies import (
-    get_movies,
+    get_movies_batch,
+    get_movies_with_version,
+    get_movie_stats,
+    query_movies,
+    query_fingerprint,
     backfill_movies
 )
+from services.movie_stats import movie_stats_body
+from core.dependencies import get_current_user, require_admin
+from core.http_cache import conditional_json, make_etag
+from core.serialization import JSONBytesResponse, dumps
+from core.tracing import recent_traces, get_trace
     
 router = APIRouter()
 
+# Scraped lists change at most every few hours (services.movies.TTL), so shared
+# caches may hold them for minutes and serve stale while they revalidate
+MOVIES_CACHE_CONTROL = os.getenv("MOVIES_CACHE_CONTROL", "public, max-age=60, s-maxage=300, stale-while-revalidate=3600")
 
-@router.get("/search", response_model=List[MovieResult])
-def search_movies(
+
+@router.get("/search", response_model=List[MovieResult], response_class=JSONBytesResponse)
+async def search_movies(
+    request: Request,
     username: str = Query(..., description="Letterboxd username to fetch movies for"),
-    limit: int = Query(10, description="Limit number of movies returned. Use 0 for all movies."),
-    fast: bool = Query(False, description="Return cached data only, don't scrape new movies")
+    limit: int = Query(10, ge=0, description="Limit number of movies returned. Use 0 for all movies."),
+    fast: bool = Query(False, description="Return cached data only, don't scrape new movies"),
+    sort: Optional[str] = Query(None, description="Sort by rating, release_year or review_date. Diary order when unset."),
+    order: str = Query("desc", description="Sort direction: asc or desc"),
+    min_rating: Optional[float] = Query(None, description="Only movies rated at least this many stars, e.g. 4.5"),
+    director: Optional[str] = Query(None, description="Only movies by this director (case-insensitive)"),
+    year_from: Optional[int] = Query(None, description="Only movies released in or after this year"),
+    year_to: Optional[int] = Query(None, description="Only movies released in or before this year"),
+    has_review: Optional[bool] = Query(None, description="Only movies with (true) or without (false) a review"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. title,poster_url"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
 ):
     """
     Get movies for a user.
@@ -25,21 +52,76 @@ def search_movies(
     - username: Letterboxd username (required)
     - limit: Maximum number of movies to return
       - limit=0: Return all movies
-      - limit=n: Return at most n most recent movies
+      - limit=n: Return at most n movies per page
       - If limit > available movies, returns all available movies  
     - fast: Return cached data only (faster, no new scraping)
+    - sort / order, min_rating, director, year_from / year_to, has_review: sort and filter
+    - fields: return only these fields of each movie
+    - cursor: continue after the previous page; the next page's cursor is returned
+      in the X-Next-Cursor header, which is absent on the last page
     """
     # Create search object
     search = MoviesSearch(username=username, fast_mode=fast)
+    query = MoviesQuery(
+        sort=sort,
+        order=order,
+        min_rating=min_rating,
+        director=director,
+        year_from=year_from,
+        year_to=year_to,
+        has_review=has_review,
+        fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None,
+        cursor=cursor,
+        limit=limit,
+    )
     
     # Get all movies
-    movies = get_movies(search)
-    
-    # Handle limit parameter
-    if limit == 0 or limit >= len(movies):
-        return movies
-    else:
-        return movies[:limit]
+    movies, last_updated = await get_movies_with_version(search)
+
+    # Only the requested page is filtered, projected and encoded
+    page, next_cursor = query_movies(username, last_updated, movies, query)
+
+    # The cache item's version and the query identify the body, so a matching
+    # If-None-Match gets a 304 before anything is encoded. Movies were validated when cached.
+    etag = make_etag(username, last_updated, len(movies), query_fingerprint(username, query), limit, cursor)
+    response = conditional_json(request, etag, lambda: dumps(page), MOVIES_CACHE_CONTROL)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+@router.post("/batch", response_model=Dict[str, List[MovieResult]], response_class=JSONBytesResponse)
+async def batch_movies(batch: MoviesBatchRequest):
+    """
+    Movies for several users in one call, keyed by username.
+
+    All cache items are read with a single BatchGetItem, then each user follows the
+    same rules as /search: fast returns cached data only, otherwise a stale or missing
+    user is scraped. At most MOVIES_BATCH_MAX_SCRAPES users (one by default) are
+    scraped per call, to stay inside the gateway timeout; the others are returned as cached (empty if never scraped) and
+    listed in X-Deferred-Users, so the client can ask for them again.
+    limit applies per user (0 for all).
+    """
+    results, deferred = await get_movies_batch(batch.usernames, batch.fast)
+    headers = {"X-Deferred-Users": ",".join(deferred)} if deferred else None
+    return JSONBytesResponse(dumps({
+        username: movies[:batch.limit] if batch.limit > 0 else movies
+        for username, (movies, _) in results.items()
+    }), headers=headers)
+
+
+@router.get("/stats", response_model=MovieStats, response_class=JSONBytesResponse)
+async def movie_stats(
+    request: Request,
+    username: str = Query(..., description="Letterboxd username to get stats for"),
+):
+    """
+    Rating histogram, average rating by decade, top directors and reviews per year,
+    precomputed whenever the user's movies are refreshed. Reads one item.
+    """
+    stats, last_updated = await get_movie_stats(username)
+    etag = make_etag("stats", username, last_updated)
+    return conditional_json(request, etag, lambda: movie_stats_body(stats, last_updated), MOVIES_CACHE_CONTROL)
 
 
 @router.post("/backfill", response_model=Dict[str, Any])
@@ -66,4 +148,21 @@ def backfill_movies_route(username: str, force: bool = False, background_tasks:
         return backfill_movies(username, force)
 
 
+@router.get("/traces", response_model=List[Dict[str, Any]])
+def list_scrape_traces(current_user: dict = Depends(require_admin)):
+    """
+    Recent scrape traces held by this container, newest first.
+    """
+    return recent_traces()
+
 
+@router.get("/traces/{trace_id}", response_model=Dict[str, Any])
+def get_scrape_trace(trace_id: str, current_user: dict = Depends(require_admin)):
+    """
+    Span tree of one scrape: list and rating pages, every request (URL kind, status,
+    bytes, wait time, retries), every parse, batch delays and the DynamoDB write.
+    """
+    scrape_trace = get_trace(trace_id)
+    if not scrape_trace:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return scrape_trace
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
@@ -12,4 +12,23 @@ class MealInfo(BaseModel):
     note: str
 
     class Config:
-        json_encoders = {datetime: lambda dt: dt.isoformat()}
\ No newline at end of file
+        json_encoders = {datetime: lambda dt: dt.isoformat()}
+
+
+class MealStatsBucket(BaseModel):
+    period: str
+    total: int
+    eatingOut: int
+    eatingOutRatio: float
+    mealTypes: Dict[str, int] = {}
+
+
+class MealStats(BaseModel):
+    granularity: str
+    total: int
+    eatingOut: int
+    eatingOutRatio: float
+    mealTypes: Dict[str, int] = {}
+    currentStreak: Optional[int] = None
+    longestStreak: Optional[int] = None
+    buckets: List[MealStatsBucket] = []
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
 class MoviesSearch(BaseModel):
     username: str
@@ -18,3 +18,42 @@ class MovieResult(BaseModel):
 
 class MoviesResult(BaseModel):
     movies: List[MovieResult]
+
+class MoviesBatchRequest(BaseModel):
+    usernames: List[str]
+    fast: bool = False
+    limit: int = Field(default=10, ge=0)  # Per user; 0 for all
+
+class MoviesQuery(BaseModel):
+    sort: Optional[str] = None  # rating, release_year or review_date; diary order when unset
+    order: str = "desc"
+    min_rating: Optional[float] = None
+    director: Optional[str] = None
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    has_review: Optional[bool] = None
+    fields: Optional[List[str]] = None
+    cursor: Optional[str] = None
+    limit: int = 10
+
+class MovieDecadeStats(BaseModel):
+    decade: int
+    movies: int
+    rated: int
+    averageRating: Optional[float] = None
+
+class MovieDirectorStats(BaseModel):
+    director: str
+    movies: int
+    averageRating: Optional[float] = None
+
+class MovieStats(BaseModel):
+    movies: int
+    rated: int
+    reviewed: int
+    averageRating: Optional[float] = None
+    ratingHistogram: Dict[str, int] = {}
+    byDecade: List[MovieDecadeStats] = []
+    topDirectors: List[MovieDirectorStats] = []
+    reviewsPerYear: Dict[str, int] = {}
+    lastUpdated: int
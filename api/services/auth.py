@@ -6,10 +6,9 @@ from pydantic import EmailStr
 
 
 from core.aws_cognito import AWS_Cognito
+from core.dependencies import revoke_user_tokens
 from schemas.auth import ChangePassword, ConfirmForgotPassword, PhoneVerify, UserSignin, UserSignup, UserVerify
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AuthService:
@@ -23,6 +22,8 @@ class AuthService:
                     status_code=409, detail="An account with the given email already exists")
             else:
                 raise HTTPException(status_code=500, detail=f"AWS Cognito error: {e.response['Error']['Message']}")
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error in user_signup: {str(e)}")
             raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -191,6 +192,8 @@ class AuthService:
             else:
                 raise HTTPException(status_code=500, detail="Internal Server")
         else:
+            # GlobalSignOut revoked every token of the user, not just this one
+            revoke_user_tokens(access_token)
             return
 
     def request_phone_verification(email: EmailStr, cognito: AWS_Cognito):
@@ -209,6 +212,8 @@ class AuthService:
                     status_code=429, detail="Too many verification attempts, please try again later")
             else:
                 raise HTTPException(status_code=500, detail=f"AWS Cognito error: {e.response['Error']['Message']}")
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error in request_phone_verification: {str(e)}")
             raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -231,6 +236,8 @@ class AuthService:
                     status_code=404, detail="User not found")
             else:
                 raise HTTPException(status_code=500, detail=f"AWS Cognito error: {e.response['Error']['Message']}")
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error in confirm_phone_verification: {str(e)}")
             raise HTTPException(status_code=500, detail="Internal Server Error")
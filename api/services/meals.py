@@ -1,69 +1,506 @@
-
+import io
 import os
+import csv
+import asyncio
+import json
 import uuid
-import boto3
-from datetime import datetime
-from typing import List, Optional
-from schemas.meals import MealInfo
+import logging
+from collections import defaultdict
+from functools import lru_cache
+from datetime import datetime, date, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from schemas.meals import MealInfo, MealStats, MealStatsBucket
 from fastapi import HTTPException
+from core.aws import get_async_resource, get_resource
+from core.cache import TTLCache
+from core.http_cache import content_etag
+from core.log import log_event
+from core.serialization import dumps
+
+logger = logging.getLogger(__name__)
 
 table_name = os.environ.get("TABLE_NAME", "MyTable")
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(table_name)
+stats_table_name = os.environ.get("STATS_TABLE_NAME", f"{table_name}-stats")
+
+@lru_cache
+def get_table():
+    # Created on first use so cold starts that don't touch meals skip it.
+    # Only the streaming export, which runs in a worker thread, uses the sync table.
+    return get_resource("dynamodb").Table(table_name)
+
+async def get_async_table():
+    return await (await get_async_resource("dynamodb")).Table(table_name)
+
+async def get_async_stats_table():
+    return await (await get_async_resource("dynamodb")).Table(stats_table_name)
+
+# Read-through cache for warm containers. Writes through this module invalidate it;
+# MEALS_CACHE_TTL bounds how stale a read can be after a write from another container.
+MEALS_CACHE_TTL = float(os.environ.get("MEALS_CACHE_TTL", "30"))
+MEALS_CACHE_SIZE = int(os.environ.get("MEALS_CACHE_SIZE", "512"))
+MEALS_LIST_KEY = ("list",)
+MEALS_JSON_KEY = ("list", "json")
+MEAL_FIELDS = ["mealID", "mealName", "mealType", "eatingOut", "date", "note"]  # MealInfo, in order
+cache = TTLCache(maxsize=MEALS_CACHE_SIZE, ttl=MEALS_CACHE_TTL)
+
+# Streaming export
+EXPORT_FIELDS = MEAL_FIELDS
+EXPORT_PAGE_SIZE = 1000  # Items per scan page
+EXPORT_ROW_GROUP_SIZE = 5000  # Rows per parquet row group
+
+# Rollup granularities kept in the stats table, keyed by (granularity, period)
+GRANULARITIES = ("day", "week", "month")
+MEAL_TYPE_PREFIX = "mealType#"
+MEAL_WRITE_ATTEMPTS = 3  # Transactions retried when the meal changed since it was read
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+def _periods(meal_date: datetime) -> Dict[str, str]:
+    """
+    Map a meal date to the period key of each rollup granularity.
+    Periods sort lexicographically within a granularity (2024-01-05, 2024-W01, 2024-01).
+    """
+    iso_year, iso_week, _ = meal_date.isocalendar()
+    return {
+        "day": meal_date.strftime("%Y-%m-%d"),
+        "week": f"{iso_year}-W{iso_week:02d}",
+        "month": meal_date.strftime("%Y-%m"),
+    }
+
+def _rollup_deltas(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, int]]:
+    """
+    Counter changes per (granularity, period) bucket for replacing old with new
+    (either may be None). Buckets the two share are merged, unchanged counters dropped.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for item_data, delta in ((old, -1), (new, 1)):
+        if item_data is None:
+            continue
+        for granularity, period in _periods(_as_datetime(item_data["date"])).items():
+            bucket = deltas[(granularity, period)]
+            bucket["total"] += delta
+            bucket["eatingOut"] += delta if item_data["eatingOut"] else 0
+            bucket[MEAL_TYPE_PREFIX + item_data["mealType"]] += delta
+    return {
+        key: {counter: value for counter, value in counters.items() if value}
+        for key, counters in deltas.items()
+        if any(counters.values())
+    }
+
+def _rollup_updates(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    One ADD per changed bucket, as UpdateItem arguments on the stats table.
+    """
+    updates = []
+    for (granularity, period), counters in _rollup_deltas(old, new).items():
+        fields = list(counters.items())
+        updates.append({
+            "TableName": stats_table_name,
+            "Key": {"granularity": granularity, "period": period},
+            "UpdateExpression": "ADD " + ", ".join(f"#c{i} :c{i}" for i in range(len(fields))),
+            "ExpressionAttributeNames": {f"#c{i}": counter for i, (counter, _) in enumerate(fields)},
+            "ExpressionAttributeValues": {f":c{i}": delta for i, (_, delta) in enumerate(fields)},
+        })
+    return updates
+
+def _unchanged_condition(old: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Condition that a meal is still as read: absent, or with the same rollup fields.
+    """
+    if old is None:
+        return {"ConditionExpression": "attribute_not_exists(mealID)"}
+    return {
+        "ConditionExpression": "#date = :old_date AND #mealType = :old_mealType AND #eatingOut = :old_eatingOut",
+        "ExpressionAttributeNames": {"#date": "date", "#mealType": "mealType", "#eatingOut": "eatingOut"},
+        "ExpressionAttributeValues": {
+            ":old_date": old["date"],
+            ":old_mealType": old["mealType"],
+            ":old_eatingOut": old["eatingOut"],
+        },
+    }
 
-def get_meal(item_id: str) -> Optional[MealInfo]:
-    response = table.get_item(Key={"mealID": item_id})
+MealWrite = Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]
+
+async def _write_meal(item_id: str, plan: Callable[[Optional[Dict[str, Any]]], Optional[MealWrite]]):
+    """
+    Write a meal and its rollup buckets in one TransactWriteItems, so the counters move
+    exactly when the meal does. plan(old) gets the meal as read (None if absent) and
+    returns (Put / Update / Delete, its arguments, the new meal or None), or None to
+    skip the write. The transaction only commits if the meal is still as read, and is
+    planned again from a fresh read when it is not.
+    """
+    from botocore.exceptions import ClientError
+
+    table = await get_async_table()
+    # The resource's client: takes plain Python values, like the Table methods
+    client = (await get_async_resource("dynamodb")).meta.client
+    for attempt in range(MEAL_WRITE_ATTEMPTS):
+        old = (await table.get_item(Key={"mealID": item_id}, ConsistentRead=True)).get("Item")
+        planned = plan(old)
+        if planned is None:
+            return
+        kind, request, new = planned
+        condition = _unchanged_condition(old)
+        meal_write = {"TableName": table_name, **request, "ConditionExpression": condition["ConditionExpression"]}
+        if kind != "Put":
+            meal_write["Key"] = {"mealID": item_id}
+        for field in ("ExpressionAttributeNames", "ExpressionAttributeValues"):
+            if field in condition:
+                meal_write[field] = {**request.get(field, {}), **condition[field]}
+        try:
+            await client.transact_write_items(TransactItems=[
+                {kind: meal_write},
+                *({"Update": update} for update in _rollup_updates(old, new)),
+            ])
+        except ClientError as e:
+            reasons = {reason.get("Code") for reason in e.response.get("CancellationReasons", [])}
+            if not reasons & {"ConditionalCheckFailed", "TransactionConflict"} and e.response["Error"]["Code"] != "TransactionConflictException":
+                raise
+            log_event(logger, logging.INFO, "meal_write_retried", mealID=item_id, attempt=attempt + 1, reasons=sorted(filter(None, reasons)))
+            continue
+        _invalidate(item_id)
+        return
+    raise HTTPException(status_code=409, detail="Meal is being changed concurrently, please retry")
+
+def _invalidate(item_id: str):
+    cache.invalidate(("item", item_id), MEALS_LIST_KEY, MEALS_JSON_KEY)
+
+async def get_meal(item_id: str) -> Optional[MealInfo]:
+    item = cache.get(("item", item_id))
+    if item is not None:
+        return item
+    table = await get_async_table()
+    response = await table.get_item(Key={"mealID": item_id})
     item = response.get("Item")
+    if item is not None:
+        cache.set(("item", item_id), item)
     return item
 
-def create_meal(item: MealInfo):
+async def create_meal(item: MealInfo):
     if not item.mealID:
         item.mealID = str(uuid.uuid4())
     item_data = item.dict()
     item_data["date"] = item_data["date"].isoformat()
-    table.put_item(Item=item_data)
+    # A client supplied mealID may overwrite an existing meal
+    await _write_meal(item.mealID, lambda old: ("Put", {"Item": item_data}, item_data))
     return {"success": True, "item": item}
 
-def update_meal(item_id: str, item: MealInfo):
-    response = table.get_item(Key={"mealID": item_id})
-    if "Item" not in response:
-        raise HTTPException(status_code=404, detail="Item not found")
+async def update_meal(item_id: str, item: MealInfo):
     item_data = item.dict()
     item_data["date"] = item_data["date"].isoformat()
-    table.update_item(
-        Key={"mealID": item_id},
-        UpdateExpression="SET mealName = :mealName, mealType = :mealType, eatingOut = :eatingOut, date = :date, note = :note",
-        ExpressionAttributeValues={
-            ":mealName": item_data["mealName"],
-            ":mealType": item_data["mealType"],
-            ":eatingOut": item_data["eatingOut"],
-            ":date": item_data["date"],
-            ":note": item_data["note"]
-        },
-        ReturnValues="UPDATED_NEW"
-    )
+
+    def write(old):
+        if old is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        update = {
+            "UpdateExpression": "SET mealName = :mealName, #mealType = :mealType, #eatingOut = :eatingOut, #date = :date, note = :note",
+            "ExpressionAttributeNames": {"#date": "date", "#mealType": "mealType", "#eatingOut": "eatingOut"},
+            "ExpressionAttributeValues": {
+                ":mealName": item_data["mealName"],
+                ":mealType": item_data["mealType"],
+                ":eatingOut": item_data["eatingOut"],
+                ":date": item_data["date"],
+                ":note": item_data["note"]
+            },
+        }
+        return "Update", update, item_data
+
+    await _write_meal(item_id, write)
     return {"success": True, "item": item}
 
-def delete_meal(item_id: str):
-    table.delete_item(Key={"mealID": item_id})
+async def delete_meal(item_id: str):
+    await _write_meal(item_id, lambda old: ("Delete", {}, None) if old is not None else None)
     return {"success": True}
 
-def get_meals() -> List[MealInfo]:
-    response = table.scan()
-    items = response.get("Items", [])
-    meal_infos = []
-    for i in items:
-        i["date"] = datetime.fromisoformat(i["date"])
-        meal_infos.append(MealInfo(**i))
-    return meal_infos
-
-def delete_all_meals():
-    response = table.scan()
+async def get_meals() -> List[Dict[str, Any]]:
+    """
+    Every meal as stored. Items were validated as MealInfo when they were written,
+    so they are only projected onto its fields here, not validated again.
+    """
+    meals = cache.get(MEALS_LIST_KEY)
+    if meals is not None:
+        return meals
+    table = await get_async_table()
+    response = await table.scan()
+    meals = [{field: item.get(field) for field in MEAL_FIELDS} for item in response.get("Items", [])]
+    cache.set(MEALS_LIST_KEY, meals)
+    return meals
+
+async def get_meals_json() -> Tuple[bytes, str]:
+    """
+    get_meals encoded as a JSON body, with a strong ETag hashed from it.
+    Both are cached alongside the list.
+    """
+    entry = cache.get(MEALS_JSON_KEY)
+    if entry is None:
+        body = dumps(await get_meals())
+        entry = (body, content_etag(body))
+        cache.set(MEALS_JSON_KEY, entry)
+    return entry
+
+async def delete_all_meals():
+    table = await get_async_table()
+    response = await table.scan()
     items = response.get("Items", [])
     if not items:
         return {"success": True, "message": "No items to delete"}
-    for it in items:
-        table.delete_item(Key={"mealID": it["mealID"]})
+    async with table.batch_writer() as batch:
+        for it in items:
+            await batch.delete_item(Key={"mealID": it["mealID"]})
+    cache.clear()
+    await _clear_meal_stats()
     return {"success": True, "message": "All items deleted"}
 
+def get_cache_stats() -> Dict[str, Any]:
+    return cache.stats()
+
+def _to_bucket(item: Dict[str, Any]) -> MealStatsBucket:
+    total = int(item.get("total", 0))
+    eating_out = int(item.get("eatingOut", 0))
+    meal_types = {
+        name[len(MEAL_TYPE_PREFIX):]: int(count)
+        for name, count in item.items()
+        if name.startswith(MEAL_TYPE_PREFIX) and int(count) > 0
+    }
+    return MealStatsBucket(
+        period=item["period"],
+        total=total,
+        eatingOut=eating_out,
+        eatingOutRatio=eating_out / total if total else 0.0,
+        mealTypes=meal_types,
+    )
+
+def _streaks(days: List[str]) -> Dict[str, int]:
+    """
+    Current and longest run of consecutive days with at least one meal.
+    The current streak counts back from today (or yesterday, if nothing is logged yet today).
+    """
+    longest = 0
+    run = 0
+    previous = None
+    for day in sorted(date.fromisoformat(d) for d in days):
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+
+    current = 0
+    if previous and (date.today() - previous).days <= 1:
+        current = run
+    return {"currentStreak": current, "longestStreak": longest}
+
+async def get_meal_stats(granularity: str = "day", start: Optional[str] = None, end: Optional[str] = None) -> MealStats:
+    """
+    Read pre-aggregated rollups for one granularity.
+    Served by a Query over the stats table, so the cost is proportional to the
+    number of buckets in the range and the meals table is never scanned.
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+    from boto3.dynamodb.conditions import Key
+
+    condition = Key("granularity").eq(granularity)
+    if start and end:
+        condition = condition & Key("period").between(start, end)
+    elif start:
+        condition = condition & Key("period").gte(start)
+    elif end:
+        condition = condition & Key("period").lte(end)
+
+    stats_table = await get_async_stats_table()
+    items = []
+    kwargs = {"KeyConditionExpression": condition}
+    while True:
+        response = await stats_table.query(**kwargs)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    buckets = [_to_bucket(item) for item in items if int(item.get("total", 0)) > 0]
+    totals = defaultdict(int)
+    for bucket in buckets:
+        for meal_type, count in bucket.mealTypes.items():
+            totals[meal_type] += count
+    total = sum(bucket.total for bucket in buckets)
+    eating_out = sum(bucket.eatingOut for bucket in buckets)
+
+    stats = MealStats(
+        granularity=granularity,
+        total=total,
+        eatingOut=eating_out,
+        eatingOutRatio=eating_out / total if total else 0.0,
+        mealTypes=dict(totals),
+        buckets=buckets,
+    )
+    if granularity == "day":
+        streaks = _streaks([bucket.period for bucket in buckets])
+        stats.currentStreak = streaks["currentStreak"]
+        stats.longestStreak = streaks["longestStreak"]
+    return stats
+
+async def _stats_keys() -> List[Dict[str, str]]:
+    stats_table = await get_async_stats_table()
+    keys = []
+    kwargs = {"ProjectionExpression": "granularity, period"}
+    while True:
+        response = await stats_table.scan(**kwargs)
+        keys.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return keys
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+async def _clear_meal_stats():
+    stats_table = await get_async_stats_table()
+    async with stats_table.batch_writer() as batch:
+        for key in await _stats_keys():
+            await batch.delete_item(Key=key)
+
+async def rebuild_meal_stats():
+    """
+    Recompute every rollup bucket from a full scan of the meals table. Admin only:
+    writes keep the counters exact, so this is for repairs after writes that bypassed
+    this service (bulk imports, console edits).
+    Buckets are overwritten in place and only emptied ones deleted, so readers never see
+    the stats cleared. A meal written while the scan runs may still be counted from the
+    scan rather than its own write, so run it while the API is quiet.
+    """
+    table = await get_async_table()
+    rollups = defaultdict(lambda: defaultdict(int))
+    meal_count = 0
+    kwargs = {}
+    while True:
+        response = await table.scan(**kwargs)
+        for item in response.get("Items", []):
+            meal_count += 1
+            for (granularity, period), counters in _rollup_deltas(None, item).items():
+                for counter, value in counters.items():
+                    rollups[(granularity, period)][counter] += value
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    emptied = [key for key in await _stats_keys() if (key["granularity"], key["period"]) not in rollups]
+    stats_table = await get_async_stats_table()
+    async with stats_table.batch_writer() as batch:
+        for (granularity, period), counters in rollups.items():
+            await batch.put_item(Item={"granularity": granularity, "period": period, **counters})
+        for key in emptied:
+            await batch.delete_item(Key=key)
+
+    return {"success": True, "meals": meal_count, "buckets": len(rollups)}
+
+def _scan_pages(page_size: int = EXPORT_PAGE_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield the meals table one scan page at a time so callers never hold more than a page.
+    """
+    kwargs = {"Limit": page_size}
+    while True:
+        response = get_table().scan(**kwargs)
+        yield [{field: item.get(field) for field in EXPORT_FIELDS} for item in response.get("Items", [])]
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+def _export_csv() -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for rows in _scan_pages():
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+def _export_ndjson() -> Iterator[bytes]:
+    for rows in _scan_pages():
+        if rows:
+            yield "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object for ParquetWriter that hands back whatever has been
+    written since the last drain, so each row group can be streamed out as it is flushed.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _load_pyarrow():
+    """
+    Import pyarrow on demand: it is only needed for Parquet, and an image built
+    without it should refuse that format rather than fail mid-stream.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    return pa, pq
+
+def _export_parquet(pa, pq) -> Iterator[bytes]:
+    schema = pa.schema([
+        ("mealID", pa.string()),
+        ("mealName", pa.string()),
+        ("mealType", pa.string()),
+        ("eatingOut", pa.bool_()),
+        ("date", pa.string()),
+        ("note", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    rows = []
+    for page in _scan_pages():
+        rows.extend(page)
+        while len(rows) >= EXPORT_ROW_GROUP_SIZE:
+            group, rows = rows[:EXPORT_ROW_GROUP_SIZE], rows[EXPORT_ROW_GROUP_SIZE:]
+            writer.write_table(pa.Table.from_pylist(group, schema=schema))
+            yield sink.drain()
+    if rows:
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    writer.close()
+    yield sink.drain()
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", _export_csv),
+    "ndjson": ("application/x-ndjson", _export_ndjson),
+    "parquet": ("application/vnd.apache.parquet", _export_parquet),
+}
+
+def export_meals(format: str):
+    """
+    Return (media_type, chunk iterator) for a streaming export of every meal.
+    Memory stays bounded by one scan page (or one parquet row group), whatever the table size.
 
+    That holds for uvicorn (Dockerfile.dev). Behind API Gateway, Mangum collects the whole
+    body before returning it, so the export is held in memory once and is subject to the
+    6 MB Lambda response limit (less after base64 for Parquet); larger tables need the
+    container or an export to S3.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    media_type, exporter = EXPORT_FORMATS[format]
+    if format == "parquet":
+        return media_type, exporter(*_load_pyarrow())
+    return media_type, exporter()
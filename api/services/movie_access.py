@@ -0,0 +1,130 @@
+"""
+How often each user's movies are read, for the background refresh (services/movie_refresh.py).
+
+Reads are counted in process and flushed to the small movies-access table at most every
+ACCESS_FLUSH_INTERVAL seconds, one ADD per user. Counting on the movies item itself
+would cost a write per read, billed on the size of the whole library.
+Counts still pending when a container is recycled are lost: the frequencies are a
+priority hint, not an audit.
+
+Each item also mirrors its library's last_updated (record_update), so the refresh finds
+stale libraries by scanning this table rather than the movies table, whose scans are
+billed on whole libraries. Libraries cached before the mirror existed get it on their
+next scrape or touch.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List
+
+from core.aws import get_async_resource, get_resource
+from core.log import log_event
+
+
+logger = logging.getLogger(__name__)
+
+MOVIES_ACCESS_TABLE = "movies-access"
+ACCESS_FLUSH_INTERVAL = int(os.getenv("MOVIES_ACCESS_FLUSH_SECONDS", "60"))
+
+_pending: Dict[str, int] = {}
+_last_flush = 0.0
+_lock = threading.Lock()
+
+
+@lru_cache
+def get_access_table():
+    return get_resource("dynamodb").Table(MOVIES_ACCESS_TABLE)
+
+
+async def record_access(usernames: Iterable[str]):
+    """
+    Count one read of each user's movies; flushes the pending counts when due.
+    Never raises: a lost count must not fail the read it was counting.
+    """
+    global _last_flush
+    now = time.monotonic()
+    with _lock:
+        for username in usernames:
+            _pending[username] = _pending.get(username, 0) + 1
+        if now - _last_flush < ACCESS_FLUSH_INTERVAL:
+            return
+        counts = dict(_pending)
+        _pending.clear()
+        _last_flush = now
+    await _flush(counts)
+
+
+async def _flush(counts: Dict[str, int]):
+    if not counts:
+        return
+    table = await (await get_async_resource("dynamodb")).Table(MOVIES_ACCESS_TABLE)
+    now = int(time.time())
+    results = await asyncio.gather(*(
+        table.update_item(
+            Key={'username': username},
+            UpdateExpression="ADD access_count :count SET last_accessed = :now, counted_since = if_not_exists(counted_since, :now)",
+            ExpressionAttributeValues={":count": count, ":now": now},
+        )
+        for username, count in counts.items()
+    ), return_exceptions=True)
+    failed = sum(isinstance(result, Exception) for result in results)
+    if failed:
+        log_event(logger, logging.WARNING, "movie_access_flush_failed", users=len(counts), failed=failed)
+
+
+def record_update(username: str, last_updated: int):
+    """
+    Mirror a library's new last_updated onto its access item. Never goes backwards,
+    and never raises: a missed mirror only delays that library's background refresh.
+    """
+    try:
+        get_access_table().update_item(
+            Key={'username': username},
+            UpdateExpression="SET last_updated = :last_updated",
+            ConditionExpression="attribute_not_exists(last_updated) OR last_updated < :last_updated",
+            ExpressionAttributeValues={":last_updated": last_updated},
+        )
+    except Exception as e:
+        log_event(logger, logging.INFO, "movie_access_update_skipped", username=username, reason=str(e))
+
+
+def stale_libraries(cutoff: int) -> List[Dict[str, Any]]:
+    """
+    username, last_updated, access_count and counted_since of every library last
+    updated before cutoff.
+    """
+    table = get_access_table()
+    libraries = []
+    kwargs = {
+        "ProjectionExpression": "username, last_updated, access_count, counted_since",
+        "FilterExpression": "last_updated < :cutoff",
+        "ExpressionAttributeValues": {":cutoff": cutoff},
+    }
+    while True:
+        response = table.scan(**kwargs)
+        libraries.extend(
+            {
+                "username": item["username"],
+                "last_updated": int(item["last_updated"]),
+                "access_count": int(item.get("access_count", 0)),
+                "counted_since": int(item.get("counted_since", 0)),
+            }
+            for item in response.get("Items", [])
+        )
+        if "LastEvaluatedKey" not in response:
+            return libraries
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def reset_access(username: str, seen: int, now: int):
+    """
+    Restart a user's count after a refresh, keeping reads counted since it was scanned.
+    """
+    get_access_table().update_item(
+        Key={'username': username},
+        UpdateExpression="ADD access_count :seen SET counted_since = :now",
+        ExpressionAttributeValues={":seen": -seen, ":now": now},
+    )
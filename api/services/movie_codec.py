@@ -0,0 +1,128 @@
+"""
+Compact storage for cached movie libraries.
+
+By default a library is stored as a native DynamoDB list of maps, which repeats every
+attribute name and URL prefix on every movie. With MOVIES_STORAGE_CODEC=columnar the
+list is stored instead as one Binary attribute: the movies transposed into columns,
+URL columns stored as suffixes of their common prefix, encoded with orjson and
+compressed (zlib, or zstd when the zstandard package is installed and selected).
+
+Items record the codec they were written with, so reads decode either layout, and
+items written before the codec existed (a plain "movies" list) stay readable.
+The default stays "list" for rollout: the prod and dev functions share the movies
+table, and a revision without this module (an older stage, or a rollback) can only
+read the list. Turn the codec on once every function reading the table decodes both.
+"""
+import os
+import zlib
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+
+MOVIES_STORAGE_CODEC = os.getenv("MOVIES_STORAGE_CODEC", "list")  # list or columnar
+MOVIES_STORAGE_COMPRESSION = os.getenv("MOVIES_STORAGE_COMPRESSION", "zlib")  # zlib or zstd
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+COLUMNS = ["title", "letterboxd_url", "poster_url", "rating", "director", "review",
+           "release_year", "review_date", "review_url"]
+URL_COLUMNS = ("letterboxd_url", "poster_url", "review_url")
+
+_zstd = None
+
+
+def _load_zstd():
+    global _zstd
+    if _zstd is None:
+        try:
+            import zstandard
+            _zstd = zstandard
+        except ImportError:
+            _zstd = False
+    return _zstd
+
+
+def _common_prefix(values: List[Optional[str]]) -> str:
+    present = [value for value in values if value]
+    if not present:
+        return ""
+    prefix = os.path.commonprefix(present)
+    # Cut back to a path boundary so the prefix is stable as movies are added
+    return prefix[:prefix.rfind("/") + 1]
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        zstd = _load_zstd()
+        if not zstd:
+            raise RuntimeError("MOVIES_STORAGE_COMPRESSION=zstd requires the zstandard package")
+        return zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        zstd = _load_zstd()
+        if not zstd:
+            raise RuntimeError("Reading zstd-compressed movies requires the zstandard package")
+        return zstd.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def encode_columnar(movies: List[Dict[str, Any]], compression: str = MOVIES_STORAGE_COMPRESSION) -> bytes:
+    columns = {}
+    prefixes = {}
+    for column in COLUMNS:
+        values = [movie.get(column) for movie in movies]
+        if column in URL_COLUMNS:
+            prefix = _common_prefix(values)
+            prefixes[column] = prefix
+            values = [value[len(prefix):] if value else value for value in values]
+        columns[column] = values
+    document = {"count": len(movies), "prefixes": prefixes, "columns": columns}
+    return _compress(orjson.dumps(document), compression)
+
+
+def decode_columnar(blob: bytes, compression: str) -> List[Dict[str, Any]]:
+    document = orjson.loads(_decompress(blob, compression))
+    columns = document["columns"]
+    for column, prefix in document["prefixes"].items():
+        if prefix:
+            columns[column] = [prefix + value if value is not None else None for value in columns[column]]
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name] for name in names))] if document["count"] else []
+
+
+def encode_item(movies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The movie attributes of a cache item, in the configured codec.
+    """
+    if MOVIES_STORAGE_CODEC == "columnar":
+        return {
+            "codec": f"columnar+{MOVIES_STORAGE_COMPRESSION}",
+            "movies_blob": encode_columnar(movies),
+            "movie_count": len(movies),
+        }
+    return {"movies": movies}
+
+
+def decode_item(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    The movies of a cache item, whichever codec wrote it.
+    """
+    codec = item.get("codec")
+    if not codec:
+        return item.get("movies", [])
+    layout, _, compression = codec.partition("+")
+    if layout != "columnar":
+        raise ValueError(f"Unknown movies storage codec {codec!r}")
+    blob = item["movies_blob"]
+    # boto3 wraps binary attributes in boto3.dynamodb.types.Binary
+    return decode_columnar(getattr(blob, "value", blob), compression)
+
+
+def stored_movie_count(item: Dict[str, Any]) -> int:
+    if "movie_count" in item:
+        return int(item["movie_count"])
+    return len(item.get("movies", []))
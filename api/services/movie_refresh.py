@@ -0,0 +1,93 @@
+"""
+Background refresh of stale movie libraries, run on a schedule (see refresh_handler in main.py).
+
+Without it a library is only refreshed when someone reads it after TTL, and that
+caller waits for the scrape. Each run scans the small movies-access table (see
+services/movie_access.py) for libraries older than TTL, ranks them by staleness weighted
+by how often they are read, and refreshes them in that order until the invocation's
+time or Letterboxd request budget runs out.
+"""
+import os
+import time
+import logging
+from typing import Any, Callable, Dict
+
+from core.log import log_event
+from core.metrics import request_metrics
+from services.movie_access import reset_access, stale_libraries
+from services.movie_codec import decode_item
+from services.movies import TTL, get_all_movies, get_table
+
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MAX_USERS = int(os.getenv("MOVIES_REFRESH_MAX_USERS", "20"))  # Libraries refreshed per run
+REFRESH_MAX_REQUESTS = int(os.getenv("MOVIES_REFRESH_MAX_REQUESTS", "600"))  # Letterboxd requests per run
+REFRESH_TIME_RESERVE = 20  # Seconds left unused at the end of an invocation
+REFRESH_FIRST_ESTIMATE = 60  # Seconds budgeted for a refresh before one has been timed
+MAX_STALENESS = 28  # In TTLs (a week); older than that is no more urgent
+
+
+def refresh_priority(now: int, last_updated: int, access_count: int, counted_since: int) -> float:
+    """
+    Staleness in TTLs, weighted by reads per TTL since the count was last reset, so a
+    popular library is refreshed before it is much past TTL and a library nobody
+    reads is still refreshed eventually.
+    """
+    staleness = min((now - last_updated) / TTL, MAX_STALENESS)
+    window = max(now - counted_since, TTL) if counted_since else TTL
+    return staleness * (1 + access_count * TTL / window)
+
+
+def refresh_stale_movies(remaining_ms: Callable[[], int]) -> Dict[str, Any]:
+    """
+    Refresh the highest-priority stale libraries that fit the budget. remaining_ms is
+    the time left in the invocation (Lambda's context.get_remaining_time_in_millis).
+    """
+    now = int(time.time())
+    candidates = sorted(
+        stale_libraries(now - TTL),
+        key=lambda library: refresh_priority(
+            now, library["last_updated"], library["access_count"], library["counted_since"]),
+        reverse=True,
+    )
+
+    refreshed, failed = [], []
+    slowest = 0.0
+    stopped = "done"
+    with request_metrics() as metrics:
+        for library in candidates:
+            username = library["username"]
+            if len(refreshed) + len(failed) >= REFRESH_MAX_USERS:
+                stopped = "users"
+                break
+            if metrics.outbound_requests >= REFRESH_MAX_REQUESTS:
+                stopped = "requests"
+                break
+            if remaining_ms() / 1000 - REFRESH_TIME_RESERVE < (slowest or REFRESH_FIRST_ESTIMATE):
+                stopped = "time"
+                break
+
+            started = time.perf_counter()
+            try:
+                item = get_table().get_item(Key={'username': username}).get('Item')
+                if not item:
+                    continue
+                get_all_movies(username, existing_movies=decode_item(item), last_updated=int(item.get('last_updated', 0)))
+                if library["access_count"]:
+                    reset_access(username, library["access_count"], int(time.time()))
+                refreshed.append(username)
+            except Exception as e:
+                logger.error(f"Error refreshing movies for {username}: {e}")
+                failed.append(username)
+            slowest = max(slowest, time.perf_counter() - started)
+
+    summary = {
+        "stale": len(candidates),
+        "refreshed": len(refreshed),
+        "failed": len(failed),
+        "stopped": stopped,
+        "letterboxd_requests": metrics.outbound_requests,
+    }
+    log_event(logger, logging.INFO, "movies_refresh", **summary, users=refreshed)
+    return summary
@@ -0,0 +1,118 @@
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+
+TOP_DIRECTORS = 10
+UNKNOWN_DIRECTOR = "Unknown Director"  # What the scraper records when a page has no credits
+
+
+def _year(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+def compute_movie_stats(movies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate a movie library with Arrow compute kernels: star strings become numbers
+    ("★★★½" -> 3.5) column-wise, then histogram, per-decade, per-director and
+    per-review-year aggregates are computed without a Python loop over the movies.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    stars = pa.array([m.get("rating") or None for m in movies], type=pa.string())
+    ratings = pc.add(
+        pc.cast(pc.count_substring(stars, "★"), pa.float64()),
+        pc.if_else(pc.match_substring(stars, "½"), 0.5, 0.0),
+    )
+    # Anything without a star is not a rating
+    ratings = pc.if_else(pc.greater(ratings, 0), ratings, pa.scalar(None, pa.float64()))
+    years = pa.array([_year(m.get("release_year")) for m in movies], type=pa.int32())
+    decades = pc.multiply(pc.divide(years, 10), 10)
+    count_all = pc.CountOptions(mode="all")
+
+    histogram = {
+        f"{bucket['values']:.1f}": bucket["counts"]
+        for bucket in pc.value_counts(ratings).to_pylist()
+        if bucket["values"] is not None
+    }
+
+    by_decade = pa.table({
+        "decade": decades,
+        "rating": ratings,
+        "rated": pc.cast(pc.is_valid(ratings), pa.int64()),
+    }).group_by("decade").aggregate([
+        ("rating", "count", count_all),
+        ("rating", "mean"),
+        ("rated", "sum"),
+    ])
+    decades_out = sorted(
+        (
+            {"decade": decade, "movies": count, "rated": rated, "averageRating": _round(mean)}
+            for decade, count, mean, rated in zip(
+                by_decade["decade"].to_pylist(),
+                by_decade["rating_count"].to_pylist(),
+                by_decade["rating_mean"].to_pylist(),
+                by_decade["rated_sum"].to_pylist(),
+            )
+            if decade is not None
+        ),
+        key=lambda bucket: bucket["decade"],
+    )
+
+    directors = pa.array([m.get("director") or [] for m in movies], type=pa.list_(pa.string()))
+    credits = pa.table({
+        "director": pc.list_flatten(directors),
+        "rating": pc.take(ratings, pc.list_parent_indices(directors)),
+    })
+    credits = credits.filter(pc.not_equal(credits["director"], UNKNOWN_DIRECTOR))
+    by_director = credits.group_by("director").aggregate([
+        ("rating", "count", count_all),
+        ("rating", "mean"),
+    ]).sort_by([("rating_count", "descending"), ("director", "ascending")]).slice(0, TOP_DIRECTORS)
+    top_directors = [
+        {"director": director, "movies": count, "averageRating": _round(mean)}
+        for director, count, mean in zip(
+            by_director["director"].to_pylist(), by_director["rating_count"].to_pylist(), by_director["rating_mean"].to_pylist())
+    ]
+
+    reviewed = pc.is_valid(pa.array([m.get("review") or None for m in movies], type=pa.string()))
+    review_dates = pc.filter(pa.array([m.get("review_date") for m in movies], type=pa.string()), reviewed)
+    reviews_per_year = {
+        bucket["values"]: bucket["counts"]
+        for bucket in pc.value_counts(pc.utf8_slice_codeunits(review_dates, 0, 4)).to_pylist()
+        if bucket["values"]
+    }
+
+    return {
+        "movies": len(movies),
+        "rated": pc.count(ratings).as_py(),
+        "reviewed": pc.sum(pc.cast(reviewed, pa.int64())).as_py() or 0,
+        "averageRating": _round(pc.mean(ratings).as_py()),
+        "ratingHistogram": dict(sorted(histogram.items())),
+        "byDecade": decades_out,
+        "topDirectors": top_directors,
+        "reviewsPerYear": dict(sorted(reviews_per_year.items())),
+    }
+
+
+def encode_movie_stats(movies: List[Dict[str, Any]]) -> str:
+    """
+    The stats document as stored on the cache item: JSON text. It doesn't carry
+    lastUpdated, which moves on its own when a refresh finds nothing new.
+    """
+    return orjson.dumps(compute_movie_stats(movies)).decode("utf-8")
+
+
+def movie_stats_body(stats: str, last_updated: int) -> bytes:
+    """
+    The /movies/stats response: the stored document plus the item's last_updated.
+    """
+    return orjson.dumps({**orjson.loads(stats), "lastUpdated": int(last_updated)})
@@ -1,25 +1,53 @@
+import os
 import time
 import json
-import boto3
-import requests
+import base64
+import hashlib
+import asyncio
 import logging
 import random
-import asyncio
-import aiohttp
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, List, Tuple, Dict, Any
-from bs4 import BeautifulSoup
-from schemas.movies import MoviesSearch, MovieResult
+from functools import lru_cache
+from typing import Optional, List, Tuple, Dict, Any, TYPE_CHECKING
+from fastapi import HTTPException
+from core.aws import get_async_resource, get_resource
+from core.cache import TTLCache
+from core.log import log_event, sample_event
+from core.metrics import record_outbound
+from core.tracing import span, trace
+from services.movie_access import record_access, record_update
+from services.movie_codec import decode_item, encode_item, stored_movie_count
+from services.movie_stats import encode_movie_stats
+from schemas.movies import MoviesQuery, MoviesSearch, MovieResult
+
+if TYPE_CHECKING:
+    import requests
+    from bs4 import BeautifulSoup
 
 
 # Get a logger for this module
 logger = logging.getLogger(__name__)
 
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table("movies")
 
+MOVIES_TABLE = "movies"
+
+
+@lru_cache
+def get_table():
+    # Created on first use so cold starts that don't touch movies skip it
+    return get_resource("dynamodb").Table(MOVIES_TABLE)
+
+
+async def get_async_table():
+    return await (await get_async_resource("dynamodb")).Table(MOVIES_TABLE)
 
-DOMAIN = "https://letterboxd.com/"
+
+def _soup(content: bytes, kind: str) -> "BeautifulSoup":
+    from bs4 import BeautifulSoup
+    with span("parse", kind=kind, bytes=len(content)):
+        return BeautifulSoup(content, "html.parser")
+
+
+DOMAIN = os.getenv("LETTERBOXD_DOMAIN", "https://letterboxd.com/")
 # 6 hours   
 TTL = 21600
 
@@ -33,46 +61,95 @@ REQUEST_TIMEOUT = 30  # Timeout for individual requests
 BATCH_SIZE = 5  # Process movies in smaller batches
 MAX_MOVIES_PER_REQUEST = 50  # Limit movies processed per API call
 
-def make_request(url: str, retries: int = MAX_RETRIES) -> Optional[requests.Response]:
+# POST /movies/batch
+BATCH_MAX_USERS = 100  # Usernames per request
+BATCH_GET_CHUNK = 40  # Keys per BatchGetItem: 40 items of up to 400 KB stay under its 16 MB cap
+BATCH_MAX_ATTEMPTS = 5  # BatchGetItem calls in a row that read nothing before giving up
+BATCH_RETRY_BASE_DELAY = 0.05  # Seconds, doubled on every retry
+# Only what _resolve_movies reads: the movies in either storage layout and their freshness
+BATCH_GET_PROJECTION = {
+    "ProjectionExpression": "#username, #last_updated, #is_complete, #movies, #codec, #movies_blob",
+    "ExpressionAttributeNames": {
+        f"#{name}": name for name in ("username", "last_updated", "is_complete", "movies", "codec", "movies_blob")
+    },
+}
+# A scrape can take most of API Gateway's 29s integration timeout, so a batch scrapes
+# at most this many users and serves the others whatever is cached
+BATCH_MAX_SCRAPES = int(os.getenv("MOVIES_BATCH_MAX_SCRAPES", "1"))
+
+def _url_kind(url: str) -> str:
+    """
+    Classify a Letterboxd URL for tracing: list page, film page or review page.
+    """
+    parts = [part for part in url[len(DOMAIN):].split('/') if part] if url.startswith(DOMAIN) else []
+    if len(parts) >= 2 and parts[1] == 'films':
+        return 'list'
+    if parts and parts[0] == 'film':
+        return 'film'
+    if len(parts) >= 2 and parts[1] == 'film':
+        return 'review'
+    return 'other'
+
+def make_request(url: str, retries: int = MAX_RETRIES) -> Optional["requests.Response"]:
     """
     Make a request with rate limiting to avoid 429 errors
     """
-    for attempt in range(retries + 1):
+    import requests
+
+    with span("request", kind=_url_kind(url), url=url) as request_span:
+        waited = 0.0
+        attempt = 0
+        response = None
         try:
-            # Random delay between requests to avoid detection
-            if attempt > 0:
-                delay = random.uniform(MIN_DELAY, MAX_DELAY)
-                logger.info(f"Waiting {delay:.2f} seconds before request")
-                time.sleep(delay)
+            for attempt in range(retries + 1):
+                try:
+                    # Random delay between requests to avoid detection
+                    if attempt > 0:
+                        delay = random.uniform(MIN_DELAY, MAX_DELAY)
+                        log_event(logger, logging.DEBUG, "request_delay", delay_s=round(delay, 3), url=url)
+                        time.sleep(delay)
+                        waited += delay
+                    
+                    started = time.perf_counter()
+                    response = requests.get(
+                        url,
+                        headers={
+                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                            'Accept-Language': 'en-US,en;q=0.9',
+                            'Referer': DOMAIN,
+                        },
+                        timeout=REQUEST_TIMEOUT
+                    )
+                    record_outbound("letterboxd", response.status_code, len(response.content), time.perf_counter() - started)
+                    
+                    if response.status_code == 429:
+                        if attempt < retries:
+                            logger.warning(f"Rate limited (429), waiting {RETRY_DELAY} seconds before retry {attempt+1}/{retries}")
+                            time.sleep(RETRY_DELAY)
+                            waited += RETRY_DELAY
+                        else:
+                            logger.error(f"Rate limited (429) after {retries} retries, giving up on {url}")
+                            return None
+                    else:
+                        return response
+                        
+                except Exception as e:
+                    logger.error(f"Error making request to {url}: {e}")
+                    response = None
+                    if attempt < retries:
+                        time.sleep(RETRY_DELAY)
+                        waited += RETRY_DELAY
+                    else:
+                        return None
             
-            response = requests.get(
-                url,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Referer': DOMAIN,
-                },
-                timeout=REQUEST_TIMEOUT
+            return None
+        finally:
+            request_span.attrs.update(
+                status=response.status_code if response is not None else None,
+                bytes=len(response.content) if response is not None else 0,
+                wait_s=round(waited, 3),
+                retries=attempt,
             )
-            
-            if response.status_code == 429:
-                if attempt < retries:
-                    logger.warning(f"Rate limited (429), waiting {RETRY_DELAY} seconds before retry {attempt+1}/{retries}")
-                    time.sleep(RETRY_DELAY)
-                else:
-                    logger.error(f"Rate limited (429) after {retries} retries, giving up on {url}")
-                    return None
-            else:
-                return response
-                
-        except Exception as e:
-            logger.error(f"Error making request to {url}: {e}")
-            if attempt < retries:
-                time.sleep(RETRY_DELAY)
-            else:
-                return None
-    
-    return None
 
 def get_all_movie_urls(username: str, max_pages: int = 20) -> List[str]:
     """
@@ -87,7 +164,7 @@ def get_all_movie_urls(username: str, max_pages: int = 20) -> List[str]:
     current_url = base_url
     
     while current_page <= max_pages:
-        logger.info(f"Fetching page {current_page}: {current_url}")
+        log_event(logger, logging.DEBUG, "list_page_fetch", page=current_page, url=current_url)
         
         try:
             response = make_request(current_url)
@@ -95,7 +172,7 @@ def get_all_movie_urls(username: str, max_pages: int = 20) -> List[str]:
                 logger.error(f"Error retrieving URL: {current_url}, status: {response.status_code if response else 'None'}")
                 break
                 
-            soup = BeautifulSoup(response.content, "html.parser")
+            soup = _soup(response.content, 'list')
             film_list = soup.find('ul', class_='poster-list')
             
             if film_list is None:
@@ -106,7 +183,7 @@ def get_all_movie_urls(username: str, max_pages: int = 20) -> List[str]:
             films = film_list.find_all('li')
             page_urls = []
             
-            logger.info(f"Found {len(films)} films on page {current_page}")
+            log_event(logger, logging.DEBUG, "list_page_films", page=current_page, films=len(films))
             
             for film in films:
                 film_div = film.find('div')
@@ -117,7 +194,7 @@ def get_all_movie_urls(username: str, max_pages: int = 20) -> List[str]:
             
             # Add URLs from this page
             all_film_urls.extend(page_urls)
-            logger.info(f"Added {len(page_urls)} film URLs from page {current_page}")
+            log_event(logger, logging.DEBUG, "list_page_urls", page=current_page, urls=len(page_urls))
             
             # Look for next page link
             pagination = soup.find('div', class_='pagination')
@@ -162,7 +239,7 @@ def get_user_ratings(username: str) -> Dict[str, str]:
     max_pages = 20  # Reasonable limit to prevent infinite loops
     
     while current_page <= max_pages:
-        logger.info(f"Fetching ratings from page {current_page}: {current_url}")
+        log_event(logger, logging.DEBUG, "ratings_page_fetch", page=current_page, url=current_url)
         
         try:
             response = make_request(current_url)
@@ -170,7 +247,7 @@ def get_user_ratings(username: str) -> Dict[str, str]:
                 logger.error(f"Error retrieving ratings page: {current_url}")
                 break
                 
-            soup = BeautifulSoup(response.content, "html.parser")
+            soup = _soup(response.content, 'list')
             
             # Find all film items on the page
             film_items = soup.select('li.poster-container')
@@ -193,7 +270,7 @@ def get_user_ratings(username: str) -> Dict[str, str]:
                 except Exception as e:
                     logger.error(f"Error processing rating for film: {e}")
             
-            logger.info(f"Found {len(ratings)} ratings so far")
+            log_event(logger, logging.DEBUG, "ratings_page_ratings", page=current_page, ratings=len(ratings))
             
             # Check for next page
             pagination = soup.find('div', class_='pagination')
@@ -215,7 +292,7 @@ def get_user_ratings(username: str) -> Dict[str, str]:
     logger.info(f"Retrieved {len(ratings)} total ratings across {current_page} page(s)")
     return ratings
 
-def get_movie_poster_url(movie_soup: BeautifulSoup) -> Optional[str]:
+def get_movie_poster_url(movie_soup: "BeautifulSoup") -> Optional[str]:
     """
     Extract the poster URL from the movie page's JSON-LD script.
     """
@@ -234,7 +311,7 @@ def get_movie_poster_url(movie_soup: BeautifulSoup) -> Optional[str]:
         logger.error(f"Error parsing JSON from movie page: {e}")
         return None
 
-def get_movie_title(movie_soup: BeautifulSoup) -> str:
+def get_movie_title(movie_soup: "BeautifulSoup") -> str:
     """
     Extract the movie title from the page's og:title meta tag.
     """
@@ -243,7 +320,7 @@ def get_movie_title(movie_soup: BeautifulSoup) -> str:
         return meta_tag.get("content", "").strip()
     return "Unknown Title"
 
-def get_release_year(movie_soup: BeautifulSoup) -> Optional[str]:
+def get_release_year(movie_soup: "BeautifulSoup") -> Optional[str]:
     """
     Extract the movie release year.
     """
@@ -275,7 +352,7 @@ def get_release_year(movie_soup: BeautifulSoup) -> Optional[str]:
         logger.error(f"Error extracting release year: {e}")
         return None
 
-def get_movie_director(movie_soup: BeautifulSoup) -> List[str]:
+def get_movie_director(movie_soup: "BeautifulSoup") -> List[str]:
     """
     Extract the director(s) from the movie page.
     """
@@ -300,11 +377,11 @@ def get_movie_review(film_id: str, username: str) -> Tuple[Optional[str], Option
         review_url = f"{DOMAIN}{username}/film/{film_id}/"
         
         # Make request to the user's review page
-        logger.info(f"Checking for review at {review_url}")
+        sample_event(logger, logging.DEBUG, "review_fetch", url=review_url)
         review_response = make_request(review_url)
         
         if review_response and review_response.status_code == 200:
-            review_soup = BeautifulSoup(review_response.content, "html.parser")
+            review_soup = _soup(review_response.content, 'review')
             review_div = review_soup.find('div', class_='js-review-body')
             if review_div:
                 review_text = review_div.get_text(strip=True)
@@ -328,7 +405,7 @@ def process_movie_data(movie_url: str, username: str, rating: Optional[str] = No
     """
     Process a single movie URL to extract all relevant data
     """
-    logger.info(f"Processing movie: {movie_url}")
+    sample_event(logger, logging.DEBUG, "film_fetch", url=movie_url)
     
     try:
         response = make_request(movie_url)
@@ -338,11 +415,12 @@ def process_movie_data(movie_url: str, username: str, rating: Optional[str] = No
             
         film_id = movie_url.split('/')[-2]
 
-        movie_soup = BeautifulSoup(response.content, "html.parser")
-        title = get_movie_title(movie_soup)
-        poster_url = get_movie_poster_url(movie_soup)
-        director = get_movie_director(movie_soup)
-        release_year = get_release_year(movie_soup)
+        movie_soup = _soup(response.content, 'film')
+        with span("extract", kind='film'):
+            title = get_movie_title(movie_soup)
+            poster_url = get_movie_poster_url(movie_soup)
+            director = get_movie_director(movie_soup)
+            release_year = get_release_year(movie_soup)
         
         # Get review with better error handling
         try:
@@ -351,9 +429,11 @@ def process_movie_data(movie_url: str, username: str, rating: Optional[str] = No
             logger.error(f"Error getting review for {title}, continuing with empty values: {str(e)}")
             review_text, review_date, review_url = None, None, None
         
-        logger.info(f"Processed movie: {title} ({release_year if release_year else 'Unknown Year'}) directed by {director}")
-        if review_text:
-            logger.info(f"Found review from {review_date if review_date else 'unknown date'}: {review_text[:50]}...")
+        sample_event(
+            logger, logging.DEBUG, "film_processed",
+            title=title, release_year=release_year, director=director,
+            has_review=bool(review_text), review_date=review_date,
+        )
         
         return {
             'title': title,
@@ -370,11 +450,47 @@ def process_movie_data(movie_url: str, username: str, rating: Optional[str] = No
         logger.error(f"Error processing movie {movie_url}: {str(e)}")
         return None
 
-def get_all_movies(username: str, batch_size: int = BATCH_SIZE, existing_movies: List[Dict[str, Any]] = None, max_movies: int = MAX_MOVIES_PER_REQUEST) -> List[Dict[str, Any]]:
+def get_all_movies(username: str, batch_size: int = BATCH_SIZE, existing_movies: List[Dict[str, Any]] = None, max_movies: int = MAX_MOVIES_PER_REQUEST, last_updated: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Get all movies for a user, including their ratings, processing in batches.
     If existing_movies is provided, only fetch and process new movies.
+    Each call is recorded as a "scrape" trace (see GET /movies/traces).
     """
+    movies, _ = get_all_movies_with_version(username, batch_size, existing_movies, max_movies, last_updated)
+    return movies
+
+def get_all_movies_with_version(username: str, batch_size: int = BATCH_SIZE, existing_movies: List[Dict[str, Any]] = None, max_movies: int = MAX_MOVIES_PER_REQUEST, last_updated: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Like get_all_movies, also returning the last_updated the cache item now has.
+    last_updated is the cached item's, if existing_movies came from one: when nothing
+    new is found the item is only marked fresh, so it isn't scraped again until TTL.
+    """
+    with trace("scrape", username=username) as scrape:
+        movies, version = _scrape_movies(username, batch_size, existing_movies, max_movies, last_updated)
+        scrape.root.attrs["movies"] = len(movies)
+        return movies, version
+
+def _touch(username: str, last_updated: int) -> int:
+    """
+    Mark an unchanged cache item fresh, unless it was rewritten since it was read.
+    Returns the item's last_updated.
+    """
+    now = int(time.time())
+    try:
+        with span("dynamodb_touch"):
+            get_table().update_item(
+                Key={'username': username},
+                UpdateExpression="SET last_updated = :now",
+                ConditionExpression="last_updated = :last_updated",
+                ExpressionAttributeValues={":now": now, ":last_updated": last_updated},
+            )
+    except Exception as e:
+        log_event(logger, logging.INFO, "movies_not_touched", username=username, reason=str(e))
+        return last_updated
+    record_update(username, now)
+    return now
+
+def _scrape_movies(username: str, batch_size: int, existing_movies: Optional[List[Dict[str, Any]]], max_movies: int, previous_version: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
     logger.info(f"Retrieving all movies for {username}")
     
     # Initialize with existing movies if provided
@@ -384,7 +500,8 @@ def get_all_movies(username: str, batch_size: int = BATCH_SIZE, existing_movies:
     logger.info(f"Starting with {existing_count} existing movies")
     
     # Get all movie URLs
-    movie_urls = get_all_movie_urls(username)
+    with span("list_pages"):
+        movie_urls = get_all_movie_urls(username)
     logger.info(f"Found {len(movie_urls)} total movies on Letterboxd")
     
     # Filter out movies we already have
@@ -399,57 +516,92 @@ def get_all_movies(username: str, batch_size: int = BATCH_SIZE, existing_movies:
     # If no new movies, return existing ones
     if not new_movie_urls:
         logger.info("No new movies found, keeping existing movie data")
-        return movies
+        if movies and previous_version is not None:
+            return movies, _touch(username, previous_version)
+        return movies, previous_version or 0
     
     # Get all ratings
-    ratings = get_user_ratings(username)
+    with span("ratings_pages"):
+        ratings = get_user_ratings(username)
     
     # Process movies in batches to avoid rate limiting
     for i in range(0, len(new_movie_urls), batch_size):
         batch = new_movie_urls[i:i+batch_size]
-        logger.info(f"Processing batch {i//batch_size + 1}/{(len(new_movie_urls) + batch_size - 1)//batch_size} ({len(batch)} movies)")
+        log_event(logger, logging.DEBUG, "film_batch", batch=i // batch_size + 1, batches=(len(new_movie_urls) + batch_size - 1) // batch_size, films=len(batch))
         
         for url in batch:
             rating = ratings.get(url)
-            movie_data = process_movie_data(url, username, rating)
+            with span("film", url=url):
+                movie_data = process_movie_data(url, username, rating)
             if movie_data:
-                movies.append(movie_data)
+                # Validated once here, on the way into the cache; reads serve the stored dicts
+                movies.append(MovieResult(**movie_data).dict())
                 
         # Add a delay between batches
         if i + batch_size < len(new_movie_urls):
             delay = SEARCHING_DELAY
-            logger.info(f"Waiting {delay} seconds before processing next batch")
-            time.sleep(delay)
+            log_event(logger, logging.DEBUG, "batch_delay", delay_s=delay)
+            with span("batch_delay"):
+                time.sleep(delay)
     
     # Mark as complete
+    last_updated = previous_version or 0
     if movies:
+        last_updated = int(time.time())
         cache_item = {
             'username': username,
-            'movies': movies,
-            'last_updated': int(time.time()),
+            # A native list, or a compact binary encoding (MOVIES_STORAGE_CODEC)
+            **encode_item(movies),
+            'last_updated': last_updated,
             'is_complete': True
         }
-        table.put_item(Item=cache_item)
+        # Stats are computed once per refresh and stored with the movies (see get_movie_stats)
+        try:
+            with span("stats", movies=len(movies)):
+                cache_item['stats'] = encode_movie_stats(movies)
+        except Exception as e:
+            logger.error(f"Error computing movie stats for {username}: {e}")
+        with span("dynamodb_write", movies=len(movies)):
+            get_table().put_item(Item=cache_item)
+        # The background refresh finds stale libraries through this copy
+        record_update(username, last_updated)
     
     logger.info(f"Processed {len(movies)} total movies for {username} ({len(movies) - existing_count} new)")
-    return movies
+    return movies, last_updated
 
-def get_movies(search: MoviesSearch) -> List[MovieResult]:
+async def get_movies(search: MoviesSearch) -> List[Dict[str, Any]]:
     """
     Retrieve (and cache) all movies for the given username.
-    Returns a list of MovieResult objects.
+    Returns the cached movie dicts, which were validated as MovieResult when scraped.
+    """
+    movies, _ = await get_movies_with_version(search)
+    return movies
+
+async def get_movies_with_version(search: MoviesSearch) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    get_movies plus the last_updated timestamp of the cache item the movies came from,
+    which identifies that version of the list (e.g. for ETags).
     """
     username = search.username
-    fast_mode = search.fast_mode
-    now = int(time.time())
-    
-    logger.info(f"Retrieving movies for: {username} (fast_mode: {fast_mode})")
+    logger.info(f"Retrieving movies for: {username} (fast_mode: {search.fast_mode})")
     
+    # Reads per user set the background refresh order (services/movie_refresh.py)
+    await record_access([username])
+
     # Check for a cached item
-    cached_item = table.get_item(Key={'username': username}).get('Item')
+    table = await get_async_table()
+    cached_item = (await table.get_item(Key={'username': username})).get('Item')
+    return await _resolve_movies(username, cached_item, search.fast_mode)
+
+async def _resolve_movies(username: str, cached_item: Optional[Dict[str, Any]], fast_mode: bool) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Apply the fast / stale rules to a user's cache item (None if there is none),
+    scraping when needed, and return the movies with their last_updated.
+    """
+    now = int(time.time())
     if cached_item:
         last_updated = cached_item.get('last_updated', 0)
-        cached_movies = cached_item.get('movies', [])
+        cached_movies = decode_item(cached_item)
         is_complete = cached_item.get('is_complete', True)
         
         logger.info(f"Found cached data with {len(cached_movies)} movies, age: {now - last_updated}s, complete: {is_complete}")
@@ -457,30 +609,293 @@ def get_movies(search: MoviesSearch) -> List[MovieResult]:
         # If fast mode, always return cached data
         if fast_mode:
             logger.info(f"Fast mode: returning {len(cached_movies)} cached movies")
-            return [MovieResult(**movie) for movie in cached_movies]
+            return cached_movies, last_updated
 
         # If cache is recent, return it directly
         if now - last_updated < TTL:
             logger.info(f"Cache hit, returning {len(cached_movies)} movies")
-            return [MovieResult(**movie) for movie in cached_movies]
+            return cached_movies, last_updated
             
         # If cache exists but is stale, we'll do a smart update
         logger.info(f"Cache is stale, performing smart update")
-        movies_to_cache = get_all_movies(username, existing_movies=cached_movies)
+        # Scraping is blocking and slow, keep it off the event loop
+        movies_to_cache, version = await asyncio.to_thread(
+            get_all_movies_with_version, username, existing_movies=cached_movies, last_updated=last_updated)
     else:
         # Fast mode with no cache - return empty
         if fast_mode:
             logger.info("Fast mode: no cached data found, returning empty list")
-            return []
+            return [], 0
             
         # No cache exists, fetch all movies
         logger.info(f"No cached data found, fetching all movies")
-        movies_to_cache = get_all_movies(username)
+        movies_to_cache, version = await asyncio.to_thread(get_all_movies_with_version, username)
     
     # No need to update cache here, as it's done in get_all_movies
     
     logger.info(f"Returning {len(movies_to_cache)} movies")
-    return [MovieResult(**movie) for movie in movies_to_cache]
+    # The stored version, so an unchanged library keeps its ETag
+    return movies_to_cache, version
+
+async def _batch_get_cached(usernames: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Cache items for up to BATCH_MAX_USERS users, projected to what _resolve_movies
+    reads. Keys go out in chunks sized to stay under BatchGetItem's 16 MB response
+    cap, and unprocessed keys are retried with jittered exponential backoff for as
+    long as calls make progress.
+    """
+    dynamodb = await get_async_resource("dynamodb")
+    chunks = [usernames[i:i + BATCH_GET_CHUNK] for i in range(0, len(usernames), BATCH_GET_CHUNK)]
+    items = {}
+    for chunk_items in await asyncio.gather(*(_batch_get_chunk(dynamodb, chunk) for chunk in chunks)):
+        items.update(chunk_items)
+    return items
+
+async def _batch_get_chunk(dynamodb, usernames: List[str]) -> Dict[str, Dict[str, Any]]:
+    keys = [{"username": username} for username in usernames]
+    items = {}
+    stalled = 0
+    while keys:
+        response = await dynamodb.batch_get_item(RequestItems={MOVIES_TABLE: {"Keys": keys, **BATCH_GET_PROJECTION}})
+        returned = response.get("Responses", {}).get(MOVIES_TABLE, [])
+        for item in returned:
+            items[item["username"]] = item
+        keys = response.get("UnprocessedKeys", {}).get(MOVIES_TABLE, {}).get("Keys", [])
+        if not keys:
+            break
+        # Throttling returns nothing at all; a call that read some items is progress
+        stalled = 0 if returned else stalled + 1
+        if stalled >= BATCH_MAX_ATTEMPTS:
+            raise HTTPException(status_code=503, detail="Could not read every user's movies, please retry")
+        log_event(logger, logging.INFO, "batch_get_unprocessed", stalled=stalled, keys=len(keys))
+        await asyncio.sleep(BATCH_RETRY_BASE_DELAY * 2 ** stalled * random.uniform(0.5, 1.5))
+    return items
+
+async def get_movies_batch(usernames: List[str], fast_mode: bool = False) -> Tuple[Dict[str, Tuple[List[Dict[str, Any]], int]], List[str]]:
+    """
+    get_movies_with_version for several users: one BatchGetItem for all cache items,
+    then the same fast / stale rules per user, within a scrape budget. At most
+    BATCH_MAX_SCRAPES users are scraped, missing users first, then the stalest;
+    the rest are answered as in fast mode. Returns the results and the users whose
+    scrape was deferred (served stale or empty), which a caller can ask for again.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    if len(usernames) > BATCH_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_USERS} usernames per request")
+    logger.info(f"Retrieving movies for {len(usernames)} users (fast_mode: {fast_mode})")
+
+    await record_access(usernames)
+    cached_items = await _batch_get_cached(usernames) if usernames else {}
+
+    scrape = set()
+    deferred = []
+    if not fast_mode:
+        now = int(time.time())
+        # Missing users sort first (last_updated -1), then the least recently updated
+        ages = {
+            username: cached_items[username].get('last_updated', 0) if username in cached_items else -1
+            for username in usernames
+        }
+        needs_scrape = sorted((u for u in usernames if now - ages[u] >= TTL), key=lambda u: ages[u])
+        scrape = set(needs_scrape[:BATCH_MAX_SCRAPES])
+        deferred = needs_scrape[BATCH_MAX_SCRAPES:]
+        if deferred:
+            log_event(logger, logging.INFO, "batch_scrapes_deferred", scraped=len(scrape), deferred=len(deferred))
+
+    results = await asyncio.gather(*(
+        _resolve_movies(username, cached_items.get(username), fast_mode or username not in scrape)
+        for username in usernames
+    ))
+    return dict(zip(usernames, results)), deferred
+
+async def get_movie_stats(username: str) -> Tuple[str, int]:
+    """
+    The stats document for a user's library as JSON text, and the last_updated of the
+    movies it was computed from. One GetItem projected to the stats; libraries cached
+    before stats existed get theirs computed and stored on first request.
+    """
+    table = await get_async_table()
+    item = (await table.get_item(
+        Key={'username': username},
+        ProjectionExpression="#stats, last_updated",
+        ExpressionAttributeNames={"#stats": "stats"},
+    )).get('Item')
+    if not item:
+        raise HTTPException(status_code=404, detail=f"No movies cached for {username}")
+    if 'stats' in item:
+        return item['stats'], int(item.get('last_updated', 0))
+
+    item = (await table.get_item(Key={'username': username})).get('Item')
+    if not item:
+        raise HTTPException(status_code=404, detail=f"No movies cached for {username}")
+    last_updated = int(item.get('last_updated', 0))
+    stats = await asyncio.to_thread(encode_movie_stats, decode_item(item))
+    # Only store them if the library hasn't been refreshed in the meantime
+    try:
+        await table.update_item(
+            Key={'username': username},
+            UpdateExpression="SET #stats = :stats",
+            ConditionExpression="last_updated = :last_updated",
+            ExpressionAttributeNames={"#stats": "stats"},
+            ExpressionAttributeValues={":stats": stats, ":last_updated": last_updated},
+        )
+    except Exception as e:
+        log_event(logger, logging.INFO, "movie_stats_not_stored", username=username, reason=str(e))
+    return stats, last_updated
+
+# ---------------------------------------------------------------------------
+# Sorting, filtering, projection and cursors for /movies/search
+# ---------------------------------------------------------------------------
+
+SORT_KEYS = ("rating", "release_year", "review_date")
+MOVIE_FIELDS = ["title", "letterboxd_url", "poster_url", "rating", "director", "review",
+                "release_year", "review_date", "review_url"]  # MovieResult, in order
+
+# Per (username, last_updated) list: numeric columns and sort orders, built once per
+# version of the list so a query only walks as far as the page it returns
+query_cache = TTLCache(maxsize=128, ttl=TTL)
+
+
+def rating_value(rating: Optional[str]) -> Optional[float]:
+    """
+    Numeric value of a Letterboxd star rating: "★★★½" -> 3.5, "½" -> 0.5.
+    """
+    if not rating:
+        return None
+    value = rating.count("★") + (0.5 if "½" in rating else 0)
+    return value or None
+
+
+def _year(release_year: Optional[str]) -> Optional[int]:
+    try:
+        return int(release_year)
+    except (TypeError, ValueError):
+        return None
+
+
+def _columns(username: str, version: int, movies: List[Dict[str, Any]]) -> Dict[str, list]:
+    key = ("columns", username, version, len(movies))
+    columns = query_cache.get(key)
+    if columns is None:
+        columns = {
+            "rating": [rating_value(m.get("rating")) for m in movies],
+            "release_year": [_year(m.get("release_year")) for m in movies],
+            "review_date": [m.get("review_date") for m in movies],
+            "has_review": [bool(m.get("review")) for m in movies],
+            "directors": [{d.lower() for d in m.get("director") or []} for m in movies],
+        }
+        query_cache.set(key, columns)
+    return columns
+
+
+def _ordering(username: str, version: int, movies: List[Dict[str, Any]], sort: Optional[str], descending: bool):
+    """
+    Movie indexes in the requested order, and each movie's rank in it keyed by URL.
+    Movies without a value for the sort key always come last.
+    """
+    key = ("order", username, version, len(movies), sort, descending)
+    ordering = query_cache.get(key)
+    if ordering is None:
+        if sort is None:
+            order = list(range(len(movies)))
+        else:
+            values = _columns(username, version, movies)[sort]
+            present = [i for i in range(len(movies)) if values[i] is not None]
+            missing = [i for i in range(len(movies)) if values[i] is None]
+            # sorted() is stable, so ties keep diary order either way
+            order = sorted(present, key=values.__getitem__, reverse=descending) + missing
+        position = {movies[i]["letterboxd_url"]: rank for rank, i in enumerate(order)}
+        ordering = (order, position)
+        query_cache.set(key, ordering)
+    return ordering
+
+
+def query_fingerprint(username: str, query: MoviesQuery) -> str:
+    """
+    Identifies everything about a query except the page (cursor, limit).
+    """
+    parts = [username, query.sort, query.order, query.min_rating, (query.director or "").lower(),
+             query.year_from, query.year_to, query.has_review, ",".join(query.fields or [])]
+    return hashlib.blake2b("|".join(str(part) for part in parts).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _encode_cursor(fingerprint: str, after_url: str) -> str:
+    raw = json.dumps({"q": fingerprint, "after": after_url}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _decode_cursor(cursor: str, fingerprint: str) -> str:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        after_url = data["after"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if data.get("q") != fingerprint:
+        raise HTTPException(status_code=400, detail="Cursor does not belong to this query")
+    return after_url
+
+
+def query_movies(username: str, version: int, movies: List[Dict[str, Any]], query: MoviesQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of movies matching the query, and the cursor for the next page (None on the last).
+
+    The list lives in a single cache item, so filtering happens here rather than in
+    DynamoDB; sort orders are precomputed per version of the list, a cursor resumes
+    directly after the last movie it returned, and the walk stops once the page is full.
+    """
+    if query.sort is not None and query.sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_KEYS)}")
+    if query.order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    unknown = [field for field in query.fields or [] if field not in MOVIE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    fingerprint = query_fingerprint(username, query)
+    order, position = _ordering(username, version, movies, query.sort, query.order == "desc")
+
+    start = 0
+    if query.cursor:
+        after_url = _decode_cursor(query.cursor, fingerprint)
+        if after_url not in position:
+            raise HTTPException(status_code=400, detail="Cursor refers to a movie that is no longer listed")
+        start = position[after_url] + 1
+
+    filters = []
+    if query.min_rating is not None or query.year_from is not None or query.year_to is not None \
+            or query.has_review is not None or query.director:
+        columns = _columns(username, version, movies)
+        if query.min_rating is not None:
+            ratings = columns["rating"]
+            filters.append(lambda i: ratings[i] is not None and ratings[i] >= query.min_rating)
+        if query.year_from is not None or query.year_to is not None:
+            years = columns["release_year"]
+            low = query.year_from if query.year_from is not None else float("-inf")
+            high = query.year_to if query.year_to is not None else float("inf")
+            filters.append(lambda i: years[i] is not None and low <= years[i] <= high)
+        if query.has_review is not None:
+            has_review = columns["has_review"]
+            filters.append(lambda i: has_review[i] == query.has_review)
+        if query.director:
+            director = query.director.lower()
+            directors = columns["directors"]
+            filters.append(lambda i: director in directors[i])
+
+    limit = query.limit if query.limit > 0 else len(order)
+    page = []
+    next_cursor = None
+    for rank in range(start, len(order)):
+        i = order[rank]
+        if all(match(i) for match in filters):
+            if len(page) == limit:
+                # There is at least one more match, so the page gets a cursor
+                next_cursor = _encode_cursor(fingerprint, page[-1]["letterboxd_url"])
+                break
+            page.append(movies[i])
+
+    if query.fields:
+        page = [{field: movie.get(field) for field in query.fields} for movie in page]
+    return page, next_cursor
 
 def backfill_movies(username: str, force: bool = False) -> Dict[str, Any]:
     """
@@ -499,11 +914,11 @@ def backfill_movies(username: str, force: bool = False) -> Dict[str, Any]:
     
     try:
         # Check if user already exists in database
-        existing_item = table.get_item(Key={'username': username}).get('Item')
+        existing_item = get_table().get_item(Key={'username': username}).get('Item')
         
         if existing_item and not force:
             # User exists and force=False
-            movie_count = len(existing_item.get('movies', []))
+            movie_count = stored_movie_count(existing_item)
             logger.info(f"User {username} already exists with {movie_count} movies. Use force=True to override.")
             return {
                 'success': False,
@@ -514,7 +929,7 @@ def backfill_movies(username: str, force: bool = False) -> Dict[str, Any]:
         if existing_item and force:
             # User exists but we're forcing a refresh - delete the existing item
             logger.info(f"Forcing refresh for {username}, deleting existing record")
-            table.delete_item(Key={'username': username})
+            get_table().delete_item(Key={'username': username})
         
         # Perform a full fetch of all movies
         logger.info(f"Fetching all movies for {username}")
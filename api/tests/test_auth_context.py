@@ -0,0 +1,95 @@
+"""
+The auth context is resolved once per request (core.dependencies.get_current_user),
+however many dependencies on the route ask for it.
+"""
+import json
+import time
+import base64
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core import dependencies
+from main import app
+
+
+def make_token(sub: str) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({"sub": sub}).encode()).rstrip(b"=").decode()
+    return f"e30.{payload}.signature"
+
+
+class CountingBackend(dependencies.JWTBackend):
+    """
+    Accepts any token from make_token, trusting its sub, and counts decode calls.
+    """
+    name = "counting"
+
+    def __init__(self):
+        self.decodes = 0
+
+    def parse_key(self, jwk):
+        return jwk
+
+    def get_unverified_header(self, token):
+        return {"kid": "test", "alg": "RS256"}
+
+    def decode(self, token, key):
+        self.decodes += 1
+        sub = json.loads(base64.urlsafe_b64decode(token.split(".")[1] + "=="))["sub"]
+        now = int(time.time())
+        return {
+            "sub": sub,
+            "cognito:username": sub,
+            "cognito:groups": ["admin"],
+            "iat": now,
+            "exp": now + 3600,
+        }
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = CountingBackend()
+    monkeypatch.setattr(dependencies, "current_jwt_backend", lambda: backend)
+    monkeypatch.setattr(dependencies.jwks_store, "get_key", lambda kid: object())
+    dependencies._verified_tokens.clear()
+    dependencies._revoked_users.clear()
+    yield backend
+    dependencies._verified_tokens.clear()
+    dependencies._revoked_users.clear()
+
+
+@pytest.mark.parametrize("endpoint", ["profile", "admin", "dashboard"])
+def test_one_verification_per_request(backend, endpoint):
+    # The router and the endpoint both depend on get_current_user
+    client = TestClient(app)
+    for i in range(3):
+        before = backend.decodes
+        # A new token each time, so the verified-token cache can't hide a verification
+        response = client.get(f"/protected/protected/{endpoint}", headers={"Authorization": f"Bearer {make_token(f'user-{i}')}"})
+        assert response.status_code == 200
+        assert backend.decodes - before == 1
+
+
+def test_verified_token_is_not_verified_again(backend):
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {make_token('user')}"}
+    for _ in range(3):
+        response = client.get("/protected/protected/profile", headers=headers)
+        assert response.status_code == 200
+    assert backend.decodes == 1
+
+
+def test_logout_refuses_every_token_of_the_user(backend):
+    client = TestClient(app)
+    first, second = make_token("user"), make_token("user") + "-other"
+    for token in (first, second):
+        assert client.get("/protected/protected/profile", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+    # What AuthService.logout does once GlobalSignOut succeeds for the first token
+    dependencies.revoke_user_tokens(first)
+
+    for token in (first, second):
+        response = client.get("/protected/protected/profile", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
+    other_user = client.get("/protected/protected/profile", headers={"Authorization": f"Bearer {make_token('someone-else')}"})
+    assert other_user.status_code == 200
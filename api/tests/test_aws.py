@@ -0,0 +1,71 @@
+"""
+aioboto3 resources are kept per event loop and closed on shutdown.
+"""
+import asyncio
+import gc
+from types import SimpleNamespace
+
+import pytest
+
+from core import aws
+
+
+class FakeSession:
+    def __init__(self):
+        self.opened = []
+        self.closed = []
+
+    def resource(self, service, **kwargs):
+        session = self
+
+        class Context:
+            async def __aenter__(self):
+                resource = SimpleNamespace(service=service, meta=SimpleNamespace(client=SimpleNamespace(meta=None)))
+                session.opened.append(resource)
+                return resource
+
+            async def __aexit__(self, *exc):
+                session.closed.append(self)
+
+        return Context()
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(aws, "get_async_session", lambda: session)
+    monkeypatch.setattr(aws, "instrument_client", lambda client: client)
+    monkeypatch.setattr(aws, "_async_resources", type(aws._async_resources)())
+    return session
+
+
+def test_one_resource_per_loop_and_service(session):
+    async def use():
+        first, second = await asyncio.gather(aws.get_async_resource("dynamodb"), aws.get_async_resource("dynamodb"))
+        assert first is second
+        return first
+
+    one = asyncio.run(use())
+    two = asyncio.run(use())
+    assert one is not two
+    assert len(session.opened) == 2
+
+
+def test_shutdown_closes_the_loop_resources(session):
+    async def use_and_close():
+        await aws.get_async_resource("dynamodb")
+        await aws.get_async_resource("s3")
+        await aws.close_async_resources()
+        # A resource asked for after shutdown is a fresh one
+        await aws.get_async_resource("dynamodb")
+        await aws.close_async_resources()
+
+    asyncio.run(use_and_close())
+    assert len(session.opened) == 3
+    assert len(session.closed) == 3
+
+
+def test_closed_loops_are_forgotten(session):
+    asyncio.run(aws.get_async_resource("dynamodb"))
+    gc.collect()
+    assert len(aws._async_resources) == 0
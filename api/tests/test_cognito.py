@@ -0,0 +1,126 @@
+"""
+AWS_Cognito: calls overlap on the Cognito pool, a slow one maps to 504, and password
+resets and changes evict cached user lookups.
+"""
+import time
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from main import app
+from core import aws_cognito
+from schemas.auth import ChangePassword, ConfirmForgotPassword
+
+
+LATENCY = 0.3  # Seconds per stubbed Cognito call
+SIGNINS = 10
+
+
+class SlowCognito:
+    """
+    Blocking Cognito client stub: every initiate_auth takes LATENCY seconds.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def initiate_auth(self, **kwargs):
+        self.calls += 1
+        time.sleep(LATENCY)
+        return {"AuthenticationResult": {"AccessToken": "access", "RefreshToken": "refresh"}}
+
+
+@pytest.fixture
+def cognito(monkeypatch):
+    client = SlowCognito()
+    monkeypatch.setattr(aws_cognito, "_client", client)
+    return client
+
+
+async def signin(client, i):
+    return await client.post("/auth/signin", json={"email": f"user{i}@example.com", "password": "password123"})
+
+
+def test_parallel_signins_take_about_one_call(cognito):
+    assert aws_cognito.COGNITO_EXECUTOR_WORKERS >= SIGNINS
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(signin(client, i) for i in range(SIGNINS)))
+            return responses, time.perf_counter() - started
+
+    responses, elapsed = asyncio.run(main())
+    assert [r.status_code for r in responses] == [200] * SIGNINS
+    assert cognito.calls == SIGNINS
+    # Serialized they would take SIGNINS * LATENCY
+    assert elapsed < 2 * LATENCY
+
+
+def test_timeout_maps_to_504(cognito):
+    async def main():
+        await aws_cognito.AWS_Cognito().run(time.sleep, LATENCY, timeout=LATENCY / 10)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main())
+    assert error.value.status_code == 504
+
+
+class EmptyCognito:
+    """
+    Cognito client stub that answers every call with an empty response.
+    """
+
+    def __getattr__(self, name):
+        return lambda **kwargs: {}
+
+
+@pytest.mark.parametrize("call", [
+    lambda cognito: cognito.forgot_password("User@example.com"),
+    lambda cognito: cognito.confirm_forgot_password(ConfirmForgotPassword(
+        email="user@example.com", confirmation_code="123456", new_password="password123")),
+])
+def test_password_reset_evicts_cached_lookups(monkeypatch, call):
+    monkeypatch.setattr(aws_cognito, "_client", EmptyCognito())
+    aws_cognito.user_cache.set(aws_cognito._user_key("user@example.com"), {"UserStatus": "CONFIRMED"})
+    aws_cognito.token_user_cache.set(aws_cognito._token_key("token"), {"Username": "user"})
+
+    call(aws_cognito.AWS_Cognito())
+    assert aws_cognito.user_cache.get(aws_cognito._user_key("user@example.com")) is None
+    assert aws_cognito.token_user_cache.get(aws_cognito._token_key("token")) is None
+
+
+def test_change_password_evicts_the_token_lookup(monkeypatch):
+    monkeypatch.setattr(aws_cognito, "_client", EmptyCognito())
+    aws_cognito.token_user_cache.set(aws_cognito._token_key("token"), {"Username": "user"})
+
+    aws_cognito.AWS_Cognito().change_password(ChangePassword(
+        old_password="password123", new_password="password456", access_token="token"))
+    assert aws_cognito.token_user_cache.get(aws_cognito._token_key("token")) is None
+
+
+def test_governor_counts_every_shed_call_across_threads():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+
+    # About one call a second gets through without waiting; the rest are shed
+    governor = aws_cognito.CognitoGovernor({}, default_quota=1, share=1, max_wait=0)
+    model = SimpleNamespace(name="InitiateAuth")
+    admitted = []
+    lock = threading.Lock()
+
+    def call(_):
+        try:
+            governor.before_call(model)
+        except HTTPException:
+            return
+        with lock:
+            admitted.append(1)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(call, range(2000)))
+    assert governor.stats()["InitiateAuth"]["shed"] == 2000 - len(admitted)
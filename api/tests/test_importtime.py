@@ -0,0 +1,17 @@
+"""
+Cold start import budget for main, as checked by bench/importtime.py.
+"""
+import os
+
+from bench.importtime import DEFAULT_BUDGET_MS, measure
+
+
+BUDGET_MS = float(os.environ.get("IMPORTTIME_BUDGET_MS", DEFAULT_BUDGET_MS))
+
+
+def test_import_main_within_budget():
+    result = measure("main")
+    assert result.eager == [], f"Deferred modules imported eagerly: {', '.join(result.eager)}"
+    assert result.own_ms <= BUDGET_MS, (
+        f"import main takes {result.own_ms:.1f} ms beyond the framework (budget {BUDGET_MS:.0f} ms)"
+    )
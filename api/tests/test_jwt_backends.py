@@ -0,0 +1,74 @@
+"""
+Every JWT_BACKEND accepts and refuses the same tokens, for the same reasons.
+"""
+import time
+import base64
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from core import dependencies
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = private_key.public_key().public_numbers()
+
+    def b64(value: int) -> str:
+        return base64.urlsafe_b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big")).rstrip(b"=").decode()
+
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return pem, {"kty": "RSA", "kid": "test", "alg": "RS256", "use": "sig", "n": b64(numbers.n), "e": b64(numbers.e)}
+
+
+def claims(**overrides):
+    now = int(time.time())
+    return {"sub": "user", "iat": now, "exp": now + 600, **overrides}
+
+
+CASES = [
+    ("access token", claims(), None),
+    ("id token with aud", claims(aud="app-client-id"), None),
+    ("expired", claims(exp=int(time.time()) - 10), dependencies.TokenExpiredError),
+    ("not yet valid", claims(nbf=int(time.time()) + 600), dependencies.TokenClaimsError),
+    ("non-numeric exp", claims(exp="soon"), dependencies.TokenClaimsError),
+    ("non-numeric iat", claims(iat="today"), dependencies.TokenClaimsError),
+]
+
+
+@pytest.mark.parametrize("backend_name", sorted(dependencies.JWT_BACKENDS))
+@pytest.mark.parametrize("case, payload, error", CASES, ids=[case for case, _, _ in CASES])
+def test_backends_agree(signing_key, backend_name, case, payload, error):
+    pem, jwk = signing_key
+    backend = dependencies.get_jwt_backend(backend_name)
+    token = jwt.encode(payload, pem, algorithm="RS256", headers={"kid": "test"})
+    key = backend.parse_key(jwk)
+    if error is None:
+        assert backend.decode(token, key)["sub"] == "user"
+    else:
+        with pytest.raises(error):
+            backend.decode(token, key)
+
+
+@pytest.mark.parametrize("backend_name", sorted(dependencies.JWT_BACKENDS))
+def test_backends_refuse_a_bad_signature(signing_key, backend_name):
+    pem, jwk = signing_key
+    backend = dependencies.get_jwt_backend(backend_name)
+    token = jwt.encode(claims(), pem, algorithm="RS256", headers={"kid": "test"})
+    header, payload, signature = token.split(".")
+    forged = ".".join([header, payload, signature[::-1]])
+    with pytest.raises(dependencies.TokenError):
+        backend.decode(forged, backend.parse_key(jwk))
+
+
+def test_backends_must_implement_every_method():
+    class Partial(dependencies.JWTBackend):
+        def parse_key(self, jwk):
+            return jwk
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,84 @@
+"""
+The Lambda entry point behind a REST API with binaryMediaTypes */*: request bodies
+arrive base64-encoded, compressed responses leave base64-encoded.
+"""
+import base64
+import gzip
+import json
+import asyncio
+
+import pytest
+
+import main
+from routes import meals as meals_routes
+
+
+class Context:
+    function_name = "test"
+    aws_request_id = "test"
+
+    def get_remaining_time_in_millis(self):
+        return 30_000
+
+
+@pytest.fixture(autouse=True)
+def event_loop():
+    # Mangum runs on the thread's current loop, which asyncio.run elsewhere in the suite unsets
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+def rest_event(method, path, body=None, headers=None):
+    headers = {"Host": "api.example.com", **(headers or {})}
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": method,
+        "headers": headers,
+        "multiValueHeaders": {name: [value] for name, value in headers.items()},
+        "queryStringParameters": None,
+        "multiValueQueryStringParameters": None,
+        "pathParameters": {"proxy": path.lstrip("/")},
+        "stageVariables": None,
+        "requestContext": {
+            "resourcePath": "/{proxy+}",
+            "httpMethod": method,
+            "path": f"/prod{path}",
+            "stage": "prod",
+            "identity": {"sourceIp": "127.0.0.1"},
+            "requestId": "test",
+        },
+        "body": base64.b64encode(body).decode() if body is not None else None,
+        "isBase64Encoded": body is not None,
+    }
+
+
+def test_base64_request_body_is_decoded(monkeypatch):
+    created = []
+
+    async def create_meal(item):
+        created.append(item)
+        return {"success": True}
+
+    monkeypatch.setattr(meals_routes, "create_meal", create_meal)
+    meal = {"mealName": "soup", "mealType": "lunch", "eatingOut": False, "date": "2024-01-05T12:00:00", "note": ""}
+    response = main.handler(
+        rest_event("POST", "/meals/", json.dumps(meal).encode(), {"Content-Type": "application/json"}), Context())
+    assert response["statusCode"] == 200
+    assert created[0].mealName == "soup"
+
+
+def test_compressed_response_is_base64_encoded(monkeypatch):
+    body = json.dumps([{"mealName": f"meal {i}"} for i in range(200)]).encode()
+
+    async def get_meals_json():
+        return body, '"etag"'
+
+    monkeypatch.setattr(meals_routes, "get_meals_json", get_meals_json)
+    response = main.handler(rest_event("GET", "/meals/", headers={"Accept-Encoding": "gzip"}), Context())
+    assert response["statusCode"] == 200
+    assert response["isBase64Encoded"] is True
+    assert gzip.decompress(base64.b64decode(response["body"])) == body
@@ -0,0 +1,25 @@
+"""
+Queued log records carry the message as it was when logged.
+"""
+import json
+import queue
+import logging
+
+from core.log import JSONFormatter, _QueueHandler
+
+
+def test_queued_message_is_snapshotted():
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger("tests.log")
+    logger.propagate = False
+    logger.addHandler(_QueueHandler(log_queue))
+    try:
+        users = ["a"]
+        logger.warning("refreshing %s", users)
+        users.append("b")
+    finally:
+        logger.handlers.clear()
+        logger.propagate = True
+
+    line = json.loads(JSONFormatter().format(log_queue.get_nowait()))
+    assert line["msg"] == "refreshing ['a']"
@@ -0,0 +1,114 @@
+"""
+Meal rollup counters move in the same transaction as the meal, against a moto server.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from bench.stubs import REGION, MotoStack
+from core.dependencies import require_admin
+from main import app
+from services import meals
+
+
+@pytest.fixture(scope="module")
+def moto():
+    stack = MotoStack().start()
+    yield stack
+    stack.stop()
+
+
+@pytest.fixture
+def client(moto, monkeypatch):
+    monkeypatch.setenv("AWS_ENDPOINT_URL", moto.url)
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+    monkeypatch.setattr(meals, "table_name", moto.meals_table)
+    monkeypatch.setattr(meals, "stats_table_name", moto.stats_table)
+    app.dependency_overrides[require_admin] = lambda: {"sub": "admin", "groups": ["admin"]}
+    meals.cache.clear()
+    with TestClient(app) as client:
+        client.delete("/meals/")
+        yield client
+    app.dependency_overrides.clear()
+
+
+def meal(mealID, date="2024-01-05T12:00:00", mealType="dinner", eatingOut=False):
+    return {"mealID": mealID, "mealName": mealID, "mealType": mealType, "eatingOut": eatingOut, "date": date, "note": ""}
+
+
+def buckets(moto):
+    items = moto.client("dynamodb").scan(TableName=moto.stats_table)["Items"]
+    return {
+        (item["granularity"]["S"], item["period"]["S"]): {
+            name: int(value["N"]) for name, value in item.items() if "N" in value and int(value["N"])
+        }
+        for item in items
+    }
+
+
+def test_create_update_delete(client, moto):
+    client.post("/meals/", json=meal("a"))
+    client.post("/meals/", json=meal("b", mealType="lunch", eatingOut=True))
+    assert buckets(moto)[("day", "2024-01-05")] == {"total": 2, "eatingOut": 1, "mealType#dinner": 1, "mealType#lunch": 1}
+
+    # Same day and week, another month: the day bucket keeps its total
+    client.put("/meals/a", json=meal("a", mealType="breakfast"))
+    client.put("/meals/b", json=meal("b", date="2024-02-01T08:00:00", mealType="lunch", eatingOut=True))
+    stats = buckets(moto)
+    assert stats[("day", "2024-01-05")] == {"total": 1, "mealType#breakfast": 1}
+    assert stats[("month", "2024-01")] == {"total": 1, "mealType#breakfast": 1}
+    assert stats[("month", "2024-02")] == {"total": 1, "eatingOut": 1, "mealType#lunch": 1}
+
+    client.delete("/meals/a")
+    client.delete("/meals/a")
+    assert buckets(moto)[("day", "2024-01-05")] == {}
+
+
+def test_overwriting_a_meal_moves_its_counts(client, moto):
+    client.post("/meals/", json=meal("a"))
+    client.post("/meals/", json=meal("a", date="2024-03-01T12:00:00"))
+    stats = buckets(moto)
+    assert stats[("day", "2024-01-05")] == {}
+    assert stats[("day", "2024-03-01")] == {"total": 1, "mealType#dinner": 1}
+
+
+def test_update_of_a_missing_meal_writes_nothing(client, moto):
+    assert client.put("/meals/missing", json=meal("missing")).status_code == 404
+    assert buckets(moto) == {}
+
+
+def test_rebuild_matches_the_counters(client, moto):
+    client.post("/meals/", json=meal("a"))
+    client.post("/meals/", json=meal("b", date="2024-02-01T08:00:00", eatingOut=True))
+    client.delete("/meals/b")
+    written = {key: counters for key, counters in buckets(moto).items() if counters}
+
+    response = client.post("/meals/stats/rebuild")
+    assert response.json() == {"success": True, "meals": 1, "buckets": 3}
+    assert buckets(moto) == written
+
+
+def test_rebuild_requires_admin(client):
+    app.dependency_overrides.clear()
+    assert client.post("/meals/stats/rebuild").status_code in (401, 403)
+
+
+def test_a_meal_changed_since_it_was_read_is_written_again(client, moto):
+    client.post("/meals/", json=meal("a"))
+    seen = []
+
+    def plan(old):
+        seen.append(old["mealType"])
+        if len(seen) == 1:
+            # Another writer changes the meal between our read and our transaction
+            moto.client("dynamodb").update_item(
+                TableName=moto.meals_table,
+                Key={"mealID": {"S": "a"}},
+                UpdateExpression="SET mealType = :lunch",
+                ExpressionAttributeValues={":lunch": {"S": "lunch"}},
+            )
+        return "Delete", {}, None
+
+    client.portal.call(meals._write_meal, "a", plan)
+    assert seen == ["dinner", "lunch"]
+    # The retry took back the meal as it was when deleted
+    assert buckets(moto)[("day", "2024-01-05")] == {"mealType#dinner": 1, "mealType#lunch": -1}
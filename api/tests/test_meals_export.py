@@ -0,0 +1,74 @@
+"""
+GET /meals/export: every format streams the whole table, Parquet needs pyarrow.
+"""
+import io
+import csv
+import sys
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services import meals
+
+
+MEALS = [
+    {"mealID": str(i), "mealName": f"meal {i}", "mealType": "dinner", "eatingOut": i % 2 == 0, "date": "2024-01-05", "note": ""}
+    for i in range(7)
+]
+
+
+class FakeTable:
+    """
+    Scan over MEALS in pages of `Limit`, like DynamoDB's paginated scan.
+    """
+
+    def scan(self, Limit, ExclusiveStartKey=None):
+        start = int(ExclusiveStartKey["mealID"]) + 1 if ExclusiveStartKey else 0
+        page = MEALS[start:start + Limit]
+        response = {"Items": page}
+        if start + Limit < len(MEALS):
+            response["LastEvaluatedKey"] = {"mealID": page[-1]["mealID"]}
+        return response
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(meals, "get_table", lambda: FakeTable())
+    monkeypatch.setattr(meals, "EXPORT_PAGE_SIZE", 3)
+    return TestClient(app)
+
+
+def test_csv(client):
+    response = client.get("/meals/export", params={"format": "csv"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["mealID"] for row in rows] == [meal["mealID"] for meal in MEALS]
+
+
+def test_ndjson(client):
+    response = client.get("/meals/export", params={"format": "ndjson"})
+    assert [json.loads(line) for line in response.text.splitlines()] == MEALS
+
+
+def test_parquet_row_groups(client, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(meals, "EXPORT_ROW_GROUP_SIZE", 3)
+    response = client.get("/meals/export", params={"format": "parquet"})
+    assert response.status_code == 200
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.read().to_pylist() == MEALS
+
+
+def test_parquet_without_pyarrow(client, monkeypatch):
+    # A None entry makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    response = client.get("/meals/export", params={"format": "parquet"})
+    assert response.status_code == 501
+
+
+def test_unknown_format(client):
+    assert client.get("/meals/export", params={"format": "xlsx"}).status_code == 400
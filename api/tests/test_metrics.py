@@ -0,0 +1,44 @@
+"""
+MetricsMiddleware labels requests with the full route template.
+"""
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from core.metrics import MetricsMiddleware, request_latency
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    # Same paths declared in different routers, as routes/movies.py and routes/meals.py do
+    for name in ("movies", "meals"):
+        router = APIRouter()
+        router.add_api_route("/", lambda: {}, methods=["GET"], name=f"{name}-root")
+        router.add_api_route("/stats", lambda: {}, methods=["GET"], name=f"{name}-stats")
+        router.add_api_route("/cache/{key}", lambda key: {}, methods=["GET"], name=f"{name}-cache")
+        app.include_router(router, prefix=f"/{name}")
+    nested = APIRouter(prefix="/protected")
+    nested.add_api_route("/profile", lambda: {}, methods=["GET"])
+    app.include_router(nested, prefix="/protected")
+    return app
+
+
+def labels():
+    return {labels[1] for labels in request_latency.snapshot()}
+
+
+def test_routes_are_labelled_with_their_prefix():
+    client = TestClient(build_app())
+    for path in ("/movies/stats", "/meals/stats", "/movies/", "/meals/",
+                 "/movies/cache/a", "/meals/cache/b", "/protected/protected/profile"):
+        assert client.get(path).status_code == 200
+    seen = labels()
+    assert {"/movies/stats", "/meals/stats", "/movies/", "/meals/",
+            "/movies/cache/{key}", "/meals/cache/{key}", "/protected/protected/profile"} <= seen
+    assert "/stats" not in seen
+
+
+def test_unknown_paths_are_unmatched():
+    client = TestClient(build_app())
+    assert client.get("/nowhere").status_code == 404
+    assert "unmatched" in labels()
@@ -0,0 +1,42 @@
+"""
+The movies-access table: the last_updated mirror and the stale scan over it.
+"""
+import boto3
+import pytest
+from moto import mock_aws
+
+from services import movie_access
+from services.movie_access import MOVIES_ACCESS_TABLE, record_update, stale_libraries
+
+
+@pytest.fixture
+def table(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        table = boto3.resource("dynamodb", region_name="us-east-1").create_table(
+            TableName=MOVIES_ACCESS_TABLE,
+            KeySchema=[{"AttributeName": "username", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "username", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        monkeypatch.setattr(movie_access, "get_access_table", lambda: table)
+        yield table
+
+
+def test_mirror_never_goes_backwards(table):
+    record_update("a", 200)
+    record_update("a", 100)
+    assert table.get_item(Key={"username": "a"})["Item"]["last_updated"] == 200
+
+
+def test_stale_scan(table):
+    table.put_item(Item={"username": "stale", "access_count": 3, "counted_since": 50})
+    record_update("fresh", 500)
+    record_update("stale", 100)
+    # Read but never scraped since the mirror existed: not a candidate
+    table.put_item(Item={"username": "unknown", "access_count": 7, "counted_since": 10})
+
+    assert stale_libraries(300) == [
+        {"username": "stale", "last_updated": 100, "access_count": 3, "counted_since": 50}
+    ]
@@ -0,0 +1,109 @@
+"""
+Background refresh: priority order and the users / requests / time budgets.
+"""
+import time
+
+import pytest
+
+from core.metrics import record_outbound
+from services import movie_refresh
+from services.movie_refresh import MAX_STALENESS, TTL, refresh_priority, refresh_stale_movies
+
+
+NOW = 1_700_000_000
+
+
+def test_priority_grows_with_staleness():
+    assert refresh_priority(NOW, NOW - 2 * TTL, 0, 0) > refresh_priority(NOW, NOW - TTL, 0, 0)
+    assert refresh_priority(NOW, NOW - 3 * TTL, 0, 0) == pytest.approx(3)
+
+
+def test_priority_stops_growing_past_max_staleness():
+    assert refresh_priority(NOW, 0, 0, 0) == refresh_priority(NOW, NOW - MAX_STALENESS * TTL, 0, 0)
+
+
+def test_reads_per_ttl_weight_the_priority():
+    window = NOW - 10 * TTL
+    # 20 reads in 10 TTLs: two per TTL
+    assert refresh_priority(NOW, NOW - TTL, 20, window) == pytest.approx(3)
+    # A popular library just past TTL goes before an unread one well past it
+    assert refresh_priority(NOW, NOW - 2 * TTL, 100, window) > refresh_priority(NOW, NOW - 5 * TTL, 0, 0)
+
+
+def test_a_recent_count_is_not_inflated():
+    # Counted for less than a TTL: the window is one TTL, not the few seconds since
+    assert refresh_priority(NOW, NOW - TTL, 5, NOW - 1) == pytest.approx(6)
+
+
+class FakeTable:
+    def get_item(self, Key):
+        return {"Item": {"username": Key["username"], "movies": [], "last_updated": 1}}
+
+
+@pytest.fixture
+def libraries(monkeypatch):
+    """
+    Ten stale libraries, the lower-numbered read more; refreshing one makes
+    REQUESTS_PER_REFRESH Letterboxd requests.
+    """
+    now = int(time.time())
+    stale = [
+        {"username": f"user-{i}", "last_updated": now - 2 * TTL, "access_count": 10 - i, "counted_since": now - 10 * TTL}
+        for i in range(10)
+    ]
+    refreshed, resets = [], []
+
+    def get_all_movies(username, existing_movies=None, last_updated=None):
+        for _ in range(REQUESTS_PER_REFRESH):
+            record_outbound("letterboxd", 200, 0, 0.0)
+        refreshed.append(username)
+
+    monkeypatch.setattr(movie_refresh, "stale_libraries", lambda cutoff: list(reversed(stale)))
+    monkeypatch.setattr(movie_refresh, "get_table", lambda: FakeTable())
+    monkeypatch.setattr(movie_refresh, "get_all_movies", get_all_movies)
+    monkeypatch.setattr(movie_refresh, "reset_access", lambda username, seen, now: resets.append((username, seen)))
+    return refreshed, resets
+
+
+REQUESTS_PER_REFRESH = 10
+PLENTY_MS = 900_000
+
+
+def test_refreshes_in_priority_order_and_resets_counts(libraries):
+    refreshed, resets = libraries
+    summary = refresh_stale_movies(lambda: PLENTY_MS)
+    assert summary["stopped"] == "done"
+    assert refreshed == [f"user-{i}" for i in range(10)]
+    assert resets[0] == ("user-0", 10)
+
+
+def test_stops_at_max_users(libraries, monkeypatch):
+    monkeypatch.setattr(movie_refresh, "REFRESH_MAX_USERS", 3)
+    summary = refresh_stale_movies(lambda: PLENTY_MS)
+    assert summary["stopped"] == "users"
+    assert libraries[0] == ["user-0", "user-1", "user-2"]
+
+
+def test_stops_at_max_requests(libraries, monkeypatch):
+    monkeypatch.setattr(movie_refresh, "REFRESH_MAX_REQUESTS", 25)
+    summary = refresh_stale_movies(lambda: PLENTY_MS)
+    # The third refresh starts under budget and goes over it
+    assert summary["stopped"] == "requests"
+    assert summary["refreshed"] == 3
+    assert summary["letterboxd_requests"] == 30
+
+
+def test_stops_when_time_runs_out(libraries):
+    remaining = iter([PLENTY_MS, PLENTY_MS, 0])
+    summary = refresh_stale_movies(lambda: next(remaining))
+    assert summary["stopped"] == "time"
+    assert libraries[0] == ["user-0", "user-1"]
+
+
+def test_leaves_room_for_the_slowest_refresh(libraries, monkeypatch):
+    # Just enough for the first-refresh estimate, then less than the reserve
+    first = (movie_refresh.REFRESH_TIME_RESERVE + movie_refresh.REFRESH_FIRST_ESTIMATE) * 1000
+    remaining = iter([first, movie_refresh.REFRESH_TIME_RESERVE * 1000])
+    summary = refresh_stale_movies(lambda: next(remaining))
+    assert summary["stopped"] == "time"
+    assert libraries[0] == ["user-0"]
@@ -0,0 +1,75 @@
+"""
+compute_movie_stats on a small library with known aggregates.
+"""
+import orjson
+
+from services.movie_stats import UNKNOWN_DIRECTOR, compute_movie_stats, encode_movie_stats, movie_stats_body
+
+
+def film(title, rating=None, year=None, directors=None, review=None, review_date=None):
+    return {
+        "title": title,
+        "letterboxd_url": f"https://letterboxd.com/film/{title}/",
+        "rating": rating,
+        "release_year": year,
+        "director": directors or [UNKNOWN_DIRECTOR],
+        "review": review,
+        "review_date": review_date,
+    }
+
+
+LIBRARY = [
+    film("a", "★★★★", "1994", ["Kieślowski"], "Blue", "2023-01-02"),
+    film("b", "★★★½", "1993", ["Kieślowski"]),
+    film("c", "★★", "2001", ["Lynch"], "Odd", "2024-05-06"),
+    film("d", "★★★★", "2006", ["Lynch", "Frost"]),
+    film("e", None, "2010"),
+    film("f", "★", None, None, "Bad", "2024-07-08"),
+]
+
+
+def test_totals():
+    stats = compute_movie_stats(LIBRARY)
+    assert stats["movies"] == 6
+    assert stats["rated"] == 5
+    assert stats["reviewed"] == 3
+    assert stats["averageRating"] == round((4 + 3.5 + 2 + 4 + 1) / 5, 2)
+
+
+def test_rating_histogram():
+    assert compute_movie_stats(LIBRARY)["ratingHistogram"] == {"1.0": 1, "2.0": 1, "3.5": 1, "4.0": 2}
+
+
+def test_by_decade():
+    assert compute_movie_stats(LIBRARY)["byDecade"] == [
+        {"decade": 1990, "movies": 2, "rated": 2, "averageRating": 3.75},
+        {"decade": 2000, "movies": 2, "rated": 2, "averageRating": 3.0},
+        {"decade": 2010, "movies": 1, "rated": 0, "averageRating": None},
+    ]
+
+
+def test_top_directors_skip_unknown():
+    assert compute_movie_stats(LIBRARY)["topDirectors"] == [
+        {"director": "Kieślowski", "movies": 2, "averageRating": 3.75},
+        {"director": "Lynch", "movies": 2, "averageRating": 3.0},
+        {"director": "Frost", "movies": 1, "averageRating": 4.0},
+    ]
+
+
+def test_reviews_per_year():
+    assert compute_movie_stats(LIBRARY)["reviewsPerYear"] == {"2023": 1, "2024": 2}
+
+
+def test_empty_library():
+    stats = compute_movie_stats([])
+    assert stats["movies"] == 0
+    assert stats["rated"] == 0
+    assert stats["ratingHistogram"] == {}
+
+
+def test_last_updated_comes_from_the_item():
+    stored = encode_movie_stats(LIBRARY)
+    assert "lastUpdated" not in orjson.loads(stored)
+    body = orjson.loads(movie_stats_body(stored, 1700000000))
+    assert body["lastUpdated"] == 1700000000
+    assert body["movies"] == 6
@@ -0,0 +1,143 @@
+"""
+POST /movies/batch: validation, BatchGetItem retries and the scrape budget.
+"""
+import time
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from main import app
+from services import movies
+
+
+def cached(username, age=0):
+    return {
+        "username": username,
+        "movies": [{"title": f"{username} film", "letterboxd_url": f"https://letterboxd.com/film/{username}/"}],
+        "last_updated": int(time.time()) - age,
+        "is_complete": True,
+    }
+
+
+class FakeDynamoDB:
+    """
+    batch_get_item over a dict of items, leaving keys unprocessed as scripted:
+    each entry of `unprocessed` is how many keys the next call leaves out.
+    """
+
+    def __init__(self, items, unprocessed=()):
+        self.items = items
+        self.unprocessed = list(unprocessed)
+        self.calls = []
+
+    async def batch_get_item(self, RequestItems):
+        request = RequestItems[movies.MOVIES_TABLE]
+        self.calls.append(request)
+        keys = request["Keys"]
+        left = self.unprocessed.pop(0) if self.unprocessed else 0
+        served, rest = keys[:len(keys) - left], keys[len(keys) - left:]
+        response = {"Responses": {movies.MOVIES_TABLE: [
+            self.items[key["username"]] for key in served if key["username"] in self.items
+        ]}}
+        if rest:
+            response["UnprocessedKeys"] = {movies.MOVIES_TABLE: {"Keys": rest}}
+        return response
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    fake = FakeDynamoDB({})
+
+    async def get_async_resource(service, **kwargs):
+        return fake
+
+    async def record_access(usernames):
+        pass
+
+    monkeypatch.setattr(movies, "get_async_resource", get_async_resource)
+    monkeypatch.setattr(movies, "record_access", record_access)
+    monkeypatch.setattr(movies, "BATCH_RETRY_BASE_DELAY", 0)
+    return fake
+
+
+@pytest.fixture
+def scrapes(monkeypatch):
+    scraped = []
+
+    def get_all_movies_with_version(username, existing_movies=None, last_updated=None, **kwargs):
+        scraped.append(username)
+        return [{"title": "fresh", "letterboxd_url": f"https://letterboxd.com/film/{username}-fresh/"}], int(time.time())
+
+    monkeypatch.setattr(movies, "get_all_movies_with_version", get_all_movies_with_version)
+    return scraped
+
+
+def test_negative_limit_is_rejected():
+    response = TestClient(app).post("/movies/batch", json={"usernames": ["someone"], "limit": -1})
+    assert response.status_code == 422
+
+
+def test_unprocessed_keys_are_retried(dynamodb):
+    dynamodb.items = {name: cached(name) for name in ("a", "b", "c")}
+    dynamodb.unprocessed = [2, 1]
+    items = asyncio.run(movies._batch_get_cached(["a", "b", "c"]))
+    assert set(items) == {"a", "b", "c"}
+    assert [len(call["Keys"]) for call in dynamodb.calls] == [3, 2, 1]
+    assert "ProjectionExpression" in dynamodb.calls[0]
+
+
+def test_retries_continue_while_calls_make_progress(dynamodb):
+    names = [f"user-{i}" for i in range(8)]
+    dynamodb.items = {name: cached(name) for name in names}
+    # One key per call: more calls than BATCH_MAX_ATTEMPTS, but every one reads something
+    dynamodb.unprocessed = [7, 6, 5, 4, 3, 2, 1]
+    assert set(asyncio.run(movies._batch_get_cached(names))) == set(names)
+
+
+def test_gives_up_when_nothing_is_read(dynamodb):
+    dynamodb.items = {"a": cached("a")}
+    dynamodb.unprocessed = [1] * (movies.BATCH_MAX_ATTEMPTS + 1)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(movies._batch_get_cached(["a"]))
+    assert error.value.status_code == 503
+
+
+def test_keys_are_chunked(dynamodb):
+    names = [f"user-{i}" for i in range(movies.BATCH_MAX_USERS)]
+    dynamodb.items = {name: cached(name) for name in names}
+    assert len(asyncio.run(movies._batch_get_cached(names))) == len(names)
+    assert max(len(call["Keys"]) for call in dynamodb.calls) <= movies.BATCH_GET_CHUNK
+
+
+def test_scrapes_are_capped_and_the_rest_deferred(dynamodb, scrapes, monkeypatch):
+    monkeypatch.setattr(movies, "BATCH_MAX_SCRAPES", 1)
+    dynamodb.items = {
+        "fresh": cached("fresh"),
+        "stale": cached("stale", age=movies.TTL + 10),
+        "stalest": cached("stalest", age=movies.TTL * 3),
+    }
+    response = TestClient(app).post("/movies/batch", json={"usernames": ["fresh", "stale", "stalest", "missing"], "limit": 0})
+    assert response.status_code == 200
+    body = response.json()
+
+    # Missing users come first, then the stalest
+    assert scrapes == ["missing"]
+    assert response.headers["X-Deferred-Users"].split(",") == ["stalest", "stale"]
+    assert body["missing"][0]["title"] == "fresh"
+    # Deferred users get what is cached
+    assert body["stale"][0]["title"] == "stale film"
+    assert body["stalest"][0]["title"] == "stalest film"
+    assert body["fresh"][0]["title"] == "fresh film"
+
+
+def test_fast_batches_never_scrape(dynamodb, scrapes):
+    dynamodb.items = {"stale": cached("stale", age=movies.TTL + 10)}
+    response = TestClient(app).post("/movies/batch", json={"usernames": ["stale", "missing"], "fast": True})
+    assert response.status_code == 200
+    assert scrapes == []
+    assert "X-Deferred-Users" not in response.headers
+    body = response.json()
+    assert body["stale"][0]["title"] == "stale film"
+    assert body["missing"] == []
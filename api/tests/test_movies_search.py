@@ -0,0 +1,11 @@
+"""
+GET /movies/search query validation.
+"""
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+def test_negative_limit_is_rejected():
+    response = TestClient(app).get("/movies/search", params={"username": "someone", "limit": -1})
+    assert response.status_code == 422
@@ -8,6 +8,8 @@ import * as acm from "aws-cdk-lib/aws-certificatemanager";
 import * as path from "path";
 import * as cognito from "aws-cdk-lib/aws-cognito";
 import * as iam from "aws-cdk-lib/aws-iam";
+import * as events from "aws-cdk-lib/aws-events";
+import * as targets from "aws-cdk-lib/aws-events-targets";
 import { RemovalPolicy } from "aws-cdk-lib";
 import { ApiGatewayDomain } from "aws-cdk-lib/aws-route53-targets";
 
@@ -36,6 +38,33 @@ export class FastapiDynamodbLambdaStack extends cdk.Stack {
       removalPolicy: RemovalPolicy.RETAIN,
     });
 
+    // Pre-aggregated meal rollups (day / week / month buckets)
+    const stats_table_dev = new dynamodb.Table(this, "MealStatsTableDev", {
+      tableName: "MyTable-dev-stats",
+      partitionKey: {
+        name: "granularity",
+        type: dynamodb.AttributeType.STRING,
+      },
+      sortKey: {
+        name: "period",
+        type: dynamodb.AttributeType.STRING,
+      },
+      removalPolicy: RemovalPolicy.DESTROY,
+    });
+
+    const stats_table_prod = new dynamodb.Table(this, "MealStatsTableProd", {
+      tableName: "MyTable-prod-stats",
+      partitionKey: {
+        name: "granularity",
+        type: dynamodb.AttributeType.STRING,
+      },
+      sortKey: {
+        name: "period",
+        type: dynamodb.AttributeType.STRING,
+      },
+      removalPolicy: RemovalPolicy.RETAIN,
+    });
+
     const table_movies = new dynamodb.Table(this, "MoviesTable", {
       tableName: "movies",
       partitionKey: {
@@ -45,6 +74,17 @@ export class FastapiDynamodbLambdaStack extends cdk.Stack {
       removalPolicy: RemovalPolicy.RETAIN,
     });
 
+    // Read counts per Letterboxd user, used to order the scheduled movies refresh
+    const table_movies_access = new dynamodb.Table(this, "MoviesAccessTable", {
+      tableName: "movies-access",
+      partitionKey: {
+        name: "username",
+        type: dynamodb.AttributeType.STRING,
+      },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: RemovalPolicy.DESTROY,
+    });
+
     // ========================================================================
     // Cognito User Pool
     // ========================================================================
@@ -144,6 +184,7 @@ export class FastapiDynamodbLambdaStack extends cdk.Stack {
         timeout: cdk.Duration.seconds(300),
         environment: {
           TABLE_NAME: table_prod.tableName,
+          STATS_TABLE_NAME: stats_table_prod.tableName,
           AWS_REGION_NAME: this.region,
           AWS_COGNITO_USER_POOL_ID: userPool.userPoolId,
           AWS_COGNITO_APP_CLIENT_ID: userPoolClient.userPoolClientId,
@@ -155,12 +196,26 @@ export class FastapiDynamodbLambdaStack extends cdk.Stack {
     // Add Cognito permissions to prod Lambda
     fastApiLambda_prod.addToRolePolicy(cognitoPolicy);
     table_prod.grantReadWriteData(fastApiLambda_prod);
+    stats_table_prod.grantReadWriteData(fastApiLambda_prod);
     table_movies.grantReadWriteData(fastApiLambda_prod);
+    table_movies_access.grantReadWriteData(fastApiLambda_prod);
+
+    // Refresh stale movie libraries in the background, most read first
+    new events.Rule(this, "MoviesRefreshSchedule", {
+      schedule: events.Schedule.rate(cdk.Duration.minutes(30)),
+      targets: [new targets.LambdaFunction(fastApiLambda_prod)],
+    });
 
     // API Gateway for FastAPI Lambda - Production
     const api_prod = new apigateway.LambdaRestApi(this, "FastApiGateway", {
       handler: fastApiLambda_prod,
       proxy: true,
+      // gzip / br and Parquet bodies come back base64-encoded from Mangum. API Gateway
+      // decodes them only when the request's first Accept type is listed here, and
+      // browsers and fetch send */* or text/html first, so a narrower list would hand
+      // them base64 text. The same list makes request bodies arrive base64-encoded;
+      // Mangum decodes them (see api/tests/test_lambda_handler.py).
+      binaryMediaTypes: ["*/*"],
       description: "APIGateway for FastAPI Lambda DDB docker image test service",
     });
 
@@ -183,6 +238,7 @@ export class FastapiDynamodbLambdaStack extends cdk.Stack {
         timeout: cdk.Duration.seconds(300),
         environment: {
           TABLE_NAME: table_dev.tableName,
+          STATS_TABLE_NAME: stats_table_dev.tableName,
           AWS_REGION_NAME: this.region,
           AWS_COGNITO_USER_POOL_ID: userPool.userPoolId,
           AWS_COGNITO_APP_CLIENT_ID: userPoolClient.userPoolClientId,
@@ -194,12 +250,20 @@ export class FastapiDynamodbLambdaStack extends cdk.Stack {
     // Add Cognito permissions to dev Lambda
     fastApiLambda_dev.addToRolePolicy(cognitoPolicy);
     table_dev.grantReadWriteData(fastApiLambda_dev);
+    stats_table_dev.grantReadWriteData(fastApiLambda_dev);
     table_movies.grantReadWriteData(fastApiLambda_dev);
+    table_movies_access.grantReadWriteData(fastApiLambda_dev);
 
     // API Gateway for FastAPI Lambda - Development
     const api_dev = new apigateway.LambdaRestApi(this, "FastApiGatewayDev", {
       handler: fastApiLambda_dev,
       proxy: true,
+      // gzip / br and Parquet bodies come back base64-encoded from Mangum. API Gateway
+      // decodes them only when the request's first Accept type is listed here, and
+      // browsers and fetch send */* or text/html first, so a narrower list would hand
+      // them base64 text. The same list makes request bodies arrive base64-encoded;
+      // Mangum decodes them (see api/tests/test_lambda_handler.py).
+      binaryMediaTypes: ["*/*"],
       description: "APIGateway for FastAPI Lambda DDB docker image test service",
     });
 